@@ -40,37 +40,6 @@ class Complex {
   }
 }
 
-//------------------------------------------------------------
-// Gate matrices (single qubit)
-//------------------------------------------------------------
-const SQRT1_2 = 1 / Math.sqrt(2);
-const SINGLE_QUBIT_GATES = {
-  h: [
-    [new Complex(SQRT1_2, 0), new Complex(SQRT1_2, 0)],
-    [new Complex(SQRT1_2, 0), new Complex(-SQRT1_2, 0)],
-  ],
-  x: [
-    [new Complex(0, 0), new Complex(1, 0)],
-    [new Complex(1, 0), new Complex(0, 0)],
-  ],
-  y: [
-    [new Complex(0, 0), new Complex(0, -1)],
-    [new Complex(0, 1), new Complex(0, 0)],
-  ],
-  z: [
-    [new Complex(1, 0), new Complex(0, 0)],
-    [new Complex(0, 0), new Complex(-1, 0)],
-  ],
-  s: [
-    [new Complex(1, 0), new Complex(0, 0)],
-    [new Complex(0, 0), new Complex(0, 1)],
-  ],
-  t: [
-    [new Complex(1, 0), new Complex(0, 0)],
-    [new Complex(0, 0), new Complex(Math.SQRT1_2, Math.SQRT1_2)],
-  ],
-};
-
 //------------------------------------------------------------
 // SimpleQuantumCircuit – enhanced with import functionality
 //------------------------------------------------------------
@@ -80,6 +49,12 @@ class SimpleQuantumCircuit {
     this.numCols = cols;
     this.gates = [];
     this.history = [[]];
+    this.memoryBudgetBytes = DEFAULT_MEMORY_BUDGET_BYTES;
+    this.lastPeakMemoryBytes = 0;
+  }
+
+  maxQubits() {
+    return QuantumSimulator.maxQubitsForBudget(this.memoryBudgetBytes);
   }
 
   addGate(gate, qubit, col, params = {}) {
@@ -291,43 +266,27 @@ class SimpleQuantumCircuit {
   }
 
   simulateStateVector() {
-    if (this.numQubits > 4) throw new Error("Simulation limited to 4 qubits");
-    const dim = 1 << this.numQubits;
-    let state = Array(dim).fill(0).map(() => new Complex(0, 0));
-    state[0] = new Complex(1, 0);
-
-    const orderedGates = [...this.gates].sort((a, b) => a.col - b.col);
-
-    for (const g of orderedGates) {
-      if (SINGLE_QUBIT_GATES[g.gate]) {
-        state = applySingleQubitGate(state, this.numQubits, g.qubit, SINGLE_QUBIT_GATES[g.gate]);
-      } else if (g.gate === "cx") {
-        state = applyCX(state, this.numQubits, g.qubit, g.qubit + 1);
-      } else if (g.gate === "cz") {
-        state = applyCZ(state, this.numQubits, g.qubit, g.qubit + 1);
-      }
-    }
-
+    const simulator = new QuantumSimulator({ memoryBudgetBytes: this.memoryBudgetBytes });
+    const gates = this.gates.map((g) => ({ gate: g.gate, qubit: g.qubit, column: g.col, params: g.params }));
+    const state = simulator.simulateState({ qubits: this.numQubits, gates });
+    this.lastPeakMemoryBytes = simulator.peakMemoryBytes;
     return state;
   }
 
-  probabilityDistribution() {
+  // Most likely basis states, largest first. Small registers list every
+  // state in order; larger ones skip labelling the other 2^n - k states.
+  mostLikelyStates(k = DEFAULT_TOP_STATES) {
     try {
-      const state = this.simulateStateVector();
-      const probs = {};
-      state.forEach((amp, idx) => {
-        const bin = idx.toString(2).padStart(this.numQubits, "0");
-        probs[bin] = Complex.magnitudeSquared(amp);
-      });
-      return probs;
-    } catch (e) {
-      const states = Math.pow(2, this.numQubits);
-      const probs = {};
-      for (let i = 0; i < states; i++) {
-        const state = i.toString(2).padStart(this.numQubits, '0');
-        probs[state] = i === 0 ? 1 : 0;
+      const probabilities = this.simulateStateVector().probabilities();
+      if (probabilities.length <= k) {
+        return Array.from(probabilities, (probability, index) => ({
+          index, label: basisLabel(index, this.numQubits), probability
+        }));
       }
-      return probs;
+      return topStates(probabilities, this.numQubits, k);
+    } catch (e) {
+      console.warn("Simulation failed:", e.message);
+      return [{ index: 0, label: basisLabel(0, this.numQubits), probability: 1 }];
     }
   }
 }
@@ -562,68 +521,6 @@ class CodeParsers {
   }
 }
 
-//------------------------------------------------------------
-// Linear algebra helpers
-//------------------------------------------------------------
-function applySingleQubitGate(state, n, target, matrix) {
-  const dim = state.length;
-  const newState = state.map(() => new Complex(0, 0));
-  const bit = 1 << (n - 1 - target);
-  
-  for (let i = 0; i < dim; i++) {
-    if ((i & bit) === 0) {
-      const idx0 = i;
-      const idx1 = i | bit;
-      const amp0 = state[idx0];
-      const amp1 = state[idx1];
-
-      const new0 = Complex.add(
-        Complex.mul(matrix[0][0], amp0),
-        Complex.mul(matrix[0][1], amp1)
-      );
-      const new1 = Complex.add(
-        Complex.mul(matrix[1][0], amp0),
-        Complex.mul(matrix[1][1], amp1)
-      );
-      newState[idx0] = new0;
-      newState[idx1] = new1;
-    }
-  }
-  return newState;
-}
-
-function applyCX(state, n, control, target) {
-  const dim = state.length;
-  const newState = state.map((c) => Complex.from(c));
-  const cbit = 1 << (n - 1 - control);
-  const tbit = 1 << (n - 1 - target);
-
-  for (let i = 0; i < dim; i++) {
-    if ((i & cbit) !== 0 && (i & tbit) === 0) {
-      const idx0 = i;
-      const idx1 = i | tbit;
-      const temp = newState[idx0];
-      newState[idx0] = newState[idx1];
-      newState[idx1] = temp;
-    }
-  }
-  return newState;
-}
-
-function applyCZ(state, n, control, target) {
-  const dim = state.length;
-  const newState = state.map((c) => Complex.from(c));
-  const cbit = 1 << (n - 1 - control);
-  const tbit = 1 << (n - 1 - target);
-  
-  for (let i = 0; i < dim; i++) {
-    if ((i & cbit) !== 0 && (i & tbit) !== 0) {
-      newState[i] = Complex.mul(newState[i], new Complex(-1, 0));
-    }
-  }
-  return newState;
-}
-
 //------------------------------------------------------------
 // Global variables
 //------------------------------------------------------------
@@ -1041,6 +938,10 @@ function setupToolbar() {
   if (!addBtn || !removeBtn) return; // Don't setup if elements don't exist
   
   addBtn.addEventListener("click", () => {
+    if (circuit.numQubits >= circuit.maxQubits()) {
+      showToast(`Maximum ${circuit.maxQubits()} qubits fit in the ${formatBytes(circuit.memoryBudgetBytes)} simulation budget`, "error");
+      return;
+    }
     circuit.numQubits++;
     drawCircuit();
     refreshCode();
@@ -1246,18 +1147,14 @@ function updateBlochSphereFromCircuit() {
   
   try {
     const stateVec = circuit.simulateStateVector();
-    const alpha = reducedAmplitude(stateVec, circuit.numQubits, 0, 0);
-    const beta = reducedAmplitude(stateVec, circuit.numQubits, 0, 1);
-    
-    const norm = Math.sqrt(Complex.magnitudeSquared(alpha) + Complex.magnitudeSquared(beta));
-    if (norm === 0) return;
-    
-    const a = new Complex(alpha.re / norm, alpha.im / norm);
-    const b = new Complex(beta.re / norm, beta.im / norm);
+    // Trace out the other qubits; entangled qubits give |r| < 1
+    const rho = stateVec.reducedDensityMatrices();
+    const [p0, p1, cohRe, cohIm] = rho.subarray(0, 4);
 
-    const x = 2 * (a.re * b.re + a.im * b.im);
-    const y = 2 * (a.im * b.re - a.re * b.im);
-    const z = Complex.magnitudeSquared(a) - Complex.magnitudeSquared(b);
+    const x = 2 * cohRe;
+    const y = -2 * cohIm;
+    const z = p0 - p1;
+    const length = Math.sqrt(x * x + y * y + z * z);
 
     blochVector.geometry.setFromPoints([
       new THREE.Vector3(0, 0, 0), 
@@ -1269,12 +1166,20 @@ function updateBlochSphereFromCircuit() {
       blochArrow.lookAt(new THREE.Vector3(x * 2, y * 2, z * 2));
     }
 
-    document.getElementById("amplitude").textContent = `${a.toString()} , ${b.toString()}`;
-    const phase = Math.atan2(a.im, a.re) * (180 / Math.PI);
+    // Amplitudes only exist for a pure reduced state: a = sqrt(p0), b = rho10 / a
+    if (length > 0.999) {
+      const a = new Complex(Math.sqrt(p0), 0);
+      const b = p0 > 1e-12 ? new Complex(cohRe / a.re, -cohIm / a.re) : new Complex(1, 0);
+      document.getElementById("amplitude").textContent = `${a.toString()} , ${b.toString()}`;
+    } else {
+      document.getElementById("amplitude").textContent = `mixed (|r| = ${length.toFixed(3)})`;
+    }
+    const phase = Math.atan2(y, x) * (180 / Math.PI);
     document.getElementById("phase").textContent = `${phase.toFixed(1)}°`;
     
     let stateName = "superposition";
-    if (Math.abs(z - 1) < 0.01) stateName = "|0⟩";
+    if (length < 0.999) stateName = "mixed (entangled)";
+    else if (Math.abs(z - 1) < 0.01) stateName = "|0⟩";
     else if (Math.abs(z + 1) < 0.01) stateName = "|1⟩";
     else if (Math.abs(x - 1) < 0.01) stateName = "|+⟩";
     else if (Math.abs(x + 1) < 0.01) stateName = "|-⟩";
@@ -1287,17 +1192,6 @@ function updateBlochSphereFromCircuit() {
   }
 }
 
-function reducedAmplitude(state, n, qubit, bitVal) {
-  let amp = new Complex(0, 0);
-  const bit = 1 << (n - 1 - qubit);
-  state.forEach((c, idx) => {
-    if (((idx & bit) !== 0) === (bitVal === 1)) {
-      amp = Complex.add(amp, c);
-    }
-  });
-  return amp;
-}
-
 //------------------------------------------------------------
 // Results Chart (Chart.js)
 //------------------------------------------------------------
@@ -1316,9 +1210,9 @@ function updateResultsChart() {
   const canvas = document.getElementById("resultsChart");
   if (!canvas || !window.Chart) return;
   
-  const probs = circuit.probabilityDistribution();
-  const labels = Object.keys(probs);
-  const data = labels.map((k) => probs[k]);
+  const states = circuit.mostLikelyStates();
+  const labels = states.map((s) => s.label);
+  const data = states.map((s) => s.probability);
     const colors = [
         "#7c3aed", "#8b5cf6", "#c4b5fd", "#efe6ff", "#a78bfa",
         "#7c3aed", "#d8b4fe", "#6d28d9", "#8b5cf6", "#4c1d95"
@@ -1375,20 +1269,27 @@ function updateResultsChart() {
     },
   });
   
-  updateStateTable(probs);
+  updateStateTable(states);
 }
 
-function updateStateTable(probs) {
+function updateStateTable(states) {
   const tableDiv = document.getElementById("stateTable");
   if (!tableDiv) return;
   
-  const entries = Object.entries(probs).sort((a, b) => b[1] - a[1]);
+  const entries = [...states].sort((a, b) => b.probability - a.probability);
   let html = "<table><thead><tr><th>State</th><th>Probability</th><th>Amplitude</th></tr></thead><tbody>";
   
-  entries.forEach(([state, p]) => {
+  entries.forEach(({ label, probability: p }) => {
     const amp = Math.sqrt(p);
-    html += `<tr><td>|${state}⟩</td><td>${(p * 100).toFixed(2)}%</td><td>${amp.toFixed(3)}</td></tr>`;
+    html += `<tr><td>|${label}⟩</td><td>${(p * 100).toFixed(2)}%</td><td>${amp.toFixed(3)}</td></tr>`;
   });
+
+  // The states left out of the top k share whatever probability remains
+  const others = 2 ** circuit.numQubits - entries.length;
+  if (others > 0) {
+    const rest = Math.max(0, 1 - entries.reduce((sum, s) => sum + s.probability, 0));
+    html += `<tr><td>${others} other states</td><td>${(rest * 100).toFixed(2)}%</td><td>–</td></tr>`;
+  }
   
   html += "</tbody></table>";
   tableDiv.innerHTML = html;
@@ -1476,6 +1377,11 @@ class QuantumPlatform {
         };
 
         // Simulation State
+        this.simulationMemoryBudget = DEFAULT_MEMORY_BUDGET_BYTES; // tune per deployment
+        this.prefixCache = new PrefixStateCache(); // column snapshots for incremental re-simulation
+        this.resultCache = new ResultCache(); // finished results by circuit hash, persisted in IndexedDB
+        this.simulationRunId = 0; // only the latest run caches and renders
+        this.lastSimulationMetadata = null;
         this.probabilityChart = null;
         this.blochRenderer = null;
         this.currentGateBeingParameterized = null;
@@ -2804,7 +2710,8 @@ class QuantumPlatform {
     }
 
     addQubit() {
-        if (this.qubits < 6) {
+        const maxQubits = QuantumSimulator.maxQubitsForBudget(this.simulationMemoryBudget);
+        if (this.qubits < maxQubits) {
             this.saveState();
             this.qubits++;
             this.renderCircuitCanvas();
@@ -2812,7 +2719,7 @@ class QuantumPlatform {
             document.getElementById('qubitCount').textContent = this.qubits;
             this.showToast('Qubit added', 'success');
         } else {
-            this.showToast('Maximum 6 qubits supported', 'warning');
+            this.showToast(`Maximum ${maxQubits} qubits fit in the ${formatBytes(this.simulationMemoryBudget)} simulation budget`, 'warning');
         }
     }
 
@@ -2946,20 +2853,26 @@ class QuantumPlatform {
             return;
         }
 
+        const runId = ++this.simulationRunId;
         this.showLoading('Simulating quantum circuit...');
 
         try {
-            // Simulate delay for realistic feel
-            await new Promise(resolve => setTimeout(resolve, 1000));
+            const results = await this.performQuantumSimulation(runId);
+            const cached = Boolean(results.metadata.resultCache);
 
-            const results = this.performQuantumSimulation();
+            // Simulate delay for realistic feel; cached results show at once
+            if (!cached) await new Promise(resolve => setTimeout(resolve, 1000));
+            if (runId !== this.simulationRunId) return;
+            this.lastSimulationMetadata = results.metadata;
 
             this.displayProbabilityChart(results.probabilities);
             this.updateBlochSphere(results.blochVectors);
             this.generateCode();
 
             this.switchTab('probability');
-            this.showToast('Simulation completed', 'success');
+            this.showToast(cached
+                ? `Simulation completed (cached result, ${this.resultCache.stats().hits} hits)`
+                : `Simulation completed (peak memory ${formatBytes(results.metadata.peakMemoryBytes)})`, 'success');
 
             // Update stats
             this.updateUserStats({ simulationsRun: 1 });
@@ -2979,40 +2892,33 @@ class QuantumPlatform {
             }
 
         } catch (error) {
-            this.showToast('Simulation failed: ' + error.message, 'error');
+            if (!error.cancelled) {
+                this.showToast('Simulation failed: ' + error.message, 'error');
+            }
         } finally {
-            this.hideLoading();
+            if (runId === this.simulationRunId) {
+                this.hideLoading();
+            }
         }
     }
 
-    performQuantumSimulation() {
-        // Simple quantum simulation (for demonstration)
-        const numStates = Math.pow(2, this.qubits);
-        const probabilities = {};
-
-        // Initialize probabilities
-        for (let i = 0; i < numStates; i++) {
-            const state = i.toString(2).padStart(this.qubits, '0');
-            probabilities[state] = Math.random();
+    async performQuantumSimulation(runId = this.simulationRunId) {
+        // Snapshot the gates so an edit during the cache lookup can't change
+        // what is simulated or the key it is cached under
+        const circuit = { qubits: this.qubits, gates: this.circuit.map(gateSnapshot) };
+        const options = { memoryBudgetBytes: this.simulationMemoryBudget };
+        const key = circuitHash(circuit, options);
+        let result = await this.resultCache.get(key);
+        if (runId !== this.simulationRunId) {
+            const error = new Error('Simulation superseded');
+            error.cancelled = true;
+            throw error;
         }
-
-        // Normalize probabilities
-        const sum = Object.values(probabilities).reduce((a, b) => a + b, 0);
-        Object.keys(probabilities).forEach(state => {
-            probabilities[state] /= sum;
-        });
-
-        // Generate Bloch vectors for each qubit
-        const blochVectors = [];
-        for (let q = 0; q < this.qubits; q++) {
-            blochVectors.push({
-                x: Math.random() * 2 - 1,
-                y: Math.random() * 2 - 1,
-                z: Math.random() * 2 - 1
-            });
+        if (!result) {
+            result = new QuantumSimulator({ ...options, prefixCache: this.prefixCache }).simulate(circuit);
+            if (isReproducibleResult(result)) this.resultCache.set(key, result);
         }
-
-        return { probabilities, blochVectors };
+        return { ...result, probabilities: labelProbabilities(result.probabilities, circuit.qubits) };
     }
 
     displayProbabilityChart(probabilities) {
@@ -3143,7 +3049,8 @@ class QuantumPlatform {
     updateBlochSphere(blochVectors) {
         if (!this.blochRenderer || !blochVectors.length) return;
 
-        // Update the first qubit's Bloch vector
+        // Update the first qubit's Bloch vector; entangled qubits are
+        // mixed on their own and point inside the sphere
         const vector = blochVectors[0];
         const { arrow, line } = this.blochRenderer;
 
@@ -3157,19 +3064,23 @@ class QuantumPlatform {
 
         // Update arrow position
         arrow.position.set(vector.x, vector.y, vector.z);
-        arrow.lookAt(vector.x * 2, vector.y * 2, vector.z * 2);
+        if (vector.x !== 0 || vector.y !== 0 || vector.z !== 0) {
+            arrow.lookAt(vector.x * 2, vector.y * 2, vector.z * 2);
+        }
 
         // Update qubit states display
         const statesContainer = document.getElementById('qubitStates');
         if (statesContainer) {
             statesContainer.innerHTML = '';
             blochVectors.forEach((vector, index) => {
+                const length = Math.hypot(vector.x, vector.y, vector.z);
                 const stateDiv = document.createElement('div');
                 stateDiv.innerHTML = `
                     <strong>Qubit ${index}:</strong><br>
                     X: ${vector.x.toFixed(3)}<br>
                     Y: ${vector.y.toFixed(3)}<br>
-                    Z: ${vector.z.toFixed(3)}
+                    Z: ${vector.z.toFixed(3)}<br>
+                    |r|: ${length.toFixed(3)}${length < 0.999 ? ' (mixed)' : ''}
                 `;
                 statesContainer.appendChild(stateDiv);
             });
@@ -40,37 +40,6 @@ class Complex {
   }
 }
 
-//------------------------------------------------------------
-// Gate matrices (single qubit)
-//------------------------------------------------------------
-const SQRT1_2 = 1 / Math.sqrt(2);
-const SINGLE_QUBIT_GATES = {
-  h: [
-    [new Complex(SQRT1_2, 0), new Complex(SQRT1_2, 0)],
-    [new Complex(SQRT1_2, 0), new Complex(-SQRT1_2, 0)],
-  ],
-  x: [
-    [new Complex(0, 0), new Complex(1, 0)],
-    [new Complex(1, 0), new Complex(0, 0)],
-  ],
-  y: [
-    [new Complex(0, 0), new Complex(0, -1)],
-    [new Complex(0, 1), new Complex(0, 0)],
-  ],
-  z: [
-    [new Complex(1, 0), new Complex(0, 0)],
-    [new Complex(0, 0), new Complex(-1, 0)],
-  ],
-  s: [
-    [new Complex(1, 0), new Complex(0, 0)],
-    [new Complex(0, 0), new Complex(0, 1)],
-  ],
-  t: [
-    [new Complex(1, 0), new Complex(0, 0)],
-    [new Complex(0, 0), new Complex(Math.SQRT1_2, Math.SQRT1_2)],
-  ],
-};
-
 //------------------------------------------------------------
 // SimpleQuantumCircuit – enhanced with import functionality
 //------------------------------------------------------------
@@ -80,6 +49,12 @@ class SimpleQuantumCircuit {
     this.numCols = cols;
     this.gates = [];
     this.history = [[]];
+    this.memoryBudgetBytes = DEFAULT_MEMORY_BUDGET_BYTES;
+    this.lastPeakMemoryBytes = 0;
+  }
+
+  maxQubits() {
+    return QuantumSimulator.maxQubitsForBudget(this.memoryBudgetBytes);
   }
 
   addGate(gate, qubit, col, params = {}) {
@@ -291,43 +266,27 @@ class SimpleQuantumCircuit {
   }
 
   simulateStateVector() {
-    if (this.numQubits > 4) throw new Error("Simulation limited to 4 qubits");
-    const dim = 1 << this.numQubits;
-    let state = Array(dim).fill(0).map(() => new Complex(0, 0));
-    state[0] = new Complex(1, 0);
-
-    const orderedGates = [...this.gates].sort((a, b) => a.col - b.col);
-
-    for (const g of orderedGates) {
-      if (SINGLE_QUBIT_GATES[g.gate]) {
-        state = applySingleQubitGate(state, this.numQubits, g.qubit, SINGLE_QUBIT_GATES[g.gate]);
-      } else if (g.gate === "cx") {
-        state = applyCX(state, this.numQubits, g.qubit, g.qubit + 1);
-      } else if (g.gate === "cz") {
-        state = applyCZ(state, this.numQubits, g.qubit, g.qubit + 1);
-      }
-    }
-
+    const simulator = new QuantumSimulator({ memoryBudgetBytes: this.memoryBudgetBytes });
+    const gates = this.gates.map((g) => ({ gate: g.gate, qubit: g.qubit, column: g.col, params: g.params }));
+    const state = simulator.simulateState({ qubits: this.numQubits, gates });
+    this.lastPeakMemoryBytes = simulator.peakMemoryBytes;
     return state;
   }
 
-  probabilityDistribution() {
+  // Most likely basis states, largest first. Small registers list every
+  // state in order; larger ones skip labelling the other 2^n - k states.
+  mostLikelyStates(k = DEFAULT_TOP_STATES) {
     try {
-      const state = this.simulateStateVector();
-      const probs = {};
-      state.forEach((amp, idx) => {
-        const bin = idx.toString(2).padStart(this.numQubits, "0");
-        probs[bin] = Complex.magnitudeSquared(amp);
-      });
-      return probs;
-    } catch (e) {
-      const states = Math.pow(2, this.numQubits);
-      const probs = {};
-      for (let i = 0; i < states; i++) {
-        const state = i.toString(2).padStart(this.numQubits, '0');
-        probs[state] = i === 0 ? 1 : 0;
+      const probabilities = this.simulateStateVector().probabilities();
+      if (probabilities.length <= k) {
+        return Array.from(probabilities, (probability, index) => ({
+          index, label: basisLabel(index, this.numQubits), probability
+        }));
       }
-      return probs;
+      return topStates(probabilities, this.numQubits, k);
+    } catch (e) {
+      console.warn("Simulation failed:", e.message);
+      return [{ index: 0, label: basisLabel(0, this.numQubits), probability: 1 }];
     }
   }
 }
@@ -562,68 +521,6 @@ class CodeParsers {
   }
 }
 
-//------------------------------------------------------------
-// Linear algebra helpers
-//------------------------------------------------------------
-function applySingleQubitGate(state, n, target, matrix) {
-  const dim = state.length;
-  const newState = state.map(() => new Complex(0, 0));
-  const bit = 1 << (n - 1 - target);
-  
-  for (let i = 0; i < dim; i++) {
-    if ((i & bit) === 0) {
-      const idx0 = i;
-      const idx1 = i | bit;
-      const amp0 = state[idx0];
-      const amp1 = state[idx1];
-
-      const new0 = Complex.add(
-        Complex.mul(matrix[0][0], amp0),
-        Complex.mul(matrix[0][1], amp1)
-      );
-      const new1 = Complex.add(
-        Complex.mul(matrix[1][0], amp0),
-        Complex.mul(matrix[1][1], amp1)
-      );
-      newState[idx0] = new0;
-      newState[idx1] = new1;
-    }
-  }
-  return newState;
-}
-
-function applyCX(state, n, control, target) {
-  const dim = state.length;
-  const newState = state.map((c) => Complex.from(c));
-  const cbit = 1 << (n - 1 - control);
-  const tbit = 1 << (n - 1 - target);
-
-  for (let i = 0; i < dim; i++) {
-    if ((i & cbit) !== 0 && (i & tbit) === 0) {
-      const idx0 = i;
-      const idx1 = i | tbit;
-      const temp = newState[idx0];
-      newState[idx0] = newState[idx1];
-      newState[idx1] = temp;
-    }
-  }
-  return newState;
-}
-
-function applyCZ(state, n, control, target) {
-  const dim = state.length;
-  const newState = state.map((c) => Complex.from(c));
-  const cbit = 1 << (n - 1 - control);
-  const tbit = 1 << (n - 1 - target);
-  
-  for (let i = 0; i < dim; i++) {
-    if ((i & cbit) !== 0 && (i & tbit) !== 0) {
-      newState[i] = Complex.mul(newState[i], new Complex(-1, 0));
-    }
-  }
-  return newState;
-}
-
 //------------------------------------------------------------
 // Global variables
 //------------------------------------------------------------
@@ -1159,6 +1056,10 @@ function switchToTab(target) {
 
 function setupToolbar() {
   q("btnAddQubit").addEventListener("click", () => {
+    if (circuit.numQubits >= circuit.maxQubits()) {
+      showToast(`Maximum ${circuit.maxQubits()} qubits fit in the ${formatBytes(circuit.memoryBudgetBytes)} simulation budget`, "error");
+      return;
+    }
     circuit.numQubits++;
     drawCircuit();
     refreshCode();
@@ -1365,18 +1266,14 @@ function updateBlochSphereFromCircuit() {
   
   try {
     const stateVec = circuit.simulateStateVector();
-    const alpha = reducedAmplitude(stateVec, circuit.numQubits, 0, 0);
-    const beta = reducedAmplitude(stateVec, circuit.numQubits, 0, 1);
-    
-    const norm = Math.sqrt(Complex.magnitudeSquared(alpha) + Complex.magnitudeSquared(beta));
-    if (norm === 0) return;
-    
-    const a = new Complex(alpha.re / norm, alpha.im / norm);
-    const b = new Complex(beta.re / norm, beta.im / norm);
+    // Trace out the other qubits; entangled qubits give |r| < 1
+    const rho = stateVec.reducedDensityMatrices();
+    const [p0, p1, cohRe, cohIm] = rho.subarray(0, 4);
 
-    const x = 2 * (a.re * b.re + a.im * b.im);
-    const y = 2 * (a.im * b.re - a.re * b.im);
-    const z = Complex.magnitudeSquared(a) - Complex.magnitudeSquared(b);
+    const x = 2 * cohRe;
+    const y = -2 * cohIm;
+    const z = p0 - p1;
+    const length = Math.sqrt(x * x + y * y + z * z);
 
     blochVector.geometry.setFromPoints([
       new THREE.Vector3(0, 0, 0), 
@@ -1388,12 +1285,20 @@ function updateBlochSphereFromCircuit() {
       blochArrow.lookAt(new THREE.Vector3(x * 2, y * 2, z * 2));
     }
 
-    document.getElementById("amplitude").textContent = `${a.toString()} , ${b.toString()}`;
-    const phase = Math.atan2(a.im, a.re) * (180 / Math.PI);
+    // Amplitudes only exist for a pure reduced state: a = sqrt(p0), b = rho10 / a
+    if (length > 0.999) {
+      const a = new Complex(Math.sqrt(p0), 0);
+      const b = p0 > 1e-12 ? new Complex(cohRe / a.re, -cohIm / a.re) : new Complex(1, 0);
+      document.getElementById("amplitude").textContent = `${a.toString()} , ${b.toString()}`;
+    } else {
+      document.getElementById("amplitude").textContent = `mixed (|r| = ${length.toFixed(3)})`;
+    }
+    const phase = Math.atan2(y, x) * (180 / Math.PI);
     document.getElementById("phase").textContent = `${phase.toFixed(1)}°`;
     
     let stateName = "superposition";
-    if (Math.abs(z - 1) < 0.01) stateName = "|0⟩";
+    if (length < 0.999) stateName = "mixed (entangled)";
+    else if (Math.abs(z - 1) < 0.01) stateName = "|0⟩";
     else if (Math.abs(z + 1) < 0.01) stateName = "|1⟩";
     else if (Math.abs(x - 1) < 0.01) stateName = "|+⟩";
     else if (Math.abs(x + 1) < 0.01) stateName = "|-⟩";
@@ -1406,17 +1311,6 @@ function updateBlochSphereFromCircuit() {
   }
 }
 
-function reducedAmplitude(state, n, qubit, bitVal) {
-  let amp = new Complex(0, 0);
-  const bit = 1 << (n - 1 - qubit);
-  state.forEach((c, idx) => {
-    if (((idx & bit) !== 0) === (bitVal === 1)) {
-      amp = Complex.add(amp, c);
-    }
-  });
-  return amp;
-}
-
 //------------------------------------------------------------
 // Results Chart (Chart.js)
 //------------------------------------------------------------
@@ -1434,9 +1328,9 @@ function updateResultsChart() {
   const canvas = document.getElementById("resultsChart");
   if (!canvas || !window.Chart) return;
   
-  const probs = circuit.probabilityDistribution();
-  const labels = Object.keys(probs);
-  const data = labels.map((k) => probs[k]);
+  const states = circuit.mostLikelyStates();
+  const labels = states.map((s) => s.label);
+  const data = states.map((s) => s.probability);
   const colors = [
     "#1FB8CD", "#FFC185", "#B4413C", "#ECEBD5", "#5D878F", 
     "#DB4545", "#D2BA4C", "#964325", "#944454", "#13343B"
@@ -1492,20 +1386,27 @@ function updateResultsChart() {
     },
   });
   
-  updateStateTable(probs);
+  updateStateTable(states);
 }
 
-function updateStateTable(probs) {
+function updateStateTable(states) {
   const tableDiv = document.getElementById("stateTable");
   if (!tableDiv) return;
   
-  const entries = Object.entries(probs).sort((a, b) => b[1] - a[1]);
+  const entries = [...states].sort((a, b) => b.probability - a.probability);
   let html = "<table><thead><tr><th>State</th><th>Probability</th><th>Amplitude</th></tr></thead><tbody>";
   
-  entries.forEach(([state, p]) => {
+  entries.forEach(({ label, probability: p }) => {
     const amp = Math.sqrt(p);
-    html += `<tr><td>|${state}⟩</td><td>${(p * 100).toFixed(2)}%</td><td>${amp.toFixed(3)}</td></tr>`;
+    html += `<tr><td>|${label}⟩</td><td>${(p * 100).toFixed(2)}%</td><td>${amp.toFixed(3)}</td></tr>`;
   });
+
+  // The states left out of the top k share whatever probability remains
+  const others = 2 ** circuit.numQubits - entries.length;
+  if (others > 0) {
+    const rest = Math.max(0, 1 - entries.reduce((sum, s) => sum + s.probability, 0));
+    html += `<tr><td>${others} other states</td><td>${(rest * 100).toFixed(2)}%</td><td>–</td></tr>`;
+  }
   
   html += "</tbody></table>";
   tableDiv.innerHTML = html;
@@ -0,0 +1,5 @@
+"""Python tooling for QOSMOS circuits exported by the Quantum Circuit Builder."""
+
+from .sim import simulate, simulate_state, bloch_vectors, label_probabilities
+
+__all__ = ["simulate", "simulate_state", "bloch_vectors", "label_probabilities"]
@@ -0,0 +1,241 @@
+"""Batch-simulates exported circuit documents.
+
+Reads NDJSON in the shape ``saveCircuit`` writes to the ``circuits``
+collection (``name``, ``qubits``, ``gates``, ``language``, ...) and
+writes one NDJSON result per document. Documents are sent to a process
+pool in chunks. Each finished chunk is appended to the output, and its
+line numbers are then appended to the resume file, so rerunning the
+same command after a crash skips everything already written.
+
+Documents wider than ``--max-qubits`` are not simulated. Clifford-only
+ones are reported as skipped ``"stabilizer"`` and others up to 128
+qubits as skipped ``"mps"``, after the app backend that runs them. A
+document that runs out of memory, or whose worker process dies, fails
+on its own without stopping the run.
+
+Usage::
+
+    python -m qosmos.batch circuits.ndjson -o results.ndjson
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from .sim import MAX_QUBITS, label_probabilities, simulate
+
+DEFAULT_CHUNK_SIZE = 64
+
+# A 24-qubit state takes 256 MiB, and each gate's tensordot holds about
+# three such buffers at once, in every worker process
+DEFAULT_MAX_QUBITS = 24
+
+# Widths the app handles on its other backends, as in quantum-engine.js
+CLIFFORD_GATES = {"h", "x", "y", "z", "s", "cx", "cz", "swap", "measure"}
+MAX_STABILIZER_QUBITS = 1024
+MAX_MPS_QUBITS = 128
+
+WORKER_DIED = "WorkerDied: the worker process exited, possibly out of memory"
+
+# Probability maps grow as 2^n; wider circuits report Bloch vectors only
+MAX_LABELLED_QUBITS = 10
+
+
+def wide_backend(document, qubits):
+    """The app backend for a document too wide to simulate here, or None
+    if the app cannot run it either."""
+    if all(gate["gate"] in CLIFFORD_GATES for gate in document.get("gates", [])):
+        return "stabilizer" if qubits <= MAX_STABILIZER_QUBITS else None
+    return "mps" if qubits <= MAX_MPS_QUBITS else None
+
+
+def simulate_document(line_number, line, max_qubits=DEFAULT_MAX_QUBITS):
+    started = time.perf_counter()
+    result = {"line": line_number}
+    try:
+        document = json.loads(line)
+        for key in ("id", "_id", "name", "language"):
+            if key in document:
+                result[key] = document[key]
+        qubits = int(document["qubits"])
+        result["qubits"] = qubits
+        result["gates"] = len(document.get("gates", []))
+        # Checked before anything is allocated
+        if qubits > max_qubits:
+            backend = wide_backend(document, qubits)
+            if backend is None:
+                raise ValueError(f"Unsupported qubit count: {qubits}")
+            result["skipped"] = backend
+        else:
+            simulated = simulate(document)
+            if qubits <= MAX_LABELLED_QUBITS:
+                result["probabilities"] = label_probabilities(simulated["probabilities"])
+            result["blochVectors"] = simulated["bloch_vectors"]
+    except (ValueError, KeyError, TypeError, MemoryError) as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+    result["durationMs"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def simulate_chunk(chunk, max_qubits=DEFAULT_MAX_QUBITS):
+    """Runs in a worker process; chunk is a list of (line_number, line)."""
+    return [simulate_document(line_number, line, max_qubits) for line_number, line in chunk]
+
+
+def rerun_isolated(chunk, max_qubits):
+    """Reruns a chunk whose pool broke one document at a time in a single
+    worker, so only the document whose process dies is marked failed."""
+    results = []
+    executor = ProcessPoolExecutor(max_workers=1)
+    try:
+        for line_number, line in chunk:
+            try:
+                results.append(executor.submit(simulate_document, line_number, line, max_qubits).result())
+            except BrokenProcessPool:
+                results.append({"line": line_number, "error": WORKER_DIED})
+                executor.shutdown()
+                executor = ProcessPoolExecutor(max_workers=1)
+    finally:
+        executor.shutdown()
+    return results
+
+
+def read_resume(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {int(line) for line in f if line.strip()}
+
+
+def pending_chunks(path, done, chunk_size):
+    chunk = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip() or line_number in done:
+                continue
+            chunk.append((line_number, line))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def count_documents(path):
+    with open(path) as f:
+        return sum(1 for line in f if line.strip())
+
+
+def run(input_path, output_path, resume_path=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+        progress=sys.stderr, max_qubits=DEFAULT_MAX_QUBITS):
+    """Simulates every pending document.
+
+    Returns (simulated, failed, skipped) counts for this run, where
+    skipped maps the app backend of each too-wide document ("stabilizer"
+    or "mps") to a count.
+    """
+    done = read_resume(resume_path)
+    total = count_documents(input_path)
+    completed = len(done)
+    simulated = failed = 0
+    skipped = {"stabilizer": 0, "mps": 0}
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    chunks = {}
+
+    def report(final=False):
+        if progress:
+            end = "\n" if final else ""
+            wide = ", ".join(f"{count} {backend}" for backend, count in skipped.items() if count)
+            print(f"\r{completed}/{total} circuits, {failed} failed" + (f", skipped {wide}" if wide else ""),
+                  end=end, file=progress, flush=True)
+
+    def collect(finished):
+        nonlocal completed, simulated, failed, executor
+        for future in finished:
+            chunk = chunks.pop(future)
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                # A dead worker breaks the whole pool and every chunk in it
+                executor.shutdown(wait=False)
+                executor = ProcessPoolExecutor(max_workers=workers)
+                results = rerun_isolated(chunk, max_qubits)
+            write_results(results, output, resume)
+            completed += len(results)
+            for result in results:
+                if "error" in result:
+                    failed += 1
+                elif "skipped" in result:
+                    skipped[result["skipped"]] += 1
+                else:
+                    simulated += 1
+
+    def submit(chunk):
+        future = executor.submit(simulate_chunk, chunk, max_qubits)
+        chunks[future] = chunk
+        return future
+
+    try:
+        with open(output_path, "a") as output, open(resume_path or os.devnull, "a") as resume:
+            # Twice as many chunks in flight as workers keeps every process
+            # busy without reading the whole export into memory
+            in_flight = set()
+            report()
+            for chunk in pending_chunks(input_path, done, chunk_size):
+                in_flight.add(submit(chunk))
+                if len(in_flight) >= 2 * workers:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                    report()
+            collect(wait(in_flight).done)
+            report(final=True)
+    finally:
+        executor.shutdown()
+
+    return simulated, failed, skipped
+
+
+def write_results(results, output, resume):
+    # Results reach the disk before the resume file lists them, so a crash
+    # can at worst repeat a chunk, never lose one
+    for result in results:
+        output.write(json.dumps(result) + "\n")
+    output.flush()
+    os.fsync(output.fileno())
+    resume.write("".join(f"{result['line']}\n" for result in results))
+    resume.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m qosmos.batch", description=__doc__.split("\n")[0])
+    parser.add_argument("input", help="NDJSON file of exported circuit documents")
+    parser.add_argument("-o", "--output", required=True, help="NDJSON file to append results to")
+    parser.add_argument("--resume", help="progress file (default: OUTPUT.resume)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"documents per work item (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--max-qubits", type=int, default=DEFAULT_MAX_QUBITS,
+                        help="widest document to simulate; each worker needs about 48 * 2^n bytes "
+                             f"(default: {DEFAULT_MAX_QUBITS}, at most {MAX_QUBITS})")
+    parser.add_argument("--quiet", action="store_true", help="hide the progress counter")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if not 1 <= args.max_qubits <= MAX_QUBITS:
+        parser.error(f"--max-qubits must be between 1 and {MAX_QUBITS}")
+    resume = args.resume or f"{args.output}.resume"
+    simulated, failed, skipped = run(args.input, args.output, resume, args.workers, args.chunk_size,
+                                     progress=None if args.quiet else sys.stderr, max_qubits=args.max_qubits)
+    wide = ", ".join(f"{count} {backend}" for backend, count in skipped.items())
+    print(f"Simulated {simulated} circuits ({failed} failed, skipped {wide}) into {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
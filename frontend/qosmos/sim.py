@@ -0,0 +1,237 @@
+"""Reference statevector simulator for builder circuits.
+
+Takes the same circuit JSON the app simulates and saves,
+``{"qubits": n, "gates": [{"gate", "qubit", "column", "params"}]}``, and
+follows the conventions of ``quantum-engine.js``:
+
+- qubit 0 is the most significant bit of a basis label
+- two-qubit gates act on ``(qubit, qubit + 1)`` with ``qubit`` as control
+- rotations read ``params.angle`` in radians and default to pi/2
+- gates run in column order, then by qubit
+- a ``measure`` with no later gate on its qubit is terminal and leaves the
+  state alone; one followed by gates collapses the state, and the result
+  mixes both outcomes by their probabilities. The engine samples those
+  branches, or computes the mixture exactly on its density backend.
+
+The state is a ``(2,) * n`` tensor and each gate is one ``tensordot``
+over the axes it touches, with no Python loop over amplitudes. The code
+is short enough to audit, so use it as the ground truth for the
+JavaScript engine and the generated code.
+
+Usage::
+
+    python -m qosmos circuit.json
+"""
+
+import json
+import sys
+
+import numpy as np
+
+INV_SQRT2 = 1 / np.sqrt(2)
+
+FIXED_GATES = {
+    "h": np.array([[1, 1], [1, -1]], dtype=complex) * INV_SQRT2,
+    "x": np.array([[0, 1], [1, 0]], dtype=complex),
+    "y": np.array([[0, -1j], [1j, 0]], dtype=complex),
+    "z": np.array([[1, 0], [0, -1]], dtype=complex),
+    "s": np.array([[1, 0], [0, 1j]], dtype=complex),
+    "t": np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=complex),
+}
+
+# Basis |q, q + 1> with q as the high bit, reshaped to (2, 2, 2, 2)
+TWO_QUBIT_GATES = {
+    "cx": np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]], dtype=complex),
+    "cz": np.diag([1, 1, 1, -1]).astype(complex),
+    "swap": np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=complex),
+}
+TWO_QUBIT_GATES = {name: matrix.reshape(2, 2, 2, 2) for name, matrix in TWO_QUBIT_GATES.items()}
+
+# The engine's typed arrays cap out at 30 qubits; a dense complex128
+# tensor that size needs 16 GiB
+MAX_QUBITS = 30
+
+# Each mid-circuit measurement can double the branches; outcomes less
+# likely than BRANCH_EPSILON are dropped
+MAX_BRANCHES = 4096
+BRANCH_EPSILON = 1e-12
+
+
+def gate_angle(gate):
+    try:
+        angle = float((gate.get("params") or {}).get("angle"))
+    except (TypeError, ValueError):
+        return np.pi / 2
+    return angle if np.isfinite(angle) else np.pi / 2
+
+
+def gate_matrix(gate):
+    name = gate["gate"]
+    if name in FIXED_GATES:
+        return FIXED_GATES[name]
+
+    half = gate_angle(gate) / 2
+    c, s = np.cos(half), np.sin(half)
+    if name == "rx":
+        return np.array([[c, -1j * s], [-1j * s, c]])
+    if name == "ry":
+        return np.array([[c, -s], [s, c]], dtype=complex)
+    if name == "rz":
+        return np.array([[np.exp(-1j * half), 0], [0, np.exp(1j * half)]])
+    raise ValueError(f"Unsupported gate: {name}")
+
+
+def order_gates(gates):
+    return sorted(gates, key=lambda gate: (gate.get("column", 0), gate["qubit"]))
+
+
+def apply_gate(state, gate):
+    """Applies one gate to a ``(2,) * n`` state tensor and returns the result."""
+    n = state.ndim
+    q = gate["qubit"]
+    name = gate["gate"]
+    if q >= n:
+        raise ValueError(f"Gate {name} targets missing qubit {q}")
+
+    if name == "measure":
+        # Terminal; mid-circuit measurements go through measure_branches
+        return state
+    if name in TWO_QUBIT_GATES:
+        # Matches code generation: a pair gate on the last wire is dropped
+        if q + 1 >= n:
+            return state
+        state = np.tensordot(TWO_QUBIT_GATES[name], state, axes=([2, 3], [q, q + 1]))
+        return np.moveaxis(state, [0, 1], [q, q + 1])
+
+    state = np.tensordot(gate_matrix(gate), state, axes=([1], [q]))
+    return np.moveaxis(state, 0, q)
+
+
+def mid_circuit_measurements(gates, n):
+    """Indices of the measurements in ``gates`` that a later gate follows on
+    the same qubit, as in the engine's splitAtMidCircuitMeasurements."""
+    last_use = [-1] * n
+    for i, gate in enumerate(gates):
+        q = gate["qubit"]
+        if gate["gate"] == "measure" or q >= n:
+            continue
+        last_use[q] = i
+        if gate["gate"] in TWO_QUBIT_GATES and q + 1 < n:
+            last_use[q + 1] = i
+    return {
+        i for i, gate in enumerate(gates)
+        if gate["gate"] == "measure" and gate["qubit"] < n and last_use[gate["qubit"]] > i
+    }
+
+
+def measure_branches(state, qubit):
+    """Collapses ``qubit`` and returns ``(probability, state)`` per outcome,
+    each state normalized."""
+    branches = []
+    for outcome in (0, 1):
+        collapsed = np.zeros_like(state)
+        index = (slice(None),) * qubit + (outcome,)
+        collapsed[index] = state[index]
+        p = float(np.vdot(collapsed, collapsed).real)
+        if p > BRANCH_EPSILON:
+            branches.append((p, collapsed / np.sqrt(p)))
+    return branches
+
+
+def initial_state(circuit):
+    n = int(circuit["qubits"])
+    if not 1 <= n <= MAX_QUBITS:
+        raise ValueError(f"Unsupported qubit count: {n}")
+    state = np.zeros((2,) * n, dtype=complex)
+    state[(0,) * n] = 1
+    return state
+
+
+def simulate_branches(circuit):
+    """Returns the outcome branches as ``(weight, state)`` pairs.
+
+    A circuit without mid-circuit measurements has one branch of weight 1.
+    """
+    branches = [(1.0, initial_state(circuit))]
+    gates = order_gates(circuit.get("gates", []))
+    collapsing = mid_circuit_measurements(gates, branches[0][1].ndim)
+    for i, gate in enumerate(gates):
+        if i not in collapsing:
+            branches = [(weight, apply_gate(state, gate)) for weight, state in branches]
+            continue
+        branches = [
+            (weight * p, collapsed)
+            for weight, state in branches
+            for p, collapsed in measure_branches(state, gate["qubit"])
+        ]
+        if len(branches) > MAX_BRANCHES:
+            raise ValueError(f"Mid-circuit measurements split the state into more than {MAX_BRANCHES} branches")
+    return branches
+
+
+def simulate_state(circuit):
+    """Returns the final state as a ``(2,) * n`` complex tensor.
+
+    Mid-circuit measurements leave a mixture rather than one state, so
+    such circuits raise ``ValueError``; ``simulate`` handles them.
+    """
+    if mid_circuit_measurements(order_gates(circuit.get("gates", [])), int(circuit["qubits"])):
+        raise ValueError("Circuit has mid-circuit measurements; its final state is a mixture")
+    return simulate_branches(circuit)[0][1]
+
+
+def bloch_vectors(state):
+    """Per-qubit Bloch vectors from the reduced density matrices.
+
+    Entangled qubits come out with length below 1, as in the app.
+    """
+    vectors = []
+    for q in range(state.ndim):
+        rows = np.moveaxis(state, q, 0).reshape(2, -1)
+        rho = np.einsum("ik,jk->ij", rows, rows.conj())
+        vectors.append({
+            "x": float(2 * rho[0, 1].real),
+            "y": float(-2 * rho[0, 1].imag),
+            "z": float((rho[0, 0] - rho[1, 1]).real),
+        })
+    return vectors
+
+
+def label_probabilities(probabilities):
+    """Maps basis labels such as ``'01'`` to probabilities, like the engine."""
+    n = int(np.log2(len(probabilities)))
+    return {format(index, f"0{n}b"): float(p) for index, p in enumerate(probabilities)}
+
+
+def simulate(circuit):
+    """Simulates a builder circuit.
+
+    Returns a dict with ``probabilities`` (a flat array indexed by basis
+    state) and ``bloch_vectors`` (one ``{x, y, z}`` dict per qubit). After
+    mid-circuit measurements both are averaged over the outcome branches.
+    """
+    branches = simulate_branches(circuit)
+    probabilities = sum(weight * np.abs(state.reshape(-1)) ** 2 for weight, state in branches)
+    vectors = [{"x": 0.0, "y": 0.0, "z": 0.0} for _ in range(branches[0][1].ndim)]
+    for weight, state in branches:
+        for total, vector in zip(vectors, bloch_vectors(state)):
+            for axis in total:
+                total[axis] += weight * vector[axis]
+    return {"probabilities": probabilities, "bloch_vectors": vectors}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m qosmos CIRCUIT.json", file=sys.stderr)
+        return 2
+
+    with open(argv[0]) as f:
+        circuit = json.load(f)
+    result = simulate(circuit)
+    json.dump({
+        "probabilities": label_probabilities(result["probabilities"]),
+        "blochVectors": result["bloch_vectors"],
+    }, sys.stdout, indent=2)
+    print()
+    return 0
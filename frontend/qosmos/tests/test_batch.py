@@ -0,0 +1,71 @@
+"""Checks that batch runs record wide, failing and crashing documents
+per line instead of stopping."""
+
+import json
+import os
+
+from qosmos import batch
+
+
+def document(qubits, gates, **fields):
+    return {"qubits": qubits, "gates": [{"gate": g, "qubit": 0, "column": c, "params": {}} for c, g in enumerate(gates)],
+            **fields}
+
+
+def run_documents(tmp_path, documents, **options):
+    source = tmp_path / "circuits.ndjson"
+    source.write_text("".join(json.dumps(d) + "\n" for d in documents))
+    output = tmp_path / "results.ndjson"
+    counts = batch.run(source, output, tmp_path / "results.resume", workers=2, chunk_size=2, progress=None, **options)
+    results = sorted((json.loads(line) for line in output.read_text().splitlines()), key=lambda r: r["line"])
+    return counts, results
+
+
+simulate_document = batch.simulate_document
+
+
+def dying_simulate_document(line_number, line, max_qubits=batch.DEFAULT_MAX_QUBITS):
+    if "crash" in line:
+        os._exit(1)
+    return simulate_document(line_number, line, max_qubits)
+
+
+def test_wide_documents_are_skipped_by_backend(tmp_path):
+    documents = [
+        document(2, ["h"]),
+        document(40, ["h", "cx", "measure"]),
+        document(40, ["h", "t"]),
+        document(200, ["h", "t"]),
+    ]
+    (simulated, failed, skipped), results = run_documents(tmp_path, documents, max_qubits=10)
+    assert (simulated, failed, skipped) == (1, 1, {"stabilizer": 1, "mps": 1})
+    assert "blochVectors" in results[0]
+    assert results[1]["skipped"] == "stabilizer"
+    assert results[2]["skipped"] == "mps"
+    assert results[3]["error"] == "ValueError: Unsupported qubit count: 200"
+
+
+def test_max_qubits_is_checked_before_simulating(tmp_path):
+    (_, failed, skipped), results = run_documents(tmp_path, [document(3, ["t"]), document(4, ["t"])], max_qubits=3)
+    assert failed == 0 and skipped["mps"] == 1
+    assert "blochVectors" in results[0] and "blochVectors" not in results[1]
+
+
+def test_memory_error_fails_only_that_document(monkeypatch):
+    def out_of_memory(_):
+        raise MemoryError("state too large")
+
+    monkeypatch.setattr(batch, "simulate", out_of_memory)
+    result = batch.simulate_document(1, json.dumps(document(2, ["h"], id="a")))
+    assert result["id"] == "a"
+    assert result["error"] == "MemoryError: state too large"
+
+
+def test_dead_worker_fails_only_its_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "simulate_document", dying_simulate_document)
+    documents = [document(1, ["h"], name=name) for name in ("a", "b", "crash", "c", "d")]
+    (simulated, failed, _), results = run_documents(tmp_path, documents)
+    assert (simulated, failed) == (4, 1)
+    assert [r["line"] for r in results] == [1, 2, 3, 4, 5]
+    assert results[2]["error"] == batch.WORKER_DIED
+    assert all("blochVectors" in r for i, r in enumerate(results) if i != 2)
@@ -0,0 +1,117 @@
+"""Checks the reference simulator against quantum-engine.js.
+
+Engine results come from Node, so those cases skip where it is missing.
+Circuits with mid-circuit measurements are compared with the engine's
+density backend, which mixes the outcomes exactly instead of sampling.
+"""
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from qosmos.sim import label_probabilities, simulate, simulate_state
+
+ENGINE = Path(__file__).resolve().parents[2] / "quantum-engine.js"
+
+ENGINE_SCRIPT = """
+const { QuantumSimulator } = require(process.argv[1]);
+const { circuit, backend } = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const result = new QuantumSimulator({ backend }).run(circuit);
+console.log(JSON.stringify({ probabilities: result.probabilities, blochVectors: result.blochVectors }));
+"""
+
+requires_node = pytest.mark.skipif(shutil.which("node") is None, reason="Node is needed to run the engine")
+
+
+def gate(name, qubit, column, angle=None):
+    params = {} if angle is None else {"angle": angle}
+    return {"gate": name, "qubit": qubit, "column": column, "params": params}
+
+
+CIRCUITS = {
+    "bell": {"qubits": 2, "gates": [gate("h", 0, 0), gate("cx", 0, 1)]},
+    "ghz with terminal measurements": {
+        "qubits": 3,
+        "gates": [gate("h", 0, 0), gate("cx", 0, 1), gate("cx", 1, 2)] + [gate("measure", q, 3) for q in range(3)],
+    },
+    "every gate type": {
+        "qubits": 3,
+        "gates": [
+            gate("h", 0, 0), gate("y", 1, 0), gate("rx", 2, 0, 0.3),
+            gate("ry", 0, 1, 1.1), gate("s", 1, 1), gate("t", 2, 1),
+            gate("cz", 0, 2), gate("rz", 2, 2, -0.7),
+            gate("swap", 1, 3), gate("x", 0, 3),
+            gate("cx", 2, 4), gate("rx", 0, 4),
+        ],
+    },
+    "unordered gates": {"qubits": 2, "gates": [gate("cx", 0, 1), gate("ry", 1, 0, 0.4), gate("h", 0, 0)]},
+}
+
+MID_CIRCUIT = {
+    "h measure h": {"qubits": 1, "gates": [gate("h", 0, 0), gate("measure", 0, 1), gate("h", 0, 2)]},
+    "measured control": {
+        "qubits": 3,
+        "gates": [gate("ry", 0, 0, 1.2), gate("measure", 0, 1), gate("cx", 0, 2), gate("h", 2, 2), gate("cx", 1, 3)],
+    },
+    "two measurements": {
+        "qubits": 2,
+        "gates": [
+            gate("h", 0, 0), gate("cx", 0, 1), gate("measure", 1, 2),
+            gate("rx", 1, 3, 0.9), gate("measure", 0, 3), gate("h", 0, 4), gate("cz", 0, 5),
+        ],
+    },
+}
+
+
+def run_engine(circuit, backend):
+    completed = subprocess.run(
+        ["node", "-e", ENGINE_SCRIPT, str(ENGINE)],
+        input=json.dumps({"circuit": circuit, "backend": backend}),
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def assert_matches_engine(circuit, backend):
+    expected = run_engine(circuit, backend)
+    result = simulate(circuit)
+    probabilities = label_probabilities(result["probabilities"])
+    assert probabilities.keys() == expected["probabilities"].keys()
+    for label, p in expected["probabilities"].items():
+        assert probabilities[label] == pytest.approx(p, abs=1e-9)
+    for vector, engine_vector in zip(result["bloch_vectors"], expected["blochVectors"]):
+        for axis in "xyz":
+            assert vector[axis] == pytest.approx(engine_vector[axis], abs=1e-9)
+
+
+@requires_node
+@pytest.mark.parametrize("name", CIRCUITS)
+def test_matches_engine_statevector(name):
+    assert_matches_engine(CIRCUITS[name], "statevector")
+
+
+@requires_node
+@pytest.mark.parametrize("name", MID_CIRCUIT)
+def test_mid_circuit_measurement_matches_engine_density(name):
+    assert_matches_engine(MID_CIRCUIT[name], "density")
+
+
+def test_mid_circuit_measurement_mixes_outcomes():
+    result = simulate(MID_CIRCUIT["h measure h"])
+    np.testing.assert_allclose(result["probabilities"], [0.5, 0.5])
+    assert result["bloch_vectors"][0]["x"] == pytest.approx(0)
+
+
+def test_terminal_measurement_leaves_state():
+    circuit = {"qubits": 1, "gates": [gate("h", 0, 0), gate("measure", 0, 1)]}
+    assert simulate(circuit)["bloch_vectors"][0]["x"] == pytest.approx(1)
+    np.testing.assert_allclose(simulate_state(circuit).reshape(-1), [2 ** -0.5, 2 ** -0.5])
+
+
+def test_simulate_state_rejects_mid_circuit_measurement():
+    with pytest.raises(ValueError, match="mid-circuit"):
+        simulate_state(MID_CIRCUIT["h measure h"])
@@ -0,0 +1,5028 @@
+// Quantum Computing Platform - Statevector Simulation Engine
+//
+// Amplitudes live in a single interleaved Float64Array (re, im, re, im, ...)
+// and gates are applied in place with stride loops, so no per-amplitude
+// objects are allocated. Qubit 0 is the most significant bit of the basis
+// index, matching the |q0 q1 ... qn⟩ labels used throughout the platform.
+
+// ==========================================
+// GATE MATRICES
+// ==========================================
+
+const ENGINE_INV_SQRT2 = 1 / Math.sqrt(2);
+
+// 2x2 matrices flattened as [re00, im00, re01, im01, re10, im10, re11, im11]
+const FIXED_GATE_MATRICES = {
+    h: new Float64Array([ENGINE_INV_SQRT2, 0, ENGINE_INV_SQRT2, 0, ENGINE_INV_SQRT2, 0, -ENGINE_INV_SQRT2, 0]),
+    x: new Float64Array([0, 0, 1, 0, 1, 0, 0, 0]),
+    y: new Float64Array([0, 0, 0, -1, 0, 1, 0, 0]),
+    z: new Float64Array([1, 0, 0, 0, 0, 0, -1, 0]),
+    s: new Float64Array([1, 0, 0, 0, 0, 0, 0, 1]),
+    t: new Float64Array([1, 0, 0, 0, 0, 0, ENGINE_INV_SQRT2, ENGINE_INV_SQRT2])
+};
+
+const MAX_ENGINE_QUBITS = 30;
+
+// Reduced density matrices are traced 2^12 amplitudes (64 KB) at a time
+const RDM_TILE_BITS = 12;
+
+// Default cap on simulation buffers; deployments can pass their own budget
+const DEFAULT_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024;
+const BYTES_PER_AMPLITUDE = 16;
+const BYTES_PER_PROBABILITY = 8;
+
+// Gates the stabilizer backend can simulate exactly
+const CLIFFORD_GATES = new Set(['h', 'x', 'y', 'z', 's', 'cx', 'cz', 'swap', 'measure']);
+const MAX_STABILIZER_QUBITS = 1024;
+const DEFAULT_SHOTS = 1024;
+
+// Stabilizer results list every basis state up to this size, zeros included
+const MAX_LABELLED_QUBITS = 10;
+const MAX_EXACT_SUPPORT_BITS = 12;
+
+function isCliffordCircuit(gates) {
+    return gates.every(gate => CLIFFORD_GATES.has(gate.gate));
+}
+
+// Seedable PRNG (mulberry32); falls back to Math.random without a seed
+function createRandom(seed) {
+    if (seed === undefined || seed === null) return Math.random;
+
+    let a = seed >>> 0;
+    return () => {
+        a = (a + 0x6D2B79F5) >>> 0;
+        let t = a;
+        t = Math.imul(t ^ (t >>> 15), t | 1);
+        t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+
+function formatBytes(bytes) {
+    if (bytes >= 1024 * 1024 * 1024) return `${(bytes / (1024 * 1024 * 1024)).toFixed(1)} GB`;
+    if (bytes >= 1024 * 1024) return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+    if (bytes >= 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+    return `${bytes} B`;
+}
+
+function gateAngle(gate) {
+    const angle = parseFloat(gate.params?.angle);
+    return Number.isFinite(angle) ? angle : Math.PI / 2;
+}
+
+function gateMatrix(gate) {
+    if (FIXED_GATE_MATRICES[gate.gate]) {
+        return FIXED_GATE_MATRICES[gate.gate];
+    }
+
+    const half = gateAngle(gate) / 2;
+    const c = Math.cos(half);
+    const s = Math.sin(half);
+
+    switch (gate.gate) {
+        case 'rx':
+            return new Float64Array([c, 0, 0, -s, 0, -s, c, 0]);
+        case 'ry':
+            return new Float64Array([c, 0, -s, 0, s, 0, c, 0]);
+        case 'rz':
+            return new Float64Array([c, -s, 0, 0, 0, 0, c, s]);
+        default:
+            throw new Error(`Unsupported gate: ${gate.gate}`);
+    }
+}
+
+// ==========================================
+// GATE FUSION
+// ==========================================
+
+// 4x4 matrices act on |a b⟩ for the wire pair (qubit, qubit + 1), with the
+// lower wire as the high bit, flattened row-major as interleaved re/im pairs
+const TWO_QUBIT_GATE_MATRICES = {
+    cx: [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]],
+    cz: [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, -1]],
+    swap: [[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]]
+};
+
+const IDENTITY_2X2 = new Float64Array([1, 0, 0, 0, 0, 0, 1, 0]);
+
+// Below this width a sweep is cheaper than building the fused matrices
+const FUSION_MIN_QUBITS = 10;
+
+// Up to this width a noiseless dense run skips backend selection, caches,
+// SIMD dispatch and fusion, whose fixed cost exceeds the sweeps themselves
+const SMALL_CIRCUIT_QUBITS = 8;
+
+// Circuit order: by column, then top to bottom within a column
+function byPosition(a, b) {
+    return a.column - b.column || a.qubit - b.qubit;
+}
+
+// Whether a gate sweeps the state; measurements and dangling pairs are free
+function sweepsState(gate, qubits) {
+    switch (gate.gate) {
+        case 'measure':
+            return false;
+        case 'cx':
+        case 'cz':
+        case 'swap':
+            return gate.qubit + 1 < qubits;
+        default:
+            return true;
+    }
+}
+
+function twoQubitMatrix(gate) {
+    const rows = TWO_QUBIT_GATE_MATRICES[gate.gate];
+    const m = new Float64Array(32);
+    for (let i = 0; i < 4; i++) {
+        for (let j = 0; j < 4; j++) m[2 * (4 * i + j)] = rows[i][j];
+    }
+    return m;
+}
+
+// Complex product a * b of two dim x dim interleaved matrices
+function multiplyMatrices(a, b, dim) {
+    const out = new Float64Array(2 * dim * dim);
+    for (let i = 0; i < dim; i++) {
+        for (let j = 0; j < dim; j++) {
+            let re = 0, im = 0;
+            for (let k = 0; k < dim; k++) {
+                const p = 2 * (dim * i + k), q = 2 * (dim * k + j);
+                re += a[p] * b[q] - a[p + 1] * b[q + 1];
+                im += a[p] * b[q + 1] + a[p + 1] * b[q];
+            }
+            out[2 * (dim * i + j)] = re;
+            out[2 * (dim * i + j) + 1] = im;
+        }
+    }
+    return out;
+}
+
+// high ⊗ low for two 2x2 matrices
+function kron2x2(high, low) {
+    const out = new Float64Array(32);
+    for (let i = 0; i < 2; i++) {
+        for (let j = 0; j < 2; j++) {
+            for (let k = 0; k < 2; k++) {
+                for (let l = 0; l < 2; l++) {
+                    const p = 2 * (2 * i + j), q = 2 * (2 * k + l);
+                    const r = 2 * (4 * (2 * i + k) + 2 * j + l);
+                    out[r] = high[p] * low[q] - high[p + 1] * low[q + 1];
+                    out[r + 1] = high[p] * low[q + 1] + high[p + 1] * low[q];
+                }
+            }
+        }
+    }
+    return out;
+}
+
+function isDiagonal2x2(m) {
+    return m[2] === 0 && m[3] === 0 && m[4] === 0 && m[5] === 0;
+}
+
+// Folds each wire's run of single-qubit gates into one 2x2 matrix and each
+// run of gates on an adjacent wire pair into one 4x4 matrix, so the state is
+// swept once per fused block instead of once per gate. Blocks holding a
+// single gate keep that gate so its specialised kernel is still used.
+function fuseGates(orderedGates, numQubits) {
+    const ops = [];
+    const pending = new Array(numQubits).fill(null);
+    const lastOp = new Array(numQubits).fill(null);
+
+    const flush = (q) => {
+        if (pending[q]) {
+            ops.push(pending[q]);
+            lastOp[q] = pending[q];
+            pending[q] = null;
+        }
+    };
+
+    for (const gate of orderedGates) {
+        const q = gate.qubit;
+
+        if (gate.gate === 'measure') {
+            flush(q);
+            const op = { type: 'barrier', gates: [gate] };
+            ops.push(op);
+            lastOp[q] = op;
+            continue;
+        }
+
+        if (TWO_QUBIT_GATE_MATRICES[gate.gate]) {
+            if (q + 1 >= numQubits) continue;
+
+            let matrix = twoQubitMatrix(gate);
+            const gates = [];
+            if (pending[q] || pending[q + 1]) {
+                const high = pending[q] ? pending[q].matrix : IDENTITY_2X2;
+                const low = pending[q + 1] ? pending[q + 1].matrix : IDENTITY_2X2;
+                matrix = multiplyMatrices(matrix, kron2x2(high, low), 4);
+                if (pending[q]) gates.push(...pending[q].gates);
+                if (pending[q + 1]) gates.push(...pending[q + 1].gates);
+                pending[q] = null;
+                pending[q + 1] = null;
+            }
+            gates.push(gate);
+
+            const previous = lastOp[q];
+            if (previous && previous === lastOp[q + 1] && previous.type === 'pair' && previous.qubit === q) {
+                previous.matrix = multiplyMatrices(matrix, previous.matrix, 4);
+                previous.gates.push(...gates);
+            } else {
+                const op = { type: 'pair', qubit: q, matrix, gates };
+                ops.push(op);
+                lastOp[q] = op;
+                lastOp[q + 1] = op;
+            }
+            continue;
+        }
+
+        const matrix = gateMatrix(gate);
+        const previous = lastOp[q];
+        if (!pending[q] && previous && previous.type === 'pair') {
+            // Trailing gate on a wire whose latest block is a pair: fold it in
+            const expanded = previous.qubit === q
+                ? kron2x2(matrix, IDENTITY_2X2)
+                : kron2x2(IDENTITY_2X2, matrix);
+            previous.matrix = multiplyMatrices(expanded, previous.matrix, 4);
+            previous.gates.push(gate);
+        } else if (pending[q]) {
+            pending[q].matrix = multiplyMatrices(matrix, pending[q].matrix, 2);
+            pending[q].gates.push(gate);
+        } else {
+            pending[q] = { type: 'single', qubit: q, matrix, gates: [gate] };
+        }
+    }
+
+    for (let q = 0; q < numQubits; q++) flush(q);
+    return ops;
+}
+
+// ==========================================
+// STATEVECTOR
+// ==========================================
+
+class StateVector {
+    // `amplitudes` may supply zeroed storage, e.g. a WebAssembly memory view
+    constructor(numQubits, amplitudes = null) {
+        if (!Number.isInteger(numQubits) || numQubits < 1 || numQubits > MAX_ENGINE_QUBITS) {
+            throw new Error(`Unsupported qubit count: ${numQubits}`);
+        }
+
+        this.numQubits = numQubits;
+        this.size = 1 << numQubits;
+        this.amplitudes = amplitudes || new Float64Array(this.size * 2);
+        this.amplitudes[0] = 1;
+    }
+
+    get byteLength() {
+        return this.amplitudes.byteLength;
+    }
+
+    clone() {
+        const copy = new StateVector(this.numQubits);
+        copy.amplitudes.set(this.amplitudes);
+        return copy;
+    }
+
+    // Wraps an existing buffer (e.g. one slot of a batch) without copying
+    static fromAmplitudes(numQubits, amplitudes) {
+        const state = Object.create(StateVector.prototype);
+        state.numQubits = numQubits;
+        state.size = 1 << numQubits;
+        state.amplitudes = amplitudes;
+        return state;
+    }
+
+    bitMask(qubit) {
+        return 1 << (this.numQubits - 1 - qubit);
+    }
+
+    // Dense 2x2 gate: visit each (|..0..⟩, |..1..⟩) pair exactly once
+    applyMatrix(qubit, m) {
+        const amps = this.amplitudes;
+        const bit = this.bitMask(qubit);
+        const stride = bit * 2;
+        const ar = m[0], ai = m[1], br = m[2], bi = m[3];
+        const cr = m[4], ci = m[5], dr = m[6], di = m[7];
+
+        for (let block = 0; block < this.size; block += stride) {
+            const end = block + bit;
+            for (let i = block; i < end; i++) {
+                const p = 2 * i;
+                const q = 2 * (i + bit);
+                const xr = amps[p], xi = amps[p + 1];
+                const yr = amps[q], yi = amps[q + 1];
+
+                amps[p] = ar * xr - ai * xi + br * yr - bi * yi;
+                amps[p + 1] = ar * xi + ai * xr + br * yi + bi * yr;
+                amps[q] = cr * xr - ci * xi + dr * yr - di * yi;
+                amps[q + 1] = cr * xi + ci * xr + dr * yi + di * yr;
+            }
+        }
+    }
+
+    // Real-valued butterfly for the Hadamard gate
+    applyHadamard(qubit) {
+        const amps = this.amplitudes;
+        const bit = this.bitMask(qubit);
+        const stride = bit * 2;
+
+        for (let block = 0; block < this.size; block += stride) {
+            const end = block + bit;
+            for (let i = block; i < end; i++) {
+                const p = 2 * i;
+                const q = 2 * (i + bit);
+                const xr = amps[p], xi = amps[p + 1];
+                const yr = amps[q], yi = amps[q + 1];
+
+                amps[p] = ENGINE_INV_SQRT2 * (xr + yr);
+                amps[p + 1] = ENGINE_INV_SQRT2 * (xi + yi);
+                amps[q] = ENGINE_INV_SQRT2 * (xr - yr);
+                amps[q + 1] = ENGINE_INV_SQRT2 * (xi - yi);
+            }
+        }
+    }
+
+    // Pauli-X only permutes amplitudes
+    applyPauliX(qubit) {
+        const amps = this.amplitudes;
+        const bit = this.bitMask(qubit);
+        const stride = bit * 2;
+
+        for (let block = 0; block < this.size; block += stride) {
+            const end = block + bit;
+            for (let i = block; i < end; i++) {
+                const p = 2 * i;
+                const q = 2 * (i + bit);
+                const xr = amps[p], xi = amps[p + 1];
+                amps[p] = amps[q];
+                amps[p + 1] = amps[q + 1];
+                amps[q] = xr;
+                amps[q + 1] = xi;
+            }
+        }
+    }
+
+    // Diagonal gate: phases only, and the |0⟩ half is skipped when it is 1
+    applyDiagonal(qubit, m) {
+        const amps = this.amplitudes;
+        const bit = this.bitMask(qubit);
+        const stride = bit * 2;
+        const ar = m[0], ai = m[1], dr = m[6], di = m[7];
+
+        if (ar !== 1 || ai !== 0) {
+            for (let block = 0; block < this.size; block += stride) {
+                const end = 2 * (block + bit);
+                for (let p = 2 * block; p < end; p += 2) {
+                    const xr = amps[p], xi = amps[p + 1];
+                    amps[p] = ar * xr - ai * xi;
+                    amps[p + 1] = ar * xi + ai * xr;
+                }
+            }
+        }
+
+        for (let block = bit; block < this.size; block += stride) {
+            const end = 2 * (block + bit);
+            for (let q = 2 * block; q < end; q += 2) {
+                const yr = amps[q], yi = amps[q + 1];
+                amps[q] = dr * yr - di * yi;
+                amps[q + 1] = dr * yi + di * yr;
+            }
+        }
+    }
+
+    // Index of the k-th basis state whose bits at lowBit and highBit are 0
+    spreadIndex(k, lowBit, highBit) {
+        let i = k;
+        i = ((i & ~(lowBit - 1)) << 1) | (i & (lowBit - 1));
+        i = ((i & ~(highBit - 1)) << 1) | (i & (highBit - 1));
+        return i;
+    }
+
+    applyCX(control, target) {
+        const amps = this.amplitudes;
+        const cbit = this.bitMask(control);
+        const tbit = this.bitMask(target);
+        const low = Math.min(cbit, tbit);
+        const high = Math.max(cbit, tbit);
+        const quarter = this.size / 4;
+
+        for (let k = 0; k < quarter; k++) {
+            const i = this.spreadIndex(k, low, high) + cbit;
+            const p = 2 * i;
+            const q = 2 * (i + tbit);
+            const xr = amps[p], xi = amps[p + 1];
+            amps[p] = amps[q];
+            amps[p + 1] = amps[q + 1];
+            amps[q] = xr;
+            amps[q + 1] = xi;
+        }
+    }
+
+    applyCZ(control, target) {
+        const amps = this.amplitudes;
+        const cbit = this.bitMask(control);
+        const tbit = this.bitMask(target);
+        const low = Math.min(cbit, tbit);
+        const high = Math.max(cbit, tbit);
+        const quarter = this.size / 4;
+
+        for (let k = 0; k < quarter; k++) {
+            const p = 2 * (this.spreadIndex(k, low, high) + cbit + tbit);
+            amps[p] = -amps[p];
+            amps[p + 1] = -amps[p + 1];
+        }
+    }
+
+    applySwap(qubitA, qubitB) {
+        const amps = this.amplitudes;
+        const abit = this.bitMask(qubitA);
+        const bbit = this.bitMask(qubitB);
+        const low = Math.min(abit, bbit);
+        const high = Math.max(abit, bbit);
+        const quarter = this.size / 4;
+
+        for (let k = 0; k < quarter; k++) {
+            const base = this.spreadIndex(k, low, high);
+            const p = 2 * (base + abit);
+            const q = 2 * (base + bbit);
+            const xr = amps[p], xi = amps[p + 1];
+            amps[p] = amps[q];
+            amps[p + 1] = amps[q + 1];
+            amps[q] = xr;
+            amps[q + 1] = xi;
+        }
+    }
+
+    // Dense 4x4 block on |qubit, partner⟩ with qubit as the high bit; the
+    // partner defaults to the adjacent wire and must come after qubit.
+    // [from, to) limits the sweep to some of the size / 4 blocks.
+    applyMatrix4(qubit, m, partner = qubit + 1, from = 0, to = this.size / 4) {
+        const amps = this.amplitudes;
+        const hbit = this.bitMask(qubit);
+        const lbit = this.bitMask(partner);
+        const o1 = 2 * lbit, o2 = 2 * hbit, o3 = o1 + o2;
+        const [a0, b0, a1, b1, a2, b2, a3, b3, c0, d0, c1, d1, c2, d2, c3, d3,
+            e0, f0, e1, f1, e2, f2, e3, f3, g0, h0, g1, h1, g2, h2, g3, h3] = m;
+
+        for (let k = from; k < to; k++) {
+            const p0 = 2 * this.spreadIndex(k, lbit, hbit);
+            const p1 = p0 + o1, p2 = p0 + o2, p3 = p0 + o3;
+            const r0 = amps[p0], i0 = amps[p0 + 1];
+            const r1 = amps[p1], i1 = amps[p1 + 1];
+            const r2 = amps[p2], i2 = amps[p2 + 1];
+            const r3 = amps[p3], i3 = amps[p3 + 1];
+
+            amps[p0] = a0 * r0 - b0 * i0 + a1 * r1 - b1 * i1 + a2 * r2 - b2 * i2 + a3 * r3 - b3 * i3;
+            amps[p0 + 1] = a0 * i0 + b0 * r0 + a1 * i1 + b1 * r1 + a2 * i2 + b2 * r2 + a3 * i3 + b3 * r3;
+            amps[p1] = c0 * r0 - d0 * i0 + c1 * r1 - d1 * i1 + c2 * r2 - d2 * i2 + c3 * r3 - d3 * i3;
+            amps[p1 + 1] = c0 * i0 + d0 * r0 + c1 * i1 + d1 * r1 + c2 * i2 + d2 * r2 + c3 * i3 + d3 * r3;
+            amps[p2] = e0 * r0 - f0 * i0 + e1 * r1 - f1 * i1 + e2 * r2 - f2 * i2 + e3 * r3 - f3 * i3;
+            amps[p2 + 1] = e0 * i0 + f0 * r0 + e1 * i1 + f1 * r1 + e2 * i2 + f2 * r2 + e3 * i3 + f3 * r3;
+            amps[p3] = g0 * r0 - h0 * i0 + g1 * r1 - h1 * i1 + g2 * r2 - h2 * i2 + g3 * r3 - h3 * i3;
+            amps[p3 + 1] = g0 * i0 + h0 * r0 + g1 * i1 + h1 * r1 + g2 * i2 + h2 * r2 + g3 * i3 + h3 * r3;
+        }
+    }
+
+    // Dense 2x2 gate on pairs k in [from, to) of the size / 2 pairs, so
+    // workers sharing one state can split a sweep between them
+    applyMatrixRange(qubit, m, from, to) {
+        const amps = this.amplitudes;
+        const bit = this.bitMask(qubit);
+        const ar = m[0], ai = m[1], br = m[2], bi = m[3];
+        const cr = m[4], ci = m[5], dr = m[6], di = m[7];
+
+        for (let k = from; k < to; k++) {
+            const p = 2 * (((k & ~(bit - 1)) << 1) | (k & (bit - 1)));
+            const q = p + 2 * bit;
+            const xr = amps[p], xi = amps[p + 1];
+            const yr = amps[q], yi = amps[q + 1];
+
+            amps[p] = ar * xr - ai * xi + br * yr - bi * yi;
+            amps[p + 1] = ar * xi + ai * xr + br * yi + bi * yr;
+            amps[q] = cr * xr - ci * xi + dr * yr - di * yi;
+            amps[q + 1] = cr * xi + ci * xr + dr * yi + di * yr;
+        }
+    }
+
+    probabilities() {
+        const amps = this.amplitudes;
+        const probs = new Float64Array(this.size);
+        for (let i = 0; i < this.size; i++) {
+            const re = amps[2 * i], im = amps[2 * i + 1];
+            probs[i] = re * re + im * im;
+        }
+        return probs;
+    }
+
+    scale(factor) {
+        const amps = this.amplitudes;
+        for (let i = 0; i < amps.length; i++) amps[i] *= factor;
+    }
+
+    // Squared norm of the state after applying a 2x2 (Kraus) operator
+    normAfter(qubit, m) {
+        const amps = this.amplitudes;
+        const bit = this.bitMask(qubit);
+        const ar = m[0], ai = m[1], br = m[2], bi = m[3];
+        const cr = m[4], ci = m[5], dr = m[6], di = m[7];
+        let norm = 0;
+
+        for (let block = 0; block < this.size; block += 2 * bit) {
+            const end = block + bit;
+            for (let i = block; i < end; i++) {
+                const xr = amps[2 * i], xi = amps[2 * i + 1];
+                const yr = amps[2 * (i + bit)], yi = amps[2 * (i + bit) + 1];
+                const ur = ar * xr - ai * xi + br * yr - bi * yi;
+                const ui = ar * xi + ai * xr + br * yi + bi * yr;
+                const vr = cr * xr - ci * xi + dr * yr - di * yi;
+                const vi = cr * xi + ci * xr + dr * yi + di * yr;
+                norm += ur * ur + ui * ui + vr * vr + vi * vi;
+            }
+        }
+        return norm;
+    }
+
+    // Probability that measuring the qubit gives 1
+    probabilityOfOne(qubit) {
+        const amps = this.amplitudes;
+        const bit = this.bitMask(qubit);
+        let p1 = 0;
+
+        for (let block = bit; block < this.size; block += 2 * bit) {
+            const end = block + bit;
+            for (let i = block; i < end; i++) {
+                const re = amps[2 * i], im = amps[2 * i + 1];
+                p1 += re * re + im * im;
+            }
+        }
+        return p1;
+    }
+
+    // Projects the qubit onto a measurement outcome and renormalises
+    collapse(qubit, outcome) {
+        const amps = this.amplitudes;
+        const bit = this.bitMask(qubit);
+        const p1 = this.probabilityOfOne(qubit);
+        const scale = 1 / Math.sqrt(outcome ? p1 : 1 - p1);
+
+        for (let block = 0; block < this.size; block += 2 * bit) {
+            const kept = outcome ? block + bit : block;
+            const dropped = outcome ? block : block + bit;
+            for (let i = 0; i < bit; i++) {
+                amps[2 * (kept + i)] *= scale;
+                amps[2 * (kept + i) + 1] *= scale;
+                amps[2 * (dropped + i)] = 0;
+                amps[2 * (dropped + i) + 1] = 0;
+            }
+        }
+    }
+
+    // 2x2 reduced density matrix of every qubit from one sweep of the
+    // state, packed per qubit as [rho00, rho11, Re rho01, Im rho01]. The
+    // sweep goes tile by tile: qubits whose partner amplitudes fall inside a
+    // tile are traced while it is in cache, and for the remaining high
+    // qubits the whole tile sits on one side, so only their coherences need
+    // a partner tile.
+    reducedDensityMatrices() {
+        const amps = this.amplitudes;
+        const n = this.numQubits;
+        const rho = new Float64Array(4 * n);
+        const tileBits = Math.min(n, RDM_TILE_BITS);
+        const tile = 1 << tileBits;
+        const highQubits = n - tileBits;
+
+        for (let base = 0; base < this.size; base += tile) {
+            let tileWeight = 0;
+            for (let q = highQubits; q < n; q++) {
+                const bit = this.bitMask(q);
+                let p0 = 0, p1 = 0, cohRe = 0, cohIm = 0;
+                for (let block = base; block < base + tile; block += 2 * bit) {
+                    const end = block + bit;
+                    for (let i = block; i < end; i++) {
+                        const xr = amps[2 * i], xi = amps[2 * i + 1];
+                        const yr = amps[2 * (i + bit)], yi = amps[2 * (i + bit) + 1];
+                        p0 += xr * xr + xi * xi;
+                        p1 += yr * yr + yi * yi;
+                        // rho01 = sum a0 * conj(a1)
+                        cohRe += xr * yr + xi * yi;
+                        cohIm += xi * yr - xr * yi;
+                    }
+                }
+                const k = 4 * q;
+                rho[k] += p0;
+                rho[k + 1] += p1;
+                rho[k + 2] += cohRe;
+                rho[k + 3] += cohIm;
+                tileWeight = p0 + p1;
+            }
+
+            for (let q = 0; q < highQubits; q++) {
+                const bit = this.bitMask(q);
+                const k = 4 * q;
+                if (base & bit) {
+                    rho[k + 1] += tileWeight;
+                    continue;
+                }
+                rho[k] += tileWeight;
+                let cohRe = 0, cohIm = 0;
+                for (let i = base; i < base + tile; i++) {
+                    const xr = amps[2 * i], xi = amps[2 * i + 1];
+                    const yr = amps[2 * (i + bit)], yi = amps[2 * (i + bit) + 1];
+                    cohRe += xr * yr + xi * yi;
+                    cohIm += xi * yr - xr * yi;
+                }
+                rho[k + 2] += cohRe;
+                rho[k + 3] += cohIm;
+            }
+        }
+        return rho;
+    }
+
+    // Bloch vectors of all qubits; entangled qubits are shorter than 1.
+    // Small registers are traced qubit by qubit straight into the vectors:
+    // the same sums in the same order, without the packed buffer, whose
+    // allocation costs more than the trace itself.
+    blochVectors() {
+        if (this.numQubits > SMALL_CIRCUIT_QUBITS) {
+            return blochVectorsFromRdm(this.reducedDensityMatrices());
+        }
+
+        const amps = this.amplitudes;
+        const half = this.size >> 1;
+        const vectors = [];
+        for (let q = 0; q < this.numQubits; q++) {
+            const bit = this.bitMask(q);
+            let p0 = 0, p1 = 0, cohRe = 0, cohIm = 0;
+            for (let k = 0; k < half; k++) {
+                const i = k + (k & -bit);
+                const xr = amps[2 * i], xi = amps[2 * i + 1];
+                const yr = amps[2 * (i + bit)], yi = amps[2 * (i + bit) + 1];
+                p0 += xr * xr + xi * xi;
+                p1 += yr * yr + yi * yi;
+                cohRe += xr * yr + xi * yi;
+                cohIm += xi * yr - xr * yi;
+            }
+            vectors.push({ x: 2 * cohRe, y: -2 * cohIm, z: p0 - p1 });
+        }
+        return vectors;
+    }
+
+}
+
+// Bloch vectors from reducedDensityMatrices()-packed [rho00, rho11, Re rho01, Im rho01]
+function blochVectorsFromRdm(rho) {
+    const vectors = [];
+    for (let k = 0; k < rho.length; k += 4) {
+        vectors.push({ x: 2 * rho[k + 2], y: -2 * rho[k + 3], z: rho[k] - rho[k + 1] });
+    }
+    return vectors;
+}
+
+// ==========================================
+// WEBASSEMBLY SIMD KERNELS
+// ==========================================
+
+// quantum-kernels.wasm addresses amplitudes with 32-bit byte offsets
+const MAX_SIMD_QUBITS = 27;
+const WASM_PAGE_BYTES = 64 * 1024;
+
+// Compiled kernel module, set once loadSimdKernels succeeds
+let simdKernelModule = null;
+
+// Compiles the SIMD gate kernels from a URL or the module bytes. Resolves
+// with false, and the JS kernels stay in use, when the bytes cannot be
+// fetched or the engine lacks 128-bit SIMD, which fails validation.
+async function loadSimdKernels(source = 'quantum-kernels.wasm') {
+    if (simdKernelModule) return true;
+    if (typeof WebAssembly === 'undefined') return false;
+
+    try {
+        const bytes = typeof source === 'string'
+            ? await (await fetch(source)).arrayBuffer()
+            : source;
+        if (!WebAssembly.validate(bytes)) return false;
+        simdKernelModule = await WebAssembly.compile(bytes);
+        return true;
+    } catch (error) {
+        return false;
+    }
+}
+
+function simdKernelsLoaded() {
+    return simdKernelModule !== null;
+}
+
+// Statevector held in its own WebAssembly memory. The 2x2, diagonal and
+// controlled gates run as f64x2 loops with one amplitude per vector; the
+// remaining methods are the inherited JS loops over the same memory view.
+class SimdStateVector extends StateVector {
+    constructor(numQubits) {
+        if (!simdKernelModule) {
+            throw new Error('SIMD kernels are not loaded');
+        }
+        if (!Number.isInteger(numQubits) || numQubits < 1 || numQubits > MAX_SIMD_QUBITS) {
+            throw new Error(`Unsupported qubit count for SIMD kernels: ${numQubits}`);
+        }
+
+        const bytes = 2 ** numQubits * BYTES_PER_AMPLITUDE;
+        const memory = new WebAssembly.Memory({ initial: Math.ceil(bytes / WASM_PAGE_BYTES) });
+        super(numQubits, new Float64Array(memory.buffer, 0, 2 ** (numQubits + 1)));
+        this.kernels = new WebAssembly.Instance(simdKernelModule, { env: { memory } }).exports;
+    }
+
+    clone() {
+        const copy = new SimdStateVector(this.numQubits);
+        copy.amplitudes.set(this.amplitudes);
+        return copy;
+    }
+
+    // Plain copy for results: a WebAssembly memory cannot be transferred
+    toStateVector() {
+        const state = new StateVector(this.numQubits);
+        state.amplitudes.set(this.amplitudes);
+        return state;
+    }
+
+    applyMatrix(qubit, m) {
+        this.kernels.apply_matrix(0, this.size, this.bitMask(qubit), m[0], m[1], m[2], m[3], m[4], m[5], m[6], m[7]);
+    }
+
+    applyHadamard(qubit) {
+        this.kernels.apply_hadamard(0, this.size, this.bitMask(qubit), ENGINE_INV_SQRT2);
+    }
+
+    applyDiagonal(qubit, m) {
+        this.kernels.apply_diagonal(0, this.size, this.bitMask(qubit), m[0], m[1], m[6], m[7]);
+    }
+
+    applyCX(control, target) {
+        this.kernels.apply_controlled(0, this.size, this.bitMask(control), this.bitMask(target), 0, 0, 1, 0, 1, 0, 0, 0);
+    }
+
+    applyCZ(control, target) {
+        this.kernels.apply_controlled_phase(0, this.size, this.bitMask(control), this.bitMask(target), -1, 0);
+    }
+}
+
+// ==========================================
+// STABILIZER TABLEAU (CHP)
+// ==========================================
+
+// Aaronson-Gottesman tableau: rows 0..n-1 are destabilizers, rows n..2n-1
+// stabilizers and row 2n is scratch space. Each row stores the X and Z bits
+// of a Pauli string plus a sign bit, so Clifford gates cost O(n) and
+// measurements O(n^2) instead of touching 2^n amplitudes.
+class StabilizerTableau {
+    constructor(numQubits) {
+        if (!Number.isInteger(numQubits) || numQubits < 1 || numQubits > MAX_STABILIZER_QUBITS) {
+            throw new Error(`Unsupported qubit count for stabilizer simulation: ${numQubits}`);
+        }
+
+        const n = numQubits;
+        this.numQubits = n;
+        this.rows = 2 * n + 1;
+        this.x = new Uint8Array(this.rows * n);
+        this.z = new Uint8Array(this.rows * n);
+        this.r = new Uint8Array(this.rows);
+
+        for (let i = 0; i < n; i++) {
+            this.x[i * n + i] = 1;
+            this.z[(i + n) * n + i] = 1;
+        }
+    }
+
+    static estimateMemoryBytes(qubits) {
+        return (2 * qubits + 1) * (2 * qubits + 1);
+    }
+
+    get byteLength() {
+        return this.x.byteLength + this.z.byteLength + this.r.byteLength;
+    }
+
+    clone() {
+        const copy = Object.create(StabilizerTableau.prototype);
+        copy.numQubits = this.numQubits;
+        copy.rows = this.rows;
+        copy.x = this.x.slice();
+        copy.z = this.z.slice();
+        copy.r = this.r.slice();
+        return copy;
+    }
+
+    applyH(a) {
+        const { x, z, r, numQubits: n } = this;
+        for (let row = 0; row < this.rows; row++) {
+            const k = row * n + a;
+            r[row] ^= x[k] & z[k];
+            const tmp = x[k];
+            x[k] = z[k];
+            z[k] = tmp;
+        }
+    }
+
+    applyS(a) {
+        const { x, z, r, numQubits: n } = this;
+        for (let row = 0; row < this.rows; row++) {
+            const k = row * n + a;
+            r[row] ^= x[k] & z[k];
+            z[k] ^= x[k];
+        }
+    }
+
+    // Paulis only flip signs: X anticommutes with Z and Y, Z with X and Y
+    applyPauli(a, flipsOnX, flipsOnZ) {
+        const { x, z, r, numQubits: n } = this;
+        for (let row = 0; row < this.rows; row++) {
+            const k = row * n + a;
+            r[row] ^= (flipsOnX & x[k]) ^ (flipsOnZ & z[k]);
+        }
+    }
+
+    applyCX(a, b) {
+        const { x, z, r, numQubits: n } = this;
+        for (let row = 0; row < this.rows; row++) {
+            const ka = row * n + a;
+            const kb = row * n + b;
+            r[row] ^= x[ka] & z[kb] & (x[kb] ^ z[ka] ^ 1);
+            x[kb] ^= x[ka];
+            z[ka] ^= z[kb];
+        }
+    }
+
+    applyCZ(a, b) {
+        this.applyH(b);
+        this.applyCX(a, b);
+        this.applyH(b);
+    }
+
+    applySwap(a, b) {
+        const { x, z, numQubits: n } = this;
+        for (let row = 0; row < this.rows; row++) {
+            const ka = row * n + a;
+            const kb = row * n + b;
+            let tmp = x[ka];
+            x[ka] = x[kb];
+            x[kb] = tmp;
+            tmp = z[ka];
+            z[ka] = z[kb];
+            z[kb] = tmp;
+        }
+    }
+
+    applyGate(gate) {
+        const q = gate.qubit;
+        switch (gate.gate) {
+            case 'h': this.applyH(q); break;
+            case 's': this.applyS(q); break;
+            case 'x': this.applyPauli(q, 0, 1); break;
+            case 'y': this.applyPauli(q, 1, 1); break;
+            case 'z': this.applyPauli(q, 1, 0); break;
+            case 'measure':
+                // Terminal measurements do not change the outcome distribution
+                break;
+            case 'cx':
+            case 'cz':
+            case 'swap':
+                if (q + 1 >= this.numQubits) break;
+                if (gate.gate === 'cx') this.applyCX(q, q + 1);
+                else if (gate.gate === 'cz') this.applyCZ(q, q + 1);
+                else this.applySwap(q, q + 1);
+                break;
+            default:
+                throw new Error(`Gate ${gate.gate} is not a Clifford gate`);
+        }
+    }
+
+    // Row h <- row i * row h, tracking the phase exponent mod 4
+    rowsum(h, i) {
+        const { x, z, r, numQubits: n } = this;
+        const hBase = h * n;
+        const iBase = i * n;
+        let phase = 2 * r[h] + 2 * r[i];
+
+        for (let j = 0; j < n; j++) {
+            const x1 = x[iBase + j], z1 = z[iBase + j];
+            const x2 = x[hBase + j], z2 = z[hBase + j];
+            if (x1 & z1) phase += z2 - x2;
+            else if (x1) phase += z2 * (2 * x2 - 1);
+            else if (z1) phase += x2 * (1 - 2 * z2);
+            x[hBase + j] = x2 ^ x1;
+            z[hBase + j] = z2 ^ z1;
+        }
+
+        r[h] = (((phase % 4) + 4) % 4) === 2 ? 1 : 0;
+    }
+
+    copyRow(target, source) {
+        const n = this.numQubits;
+        this.x.copyWithin(target * n, source * n, source * n + n);
+        this.z.copyWithin(target * n, source * n, source * n + n);
+        this.r[target] = this.r[source];
+    }
+
+    clearRow(row) {
+        const n = this.numQubits;
+        this.x.fill(0, row * n, row * n + n);
+        this.z.fill(0, row * n, row * n + n);
+        this.r[row] = 0;
+    }
+
+    // Z-basis measurement; random outcomes are drawn from random()
+    measure(a, random = Math.random) {
+        const { x, numQubits: n } = this;
+        let p = -1;
+        for (let row = n; row < 2 * n; row++) {
+            if (x[row * n + a]) {
+                p = row;
+                break;
+            }
+        }
+
+        if (p !== -1) {
+            for (let row = 0; row < 2 * n; row++) {
+                if (row !== p && x[row * n + a]) this.rowsum(row, p);
+            }
+            this.copyRow(p - n, p);
+            this.clearRow(p);
+            this.z[p * n + a] = 1;
+            this.r[p] = random() < 0.5 ? 0 : 1;
+            return this.r[p];
+        }
+
+        const scratch = 2 * n;
+        this.clearRow(scratch);
+        for (let row = 0; row < n; row++) {
+            if (x[row * n + a]) this.rowsum(scratch, row + n);
+        }
+        return this.r[scratch];
+    }
+
+    // Probability of measuring 1 on qubit a, without disturbing the state
+    probabilityOfOne(a) {
+        const n = this.numQubits;
+        for (let row = n; row < 2 * n; row++) {
+            if (this.x[row * n + a]) return 0.5;
+        }
+        // Deterministic outcomes only touch the scratch row
+        return this.measure(a);
+    }
+
+    collapse(a, outcome) {
+        this.measure(a, () => (outcome ? 0.75 : 0.25));
+    }
+
+    // <P> for a single-qubit Pauli on qubit a: +1 or -1 when ±P stabilizes
+    // the state, 0 when P anticommutes with some stabilizer
+    pauliExpectation(a, px, pz) {
+        const { x, z, numQubits: n } = this;
+
+        for (let row = n; row < 2 * n; row++) {
+            const k = row * n + a;
+            if (((px & z[k]) ^ (pz & x[k])) === 1) return 0;
+        }
+
+        const scratch = 2 * n;
+        this.clearRow(scratch);
+        for (let row = 0; row < n; row++) {
+            const k = row * n + a;
+            if (((px & z[k]) ^ (pz & x[k])) === 1) this.rowsum(scratch, row + n);
+        }
+        return this.r[scratch] ? -1 : 1;
+    }
+
+    blochVector(a) {
+        return {
+            x: this.pauliExpectation(a, 1, 0),
+            y: this.pauliExpectation(a, 1, 1),
+            z: this.pauliExpectation(a, 0, 1)
+        };
+    }
+
+    blochVectors() {
+        return Array.from({ length: this.numQubits }, (_, a) => this.blochVector(a));
+    }
+
+    // Z-basis outcomes form an affine space: one reachable outcome plus the
+    // span of the stabilizers' X parts. Vectors are bit-packed 32 per word.
+    measurementSupport() {
+        const n = this.numQubits;
+        const words = Math.ceil(n / 32);
+
+        const offset = new Uint32Array(words);
+        const probe = this.clone();
+        for (let a = 0; a < n; a++) {
+            if (probe.measure(a, () => 0)) offset[a >>> 5] |= 1 << (a & 31);
+        }
+
+        const basis = [];
+        for (let row = n; row < 2 * n; row++) {
+            const v = new Uint32Array(words);
+            for (let a = 0; a < n; a++) {
+                if (this.x[row * n + a]) v[a >>> 5] |= 1 << (a & 31);
+            }
+            // Reduce against the basis so far (GF(2) elimination)
+            for (const { vector, pivot } of basis) {
+                if (v[pivot >>> 5] & (1 << (pivot & 31))) {
+                    for (let w = 0; w < words; w++) v[w] ^= vector[w];
+                }
+            }
+            const pivot = firstSetBit(v);
+            if (pivot === -1) continue;
+            for (const entry of basis) {
+                if (entry.vector[pivot >>> 5] & (1 << (pivot & 31))) {
+                    for (let w = 0; w < words; w++) entry.vector[w] ^= v[w];
+                }
+            }
+            basis.push({ vector: v, pivot });
+        }
+
+        return { offset, basis: basis.map(entry => entry.vector), words };
+    }
+
+    sampleCounts(shots, random = Math.random, support = this.measurementSupport()) {
+        const { offset, basis, words } = support;
+        const counts = {};
+        const outcome = new Uint32Array(words);
+
+        for (let shot = 0; shot < shots; shot++) {
+            outcome.set(offset);
+            for (const vector of basis) {
+                if (random() < 0.5) {
+                    for (let w = 0; w < words; w++) outcome[w] ^= vector[w];
+                }
+            }
+            const label = packedToBitstring(outcome, this.numQubits);
+            counts[label] = (counts[label] || 0) + 1;
+        }
+        return counts;
+    }
+
+    // Exact distribution: every outcome in the support is equally likely
+    exactProbabilities(support = this.measurementSupport()) {
+        const { offset, basis, words } = support;
+        const probability = 1 / 2 ** basis.length;
+        const probabilities = {};
+        const outcome = new Uint32Array(words);
+
+        for (let mask = 0; mask < 2 ** basis.length; mask++) {
+            outcome.set(offset);
+            basis.forEach((vector, k) => {
+                if (mask & (1 << k)) {
+                    for (let w = 0; w < words; w++) outcome[w] ^= vector[w];
+                }
+            });
+            probabilities[packedToBitstring(outcome, this.numQubits)] = probability;
+        }
+        return probabilities;
+    }
+}
+
+function firstSetBit(words) {
+    for (let w = 0; w < words.length; w++) {
+        if (words[w] !== 0) return w * 32 + (31 - Math.clz32(words[w] & -words[w]));
+    }
+    return -1;
+}
+
+function packedToBitstring(words, qubits) {
+    let label = '';
+    for (let a = 0; a < qubits; a++) {
+        label += (words[a >>> 5] >>> (a & 31)) & 1 ? '1' : '0';
+    }
+    return label;
+}
+
+// ==========================================
+// MATRIX PRODUCT STATE
+// ==========================================
+
+const MAX_MPS_QUBITS = 128;
+const DEFAULT_MAX_BOND_DIMENSION = 64;
+
+// Singular values below this fraction of the largest are treated as zero
+const SVD_CUTOFF = 1e-12;
+const SVD_MAX_SWEEPS = 60;
+
+// Row-major complex product of an m x k and a k x n matrix
+function complexMatMul(a, b, m, k, n) {
+    const out = new Float64Array(2 * m * n);
+    for (let i = 0; i < m; i++) {
+        for (let l = 0; l < k; l++) {
+            const ar = a[2 * (i * k + l)], ai = a[2 * (i * k + l) + 1];
+            if (ar === 0 && ai === 0) continue;
+            for (let j = 0; j < n; j++) {
+                const br = b[2 * (l * n + j)], bi = b[2 * (l * n + j) + 1];
+                out[2 * (i * n + j)] += ar * br - ai * bi;
+                out[2 * (i * n + j) + 1] += ar * bi + ai * br;
+            }
+        }
+    }
+    return out;
+}
+
+function conjugateTranspose(a, rows, cols) {
+    const out = new Float64Array(2 * rows * cols);
+    for (let i = 0; i < rows; i++) {
+        for (let j = 0; j < cols; j++) {
+            out[2 * (j * rows + i)] = a[2 * (i * cols + j)];
+            out[2 * (j * rows + i) + 1] = -a[2 * (i * cols + j) + 1];
+        }
+    }
+    return out;
+}
+
+// One-sided Jacobi SVD of a row-major complex matrix, A = U diag(s) V^H.
+// Returns u (rows x r), s (r) and v (cols x r) with r = min(rows, cols)
+// and singular values in descending order.
+function complexSvd(a, rows, cols) {
+    if (rows < cols) {
+        const { u, s, v } = complexSvd(conjugateTranspose(a, rows, cols), cols, rows);
+        return { u: v, s, v: u };
+    }
+
+    const m = rows, k = cols;
+    // Column-major working copy, rotated until its columns are orthogonal
+    const w = new Float64Array(2 * m * k);
+    for (let i = 0; i < m; i++) {
+        for (let j = 0; j < k; j++) {
+            w[2 * (j * m + i)] = a[2 * (i * k + j)];
+            w[2 * (j * m + i) + 1] = a[2 * (i * k + j) + 1];
+        }
+    }
+    const v = new Float64Array(2 * k * k);
+    for (let j = 0; j < k; j++) v[2 * (j * k + j)] = 1;
+
+    // x' = c x - s y~, y' = s x + c y~ with y~ = e^{-i phi} y
+    const rotate = (buffer, length, p, q, c, sn, er, ei) => {
+        for (let i = 0; i < length; i++) {
+            const xp = 2 * (p * length + i), xq = 2 * (q * length + i);
+            const xr = buffer[xp], xi = buffer[xp + 1];
+            const yr = er * buffer[xq] + ei * buffer[xq + 1];
+            const yi = er * buffer[xq + 1] - ei * buffer[xq];
+            buffer[xp] = c * xr - sn * yr;
+            buffer[xp + 1] = c * xi - sn * yi;
+            buffer[xq] = sn * xr + c * yr;
+            buffer[xq + 1] = sn * xi + c * yi;
+        }
+    };
+
+    for (let sweep = 0; sweep < SVD_MAX_SWEEPS; sweep++) {
+        let rotated = false;
+        for (let p = 0; p < k - 1; p++) {
+            for (let q = p + 1; q < k; q++) {
+                let alpha = 0, beta = 0, gr = 0, gi = 0;
+                for (let i = 0; i < m; i++) {
+                    const xr = w[2 * (p * m + i)], xi = w[2 * (p * m + i) + 1];
+                    const yr = w[2 * (q * m + i)], yi = w[2 * (q * m + i) + 1];
+                    alpha += xr * xr + xi * xi;
+                    beta += yr * yr + yi * yi;
+                    // gamma = x^H y
+                    gr += xr * yr + xi * yi;
+                    gi += xr * yi - xi * yr;
+                }
+                const gamma = Math.hypot(gr, gi);
+                if (gamma === 0 || gamma <= 1e-15 * Math.sqrt(alpha * beta)) continue;
+
+                rotated = true;
+                const zeta = (beta - alpha) / (2 * gamma);
+                const t = (zeta >= 0 ? 1 : -1) / (Math.abs(zeta) + Math.sqrt(1 + zeta * zeta));
+                const c = 1 / Math.sqrt(1 + t * t);
+                rotate(w, m, p, q, c, c * t, gr / gamma, gi / gamma);
+                rotate(v, k, p, q, c, c * t, gr / gamma, gi / gamma);
+            }
+        }
+        if (!rotated) break;
+    }
+
+    const norms = Array.from({ length: k }, (_, j) => {
+        let sum = 0;
+        for (let i = 0; i < m; i++) sum += w[2 * (j * m + i)] ** 2 + w[2 * (j * m + i) + 1] ** 2;
+        return Math.sqrt(sum);
+    });
+    const order = norms.map((_, j) => j).sort((x, y) => norms[y] - norms[x]);
+
+    const u = new Float64Array(2 * m * k);
+    const vOut = new Float64Array(2 * k * k);
+    const s = new Float64Array(k);
+    order.forEach((j, col) => {
+        s[col] = norms[j];
+        const scale = norms[j] > 0 ? 1 / norms[j] : 0;
+        for (let i = 0; i < m; i++) {
+            u[2 * (i * k + col)] = w[2 * (j * m + i)] * scale;
+            u[2 * (i * k + col) + 1] = w[2 * (j * m + i) + 1] * scale;
+        }
+        for (let i = 0; i < k; i++) {
+            vOut[2 * (i * k + col)] = v[2 * (j * k + i)];
+            vOut[2 * (i * k + col) + 1] = v[2 * (j * k + i) + 1];
+        }
+    });
+    return { u, s, v: vOut };
+}
+
+// First `columns` columns of a row-major complex matrix
+function leadingColumns(a, rows, cols, columns) {
+    if (columns === cols) return a;
+    const out = new Float64Array(2 * rows * columns);
+    for (let i = 0; i < rows; i++) {
+        out.set(a.subarray(2 * i * cols, 2 * (i * cols + columns)), 2 * i * columns);
+    }
+    return out;
+}
+
+// Chain of rank-3 tensors, one per qubit, indexed [left bond][bit][right
+// bond]. Two-qubit gates only ever touch neighbours (qubit, qubit + 1), so a
+// gate is a local contraction plus an SVD that keeps at most maxBond
+// singular values. One site (the orthogonality centre) carries the norm,
+// which keeps local measurements and truncations exact for the whole chain.
+class MatrixProductState {
+    constructor(numQubits, options = {}) {
+        if (!Number.isInteger(numQubits) || numQubits < 1 || numQubits > MAX_MPS_QUBITS) {
+            throw new Error(`Unsupported qubit count for MPS simulation: ${numQubits}`);
+        }
+
+        this.numQubits = numQubits;
+        this.maxBond = options.maxBond ?? DEFAULT_MAX_BOND_DIMENSION;
+        // bonds[q] is the dimension between sites q - 1 and q
+        this.bonds = new Array(numQubits + 1).fill(1);
+        this.tensors = Array.from({ length: numQubits }, () => new Float64Array([1, 0, 0, 0]));
+        this.center = 0;
+        this.truncationError = 0;
+        this.truncations = 0;
+        this.maxBondReached = 1;
+    }
+
+    static estimateMemoryBytes(qubits, maxBond = DEFAULT_MAX_BOND_DIMENSION) {
+        return qubits * 2 * maxBond * maxBond * BYTES_PER_AMPLITUDE;
+    }
+
+    get byteLength() {
+        return this.tensors.reduce((total, tensor) => total + tensor.byteLength, 0);
+    }
+
+    clone() {
+        const copy = Object.create(MatrixProductState.prototype);
+        Object.assign(copy, this);
+        copy.bonds = [...this.bonds];
+        copy.tensors = this.tensors.map(tensor => tensor.slice());
+        return copy;
+    }
+
+    applySingle(qubit, m) {
+        const tensor = this.tensors[qubit];
+        const left = this.bonds[qubit], right = this.bonds[qubit + 1];
+        const ar = m[0], ai = m[1], br = m[2], bi = m[3];
+        const cr = m[4], ci = m[5], dr = m[6], di = m[7];
+
+        for (let l = 0; l < left; l++) {
+            for (let r = 0; r < right; r++) {
+                const p = 2 * ((2 * l) * right + r);
+                const q = 2 * ((2 * l + 1) * right + r);
+                const xr = tensor[p], xi = tensor[p + 1];
+                const yr = tensor[q], yi = tensor[q + 1];
+                tensor[p] = ar * xr - ai * xi + br * yr - bi * yi;
+                tensor[p + 1] = ar * xi + ai * xr + br * yi + bi * yr;
+                tensor[q] = cr * xr - ci * xi + dr * yr - di * yi;
+                tensor[q + 1] = cr * xi + ci * xr + dr * yi + di * yr;
+            }
+        }
+    }
+
+    // 4x4 gate on |qubit, qubit + 1⟩ (qubit is the high bit), then split the
+    // pair again keeping at most maxBond singular values
+    applyPair(qubit, m) {
+        this.moveCenter(qubit);
+        const left = this.bonds[qubit], mid = this.bonds[qubit + 1], right = this.bonds[qubit + 2];
+
+        // theta[l][s1][s2][r] = sum_m A[l][s1][m] B[m][s2][r]
+        const theta = complexMatMul(this.tensors[qubit], this.tensors[qubit + 1], 2 * left, mid, 2 * right);
+
+        const gated = new Float64Array(theta.length);
+        for (let l = 0; l < left; l++) {
+            for (let r = 0; r < right; r++) {
+                const index = (s1, s2) => 2 * ((2 * l + s1) * 2 * right + s2 * right + r);
+                const inputs = [index(0, 0), index(0, 1), index(1, 0), index(1, 1)];
+                for (let row = 0; row < 4; row++) {
+                    let re = 0, im = 0;
+                    for (let col = 0; col < 4; col++) {
+                        const e = 2 * (4 * row + col);
+                        const xr = theta[inputs[col]], xi = theta[inputs[col] + 1];
+                        re += m[e] * xr - m[e + 1] * xi;
+                        im += m[e] * xi + m[e + 1] * xr;
+                    }
+                    gated[inputs[row]] = re;
+                    gated[inputs[row] + 1] = im;
+                }
+            }
+        }
+
+        const rows = 2 * left, cols = 2 * right;
+        const { u, s, v } = complexSvd(gated, rows, cols);
+        const rank = Math.min(rows, cols);
+
+        let total = 0;
+        for (let j = 0; j < rank; j++) total += s[j] * s[j];
+        let keep = 0;
+        while (keep < rank && keep < this.maxBond && s[keep] > SVD_CUTOFF * s[0]) keep++;
+        keep = Math.max(1, keep);
+
+        let kept = 0;
+        for (let j = 0; j < keep; j++) kept += s[j] * s[j];
+        if (total - kept > SVD_CUTOFF * total) {
+            this.truncationError += (total - kept) / total;
+            this.truncations++;
+        }
+        const norm = Math.sqrt(total / kept);
+
+        // A = U[:, :keep], B = diag(s) V^H, renormalised to the full weight
+        this.tensors[qubit] = leadingColumns(u, rows, rank, keep);
+        const next = new Float64Array(2 * keep * cols);
+        for (let j = 0; j < keep; j++) {
+            const scale = s[j] * norm;
+            for (let col = 0; col < cols; col++) {
+                next[2 * (j * cols + col)] = scale * v[2 * (col * rank + j)];
+                next[2 * (j * cols + col) + 1] = -scale * v[2 * (col * rank + j) + 1];
+            }
+        }
+        this.tensors[qubit + 1] = next;
+        this.bonds[qubit + 1] = keep;
+        this.maxBondReached = Math.max(this.maxBondReached, keep);
+        this.center = qubit + 1;
+    }
+
+    // Shifts the orthogonality centre with exact (untruncated) SVDs
+    moveCenter(target) {
+        while (this.center < target) {
+            const c = this.center;
+            const left = this.bonds[c], right = this.bonds[c + 1];
+            const { u, s, v } = complexSvd(this.tensors[c], 2 * left, right);
+            const rank = Math.min(2 * left, right);
+            let keep = 1;
+            while (keep < rank && s[keep] > SVD_CUTOFF * s[0]) keep++;
+
+            // R = diag(s) V^H carries the norm into the next site
+            const r = new Float64Array(2 * keep * right);
+            for (let j = 0; j < keep; j++) {
+                for (let col = 0; col < right; col++) {
+                    r[2 * (j * right + col)] = s[j] * v[2 * (col * rank + j)];
+                    r[2 * (j * right + col) + 1] = -s[j] * v[2 * (col * rank + j) + 1];
+                }
+            }
+            this.tensors[c] = leadingColumns(u, 2 * left, rank, keep);
+            this.tensors[c + 1] = complexMatMul(r, this.tensors[c + 1], keep, right, 2 * this.bonds[c + 2]);
+            this.bonds[c + 1] = keep;
+            this.center++;
+        }
+
+        while (this.center > target) {
+            const c = this.center;
+            const left = this.bonds[c], right = this.bonds[c + 1];
+            const { u, s, v } = complexSvd(this.tensors[c], left, 2 * right);
+            const rank = Math.min(left, 2 * right);
+            let keep = 1;
+            while (keep < rank && s[keep] > SVD_CUTOFF * s[0]) keep++;
+
+            // Site c becomes V^H; U diag(s) carries the norm into site c - 1
+            const vh = new Float64Array(2 * keep * 2 * right);
+            for (let j = 0; j < keep; j++) {
+                for (let col = 0; col < 2 * right; col++) {
+                    vh[2 * (j * 2 * right + col)] = v[2 * (col * rank + j)];
+                    vh[2 * (j * 2 * right + col) + 1] = -v[2 * (col * rank + j) + 1];
+                }
+            }
+            const us = leadingColumns(u, left, rank, keep);
+            for (let i = 0; i < left; i++) {
+                for (let j = 0; j < keep; j++) {
+                    us[2 * (i * keep + j)] *= s[j];
+                    us[2 * (i * keep + j) + 1] *= s[j];
+                }
+            }
+            this.tensors[c] = vh;
+            this.tensors[c - 1] = complexMatMul(this.tensors[c - 1], us, 2 * this.bonds[c - 1], left, keep);
+            this.bonds[c] = keep;
+            this.center--;
+        }
+    }
+
+    applyOps(ops) {
+        for (const op of ops) {
+            if (op.type === 'single') this.applySingle(op.qubit, op.matrix);
+            else if (op.type === 'pair') this.applyPair(op.qubit, op.matrix);
+        }
+    }
+
+    // [rho00, rho11, Re rho01, Im rho01] of the qubit at the centre
+    centerDensityMatrix() {
+        const tensor = this.tensors[this.center];
+        const left = this.bonds[this.center], right = this.bonds[this.center + 1];
+        let p0 = 0, p1 = 0, cohRe = 0, cohIm = 0;
+        for (let l = 0; l < left; l++) {
+            for (let r = 0; r < right; r++) {
+                const p = 2 * ((2 * l) * right + r);
+                const q = 2 * ((2 * l + 1) * right + r);
+                const xr = tensor[p], xi = tensor[p + 1];
+                const yr = tensor[q], yi = tensor[q + 1];
+                p0 += xr * xr + xi * xi;
+                p1 += yr * yr + yi * yi;
+                cohRe += xr * yr + xi * yi;
+                cohIm += xi * yr - xr * yi;
+            }
+        }
+        return [p0, p1, cohRe, cohIm];
+    }
+
+    probabilityOfOne(qubit) {
+        this.moveCenter(qubit);
+        return this.centerDensityMatrix()[1];
+    }
+
+    collapse(qubit, outcome) {
+        this.moveCenter(qubit);
+        const [p0, p1] = this.centerDensityMatrix();
+        const scale = 1 / Math.sqrt(outcome ? p1 : p0);
+        const tensor = this.tensors[qubit];
+        const left = this.bonds[qubit], right = this.bonds[qubit + 1];
+        for (let l = 0; l < left; l++) {
+            for (let s = 0; s < 2; s++) {
+                const start = 2 * ((2 * l + s) * right);
+                for (let k = start; k < start + 2 * right; k++) {
+                    tensor[k] = s === outcome ? tensor[k] * scale : 0;
+                }
+            }
+        }
+    }
+
+    // Walks the centre along the chain, reading each qubit's reduced
+    // density matrix while it is the centre
+    blochVectors() {
+        const vectors = [];
+        this.moveCenter(0);
+        for (let q = 0; q < this.numQubits; q++) {
+            this.moveCenter(q);
+            const [p0, p1, cohRe, cohIm] = this.centerDensityMatrix();
+            vectors.push({ x: 2 * cohRe, y: -2 * cohIm, z: p0 - p1 });
+        }
+        return vectors;
+    }
+
+    // Dense amplitudes in the engine's interleaved layout (small chains only)
+    toAmplitudes() {
+        let psi = new Float64Array([1, 0]);
+        let rows = 1;
+        for (let q = 0; q < this.numQubits; q++) {
+            psi = complexMatMul(psi, this.tensors[q], rows, this.bonds[q], 2 * this.bonds[q + 1]);
+            rows *= 2;
+        }
+        return psi;
+    }
+
+    // Bit-by-bit sampling from conditional probabilities; with the centre at
+    // site 0 everything to the right is orthonormal, so each step only
+    // contracts the running left vector with one tensor
+    sampleCounts(shots, random = Math.random) {
+        this.moveCenter(0);
+        const counts = {};
+        for (let shot = 0; shot < shots; shot++) {
+            let vector = new Float64Array([1, 0]);
+            let label = '';
+            for (let q = 0; q < this.numQubits; q++) {
+                const tensor = this.tensors[q];
+                const left = this.bonds[q], right = this.bonds[q + 1];
+                const branches = [new Float64Array(2 * right), new Float64Array(2 * right)];
+                const weights = [0, 0];
+                for (let s = 0; s < 2; s++) {
+                    const w = branches[s];
+                    for (let l = 0; l < left; l++) {
+                        const vr = vector[2 * l], vi = vector[2 * l + 1];
+                        if (vr === 0 && vi === 0) continue;
+                        const base = 2 * ((2 * l + s) * right);
+                        for (let r = 0; r < right; r++) {
+                            const ar = tensor[base + 2 * r], ai = tensor[base + 2 * r + 1];
+                            w[2 * r] += vr * ar - vi * ai;
+                            w[2 * r + 1] += vr * ai + vi * ar;
+                        }
+                    }
+                    for (let k = 0; k < w.length; k++) weights[s] += w[k] * w[k];
+                }
+                const bit = random() * (weights[0] + weights[1]) < weights[0] ? 0 : 1;
+                const scale = 1 / Math.sqrt(weights[bit]);
+                vector = branches[bit].map(x => x * scale);
+                label += bit;
+            }
+            counts[label] = (counts[label] || 0) + 1;
+        }
+        return counts;
+    }
+}
+
+// ==========================================
+// SPARSE STATE
+// ==========================================
+
+// Basis indices are plain numbers, exact up to 2^53
+const MAX_SPARSE_QUBITS = 52;
+
+// Past this fraction of nonzero amplitudes a dense statevector is smaller
+// and much faster, so the sparse backend converts when one fits
+const SPARSE_FILL_THRESHOLD = 1 / 64;
+
+// Below this width a dense statevector is cheap enough to always win
+const SPARSE_MIN_QUBITS = 16;
+
+// Map entry plus its [re, im] pair, roughly
+const BYTES_PER_SPARSE_AMPLITUDE = 96;
+
+// Amplitudes that cancel below this probability are dropped
+const SPARSE_EPSILON = 1e-30;
+
+// The only gates that can add nonzero amplitudes; every other gate is a
+// permutation (X, Y, CX, SWAP) or a phase (Z, S, T, RZ, CZ)
+const BRANCHING_GATES = new Set(['h', 'rx', 'ry']);
+
+function countBranchingGates(gates) {
+    return gates.reduce((count, gate) => count + (BRANCHING_GATES.has(gate.gate) ? 1 : 0), 0);
+}
+
+// Nonzero amplitudes only, as a Map from basis index to [re, im]. Exposes
+// the StateVector kernel names so QuantumSimulator.applyGate drives both.
+class SparseState {
+    constructor(numQubits) {
+        if (!Number.isInteger(numQubits) || numQubits < 1 || numQubits > MAX_SPARSE_QUBITS) {
+            throw new Error(`Unsupported qubit count for sparse simulation: ${numQubits}`);
+        }
+        this.numQubits = numQubits;
+        this.amplitudes = new Map([[0, [1, 0]]]);
+    }
+
+    get size() {
+        return this.amplitudes.size;
+    }
+
+    get byteLength() {
+        return this.amplitudes.size * BYTES_PER_SPARSE_AMPLITUDE;
+    }
+
+    get fill() {
+        return this.amplitudes.size / 2 ** this.numQubits;
+    }
+
+    clone() {
+        const copy = new SparseState(this.numQubits);
+        copy.amplitudes = new Map();
+        this.amplitudes.forEach((amp, index) => copy.amplitudes.set(index, [amp[0], amp[1]]));
+        return copy;
+    }
+
+    // Powers of two and floor division keep this exact past 32 bits
+    bitMask(qubit) {
+        return 2 ** (this.numQubits - 1 - qubit);
+    }
+
+    hasBit(index, bit) {
+        return Math.floor(index / bit) % 2 === 1;
+    }
+
+    permute(mapIndex) {
+        const next = new Map();
+        this.amplitudes.forEach((amp, index) => next.set(mapIndex(index), amp));
+        this.amplitudes = next;
+    }
+
+    applyPauliX(qubit) {
+        const bit = this.bitMask(qubit);
+        this.permute(index => (this.hasBit(index, bit) ? index - bit : index + bit));
+    }
+
+    applyCX(control, target) {
+        const cbit = this.bitMask(control);
+        const tbit = this.bitMask(target);
+        this.permute(index => {
+            if (!this.hasBit(index, cbit)) return index;
+            return this.hasBit(index, tbit) ? index - tbit : index + tbit;
+        });
+    }
+
+    applySwap(a, b) {
+        const abit = this.bitMask(a);
+        const bbit = this.bitMask(b);
+        this.permute(index => {
+            const x = this.hasBit(index, abit);
+            if (x === this.hasBit(index, bbit)) return index;
+            return x ? index - abit + bbit : index + abit - bbit;
+        });
+    }
+
+    applyCZ(a, b) {
+        const abit = this.bitMask(a);
+        const bbit = this.bitMask(b);
+        this.amplitudes.forEach((amp, index) => {
+            if (this.hasBit(index, abit) && this.hasBit(index, bbit)) {
+                amp[0] = -amp[0];
+                amp[1] = -amp[1];
+            }
+        });
+    }
+
+    applyDiagonal(qubit, m) {
+        const bit = this.bitMask(qubit);
+        this.amplitudes.forEach((amp, index) => {
+            const k = this.hasBit(index, bit) ? 6 : 0;
+            const re = amp[0], im = amp[1];
+            amp[0] = m[k] * re - m[k + 1] * im;
+            amp[1] = m[k] * im + m[k + 1] * re;
+        });
+    }
+
+    applyHadamard(qubit) {
+        this.applyMatrix(qubit, FIXED_GATE_MATRICES.h);
+    }
+
+    // Each pair (i, i + bit) is updated once, from i when it is stored and
+    // from i + bit otherwise; amplitudes that cancel are dropped
+    applyMatrix(qubit, m) {
+        const bit = this.bitMask(qubit);
+        const zero = [0, 0];
+        const next = new Map();
+
+        this.amplitudes.forEach((amp, index) => {
+            const one = this.hasBit(index, bit);
+            const low = one ? index - bit : index;
+            if (one && this.amplitudes.has(low)) return;
+
+            const x = one ? zero : amp;
+            const y = one ? amp : this.amplitudes.get(low + bit) || zero;
+            const ur = m[0] * x[0] - m[1] * x[1] + m[2] * y[0] - m[3] * y[1];
+            const ui = m[0] * x[1] + m[1] * x[0] + m[2] * y[1] + m[3] * y[0];
+            const vr = m[4] * x[0] - m[5] * x[1] + m[6] * y[0] - m[7] * y[1];
+            const vi = m[4] * x[1] + m[5] * x[0] + m[6] * y[1] + m[7] * y[0];
+            if (ur * ur + ui * ui > SPARSE_EPSILON) next.set(low, [ur, ui]);
+            if (vr * vr + vi * vi > SPARSE_EPSILON) next.set(low + bit, [vr, vi]);
+        });
+        this.amplitudes = next;
+    }
+
+    probabilityOfOne(qubit) {
+        const bit = this.bitMask(qubit);
+        let p1 = 0;
+        this.amplitudes.forEach((amp, index) => {
+            if (this.hasBit(index, bit)) p1 += amp[0] * amp[0] + amp[1] * amp[1];
+        });
+        return p1;
+    }
+
+    collapse(qubit, outcome) {
+        const bit = this.bitMask(qubit);
+        const p1 = this.probabilityOfOne(qubit);
+        const scale = 1 / Math.sqrt(outcome ? p1 : 1 - p1);
+        this.amplitudes.forEach((amp, index) => {
+            if (this.hasBit(index, bit) !== Boolean(outcome)) {
+                this.amplitudes.delete(index);
+            } else {
+                amp[0] *= scale;
+                amp[1] *= scale;
+            }
+        });
+    }
+
+    blochVectors() {
+        const vectors = [];
+        for (let q = 0; q < this.numQubits; q++) {
+            const bit = this.bitMask(q);
+            let p0 = 0, p1 = 0, cohRe = 0, cohIm = 0;
+            this.amplitudes.forEach((x, index) => {
+                const p = x[0] * x[0] + x[1] * x[1];
+                if (this.hasBit(index, bit)) {
+                    p1 += p;
+                    return;
+                }
+                p0 += p;
+                const y = this.amplitudes.get(index + bit);
+                if (y) {
+                    // rho01 = sum a0 * conj(a1)
+                    cohRe += x[0] * y[0] + x[1] * y[1];
+                    cohIm += x[1] * y[0] - x[0] * y[1];
+                }
+            });
+            vectors.push({ x: 2 * cohRe, y: -2 * cohIm, z: p0 - p1 });
+        }
+        return vectors;
+    }
+
+    // Basis indices in ascending order with their probabilities
+    probabilities() {
+        const indices = [...this.amplitudes.keys()].sort((a, b) => a - b);
+        const probabilities = new Float64Array(indices.length);
+        indices.forEach((index, k) => {
+            const amp = this.amplitudes.get(index);
+            probabilities[k] = amp[0] * amp[0] + amp[1] * amp[1];
+        });
+        return { indices, probabilities };
+    }
+
+    toStateVector() {
+        const state = new StateVector(this.numQubits);
+        state.amplitudes[0] = 0;
+        this.amplitudes.forEach((amp, index) => {
+            state.amplitudes[2 * index] = amp[0];
+            state.amplitudes[2 * index + 1] = amp[1];
+        });
+        return state;
+    }
+
+    sampleInto(histogram, shots, random) {
+        const { indices, probabilities } = this.probabilities();
+        const sampler = new AliasSampler(probabilities);
+        for (let shot = 0; shot < shots; shot++) histogram.add(indices[sampler.sample(random)]);
+    }
+}
+
+// ==========================================
+// NOISE CHANNELS
+// ==========================================
+
+const DEFAULT_TRAJECTORIES = 256;
+
+// Typical superconducting-device error rates; per gate type, with
+// `default` covering gates that are not listed
+const DEFAULT_NOISE_MODEL = {
+    gates: {
+        default: { depolarizing: 0.001, amplitudeDamping: 0.0005 },
+        cx: { depolarizing: 0.01, amplitudeDamping: 0.001 },
+        cz: { depolarizing: 0.01, amplitudeDamping: 0.001 },
+        swap: { depolarizing: 0.02, amplitudeDamping: 0.002 }
+    },
+    readoutError: 0.02
+};
+
+const PAULI_MATRICES = [
+    new Float64Array([1, 0, 0, 0, 0, 0, 1, 0]),
+    FIXED_GATE_MATRICES.x,
+    FIXED_GATE_MATRICES.y,
+    FIXED_GATE_MATRICES.z
+];
+
+function scaleMatrix(m, factor) {
+    return m.map(value => value * factor);
+}
+
+function conjugateMatrix(m) {
+    return m.map((value, i) => (i % 2 ? -value : value));
+}
+
+// Kraus operators and the matching superoperator, built once per channel
+// and strength. The superoperator acts on a density matrix's |row, column⟩
+// bits as sum_k K ⊗ conj(K).
+const KRAUS_CACHE = new Map();
+
+function krausChannel(channel, strength) {
+    const key = `${channel}:${strength}`;
+    if (KRAUS_CACHE.has(key)) return KRAUS_CACHE.get(key);
+
+    let kraus;
+    let mixture = null;
+    switch (channel) {
+        case 'depolarizing': {
+            // rho -> (1 - p) rho + p I / 2, as a mixture of Pauli unitaries
+            mixture = [1 - 3 * strength / 4, strength / 4, strength / 4, strength / 4];
+            kraus = PAULI_MATRICES.map((pauli, k) => scaleMatrix(pauli, Math.sqrt(mixture[k])));
+            break;
+        }
+        case 'amplitudeDamping':
+            kraus = [
+                new Float64Array([1, 0, 0, 0, 0, 0, Math.sqrt(1 - strength), 0]),
+                new Float64Array([0, 0, Math.sqrt(strength), 0, 0, 0, 0, 0])
+            ];
+            break;
+        case 'measurement':
+            // Unread mid-circuit measurement: projectors onto |0⟩ and |1⟩
+            kraus = [
+                new Float64Array([1, 0, 0, 0, 0, 0, 0, 0]),
+                new Float64Array([0, 0, 0, 0, 0, 0, 1, 0])
+            ];
+            break;
+        default:
+            throw new Error(`Unknown noise channel: ${channel}`);
+    }
+
+    const superoperator = new Float64Array(32);
+    kraus.forEach(k => {
+        const term = kron2x2(k, conjugateMatrix(k));
+        for (let i = 0; i < 32; i++) superoperator[i] += term[i];
+    });
+
+    const entry = {
+        key,
+        kraus,
+        superoperator,
+        // Unitary mixtures pick an operator without measuring the state
+        mixture,
+        unitaries: mixture ? PAULI_MATRICES : null
+    };
+    KRAUS_CACHE.set(key, entry);
+    return entry;
+}
+
+// One superoperator for several channels applied in order, cached like
+// the channels themselves
+function composeChannels(entries) {
+    const key = entries.map(entry => entry.key).join('+');
+    if (!KRAUS_CACHE.has(key)) {
+        const superoperator = entries.slice(1).reduce(
+            (product, entry) => multiplyMatrices(entry.superoperator, product, 4),
+            entries[0].superoperator
+        );
+        KRAUS_CACHE.set(key, { key, superoperator });
+    }
+    return KRAUS_CACHE.get(key);
+}
+
+// Noise that follows a gate: for every wire it touches, the channels in
+// order and their combined superoperator
+function gateNoise(noiseModel, gate, numQubits) {
+    const settings = noiseModel.gates?.[gate.gate] ?? noiseModel.gates?.default;
+    if (!settings || gate.gate === 'measure') return [];
+
+    const wires = TWO_QUBIT_GATE_MATRICES[gate.gate] ? [gate.qubit, gate.qubit + 1] : [gate.qubit];
+    if (wires[wires.length - 1] >= numQubits) return [];
+
+    const channels = Object.entries(settings)
+        .filter(([, strength]) => strength > 0)
+        .map(([channel, strength]) => krausChannel(channel, strength));
+    if (channels.length === 0) return [];
+
+    const combined = composeChannels(channels).superoperator;
+    return wires.map(qubit => ({ qubit, channels, superoperator: combined }));
+}
+
+// Symmetric bit-flip on every measured bit, applied to the outcome
+// distribution rather than the state
+function applyReadoutError(probabilities, numQubits, error) {
+    if (!(error > 0)) return probabilities;
+    for (let q = 0; q < numQubits; q++) {
+        const bit = 1 << (numQubits - 1 - q);
+        for (let block = 0; block < probabilities.length; block += 2 * bit) {
+            for (let i = block; i < block + bit; i++) {
+                const p0 = probabilities[i], p1 = probabilities[i + bit];
+                probabilities[i] = (1 - error) * p0 + error * p1;
+                probabilities[i + bit] = error * p0 + (1 - error) * p1;
+            }
+        }
+    }
+    return probabilities;
+}
+
+// rho stored as a 2n-qubit vector (row bits, then column bits), so U rho U^H
+// is U on the row wire plus conj(U) on the column wire using the
+// statevector kernels, and a channel is one 4x4 superoperator per qubit
+class DensityMatrix {
+    constructor(numQubits) {
+        if (!Number.isInteger(numQubits) || numQubits < 1 || 2 * numQubits > MAX_ENGINE_QUBITS) {
+            throw new Error(`Unsupported qubit count for density-matrix simulation: ${numQubits}`);
+        }
+        this.numQubits = numQubits;
+        this.size = 1 << numQubits;
+        this.vector = new StateVector(2 * numQubits);
+    }
+
+    static estimateMemoryBytes(qubits) {
+        return 4 ** qubits * BYTES_PER_AMPLITUDE + 2 ** qubits * BYTES_PER_PROBABILITY;
+    }
+
+    get byteLength() {
+        return this.vector.byteLength;
+    }
+
+    // A single-qubit gate and the noise after it become one superoperator
+    // pass; two-qubit gates apply their noise wire by wire
+    applyGate(gate, noise = []) {
+        if (noise.length === 1 && noise[0].qubit === gate.qubit) {
+            const m = gateMatrix(gate);
+            const unitary = kron2x2(m, conjugateMatrix(m));
+            this.applySuperoperator(gate.qubit, multiplyMatrices(noise[0].superoperator, unitary, 4));
+            return;
+        }
+        this.applyUnitary(gate);
+        noise.forEach(({ qubit, superoperator }) => this.applySuperoperator(qubit, superoperator));
+    }
+
+    applyUnitary(gate) {
+        const q = gate.qubit;
+        const n = this.numQubits;
+        const v = this.vector;
+
+        switch (gate.gate) {
+            case 'measure':
+                return;
+            case 'cx':
+            case 'cz':
+            case 'swap': {
+                if (q + 1 >= n) return;
+                // Real permutation/diagonal matrices: conj(U) = U
+                const apply = gate.gate === 'cx' ? 'applyCX' : gate.gate === 'cz' ? 'applyCZ' : 'applySwap';
+                v[apply](q, q + 1);
+                v[apply](n + q, n + q + 1);
+                return;
+            }
+            case 'h':
+                v.applyHadamard(q);
+                v.applyHadamard(n + q);
+                return;
+            case 'x':
+                v.applyPauliX(q);
+                v.applyPauliX(n + q);
+                return;
+            case 'z':
+            case 's':
+            case 't':
+            case 'rz': {
+                const m = gateMatrix(gate);
+                v.applyDiagonal(q, m);
+                v.applyDiagonal(n + q, conjugateMatrix(m));
+                return;
+            }
+            default: {
+                const m = gateMatrix(gate);
+                v.applyMatrix(q, m);
+                v.applyMatrix(n + q, conjugateMatrix(m));
+            }
+        }
+    }
+
+    applySuperoperator(qubit, superoperator) {
+        this.vector.applyMatrix4(qubit, superoperator, this.numQubits + qubit);
+    }
+
+    probabilities() {
+        const amps = this.vector.amplitudes;
+        const probs = new Float64Array(this.size);
+        for (let i = 0; i < this.size; i++) probs[i] = amps[2 * (i * this.size + i)];
+        return probs;
+    }
+
+    // Reduced density matrices straight from the entries of rho
+    blochVectors() {
+        const amps = this.vector.amplitudes;
+        const vectors = [];
+        for (let q = 0; q < this.numQubits; q++) {
+            const bit = 1 << (this.numQubits - 1 - q);
+            let p0 = 0, p1 = 0, cohRe = 0, cohIm = 0;
+            for (let block = 0; block < this.size; block += 2 * bit) {
+                for (let i = block; i < block + bit; i++) {
+                    const j = i + bit;
+                    p0 += amps[2 * (i * this.size + i)];
+                    p1 += amps[2 * (j * this.size + j)];
+                    cohRe += amps[2 * (i * this.size + j)];
+                    cohIm += amps[2 * (i * this.size + j) + 1];
+                }
+            }
+            vectors.push({ x: 2 * cohRe, y: -2 * cohIm, z: p0 - p1 });
+        }
+        return vectors;
+    }
+}
+
+// ==========================================
+// SHOT SAMPLING
+// ==========================================
+
+// Alias table plus the largest histogram kept as a dense array
+const BYTES_PER_ALIAS_ENTRY = 16;
+const MAX_DENSE_HISTOGRAM_QUBITS = 22;
+
+// Walker's alias method (Vose's construction): O(2^n) to build, then every
+// shot costs two random draws however many outcomes there are
+class AliasSampler {
+    constructor(probabilities) {
+        const size = probabilities.length;
+        this.size = size;
+        this.cutoff = new Float64Array(size);
+        this.alias = new Uint32Array(size);
+
+        let total = 0;
+        for (let i = 0; i < size; i++) total += probabilities[i];
+
+        // Under-full columns stack up from the front, over-full from the back
+        const worklist = new Uint32Array(size);
+        let small = 0, large = size;
+        for (let i = 0; i < size; i++) {
+            this.cutoff[i] = probabilities[i] * size / total;
+            if (this.cutoff[i] < 1) worklist[small++] = i;
+            else worklist[--large] = i;
+        }
+
+        while (small > 0 && large < size) {
+            const less = worklist[--small];
+            const more = worklist[large];
+            this.alias[less] = more;
+            this.cutoff[more] += this.cutoff[less] - 1;
+            if (this.cutoff[more] < 1) {
+                large++;
+                worklist[small++] = more;
+            }
+        }
+        // Whatever is left is full up to rounding error
+        while (small > 0) this.cutoff[worklist[--small]] = 1;
+        while (large < size) this.cutoff[worklist[large++]] = 1;
+    }
+
+    get byteLength() {
+        return this.cutoff.byteLength + this.alias.byteLength;
+    }
+
+    sample(random) {
+        const column = Math.floor(random() * this.size);
+        return random() < this.cutoff[column] ? column : this.alias[column];
+    }
+
+    sampleInto(histogram, shots, random) {
+        for (let shot = 0; shot < shots; shot++) histogram.add(this.sample(random));
+    }
+}
+
+// Shot counts by basis index: a dense array when it is no larger than the
+// state, a Map when there are far fewer shots than outcomes
+class ShotHistogram {
+    constructor(numQubits, shots) {
+        this.numQubits = numQubits;
+        const size = 2 ** numQubits;
+        this.dense = numQubits <= MAX_DENSE_HISTOGRAM_QUBITS && size <= 4 * shots
+            ? new Uint32Array(size)
+            : null;
+        this.sparse = this.dense ? null : new Map();
+    }
+
+    get byteLength() {
+        return this.dense ? this.dense.byteLength : 0;
+    }
+
+    add(index) {
+        if (this.dense) this.dense[index]++;
+        else this.sparse.set(index, (this.sparse.get(index) || 0) + 1);
+    }
+
+    // Counts shaped like probabilities: the dense array itself, indexed by
+    // basis state, or a bitstring-keyed map of the sparse outcomes. Dense
+    // counts get no labels here; labelCounts() and topStates() add them
+    // for the entries that are shown.
+    toCounts() {
+        if (this.dense) return this.dense;
+        const counts = {};
+        [...this.sparse.keys()].sort((a, b) => a - b).forEach(index => {
+            counts[basisLabel(index, this.numQubits)] = this.sparse.get(index);
+        });
+        return counts;
+    }
+}
+
+// Shot frequencies in the shape of the counts
+function countFrequencies(counts, shots) {
+    if (ArrayBuffer.isView(counts)) return Float64Array.from(counts, count => count / shots);
+    const frequencies = {};
+    Object.entries(counts).forEach(([label, count]) => {
+        frequencies[label] = count / shots;
+    });
+    return frequencies;
+}
+
+// Sums two sets of counts; the total is dense if either one is
+function addCounts(total, counts) {
+    if (!total) return ArrayBuffer.isView(counts) ? Uint32Array.from(counts) : { ...counts };
+    if (ArrayBuffer.isView(counts) && !ArrayBuffer.isView(total)) return addCounts(Uint32Array.from(counts), total);
+    if (ArrayBuffer.isView(total)) {
+        if (ArrayBuffer.isView(counts)) {
+            counts.forEach((count, index) => {
+                total[index] += count;
+            });
+        } else {
+            Object.entries(counts).forEach(([label, count]) => {
+                total[parseInt(label, 2)] += count;
+            });
+        }
+        return total;
+    }
+    Object.entries(counts).forEach(([label, count]) => {
+        total[label] = (total[label] || 0) + count;
+    });
+    return total;
+}
+
+// Splits ordered gates at measurements that are followed by another gate on
+// the same wire. Those collapse the state; trailing ones stay no-ops.
+function splitAtMidCircuitMeasurements(orderedGates, numQubits) {
+    const lastUse = new Array(numQubits).fill(-1);
+    orderedGates.forEach((gate, i) => {
+        if (gate.gate === 'measure') return;
+        lastUse[gate.qubit] = i;
+        if (TWO_QUBIT_GATE_MATRICES[gate.gate] && gate.qubit + 1 < numQubits) {
+            lastUse[gate.qubit + 1] = i;
+        }
+    });
+
+    const segments = [{ gates: [], measure: null }];
+    orderedGates.forEach((gate, i) => {
+        const segment = segments[segments.length - 1];
+        if (gate.gate === 'measure' && lastUse[gate.qubit] > i) {
+            segment.measure = gate;
+            segments.push({ gates: [], measure: null });
+        } else {
+            segment.gates.push(gate);
+        }
+    });
+    return segments;
+}
+
+function addWeightedBloch(total, register, weight) {
+    const blochVectors = register.blochVectors();
+    total.forEach((vector, q) => {
+        const bloch = blochVectors[q];
+        vector.x += weight * bloch.x;
+        vector.y += weight * bloch.y;
+        vector.z += weight * bloch.z;
+    });
+}
+
+// ==========================================
+// PAULI EXPECTATIONS
+// ==========================================
+
+const S_DAGGER_MATRIX = new Float64Array([1, 0, 0, 0, 0, 0, 0, -1]);
+
+// One letter per qubit from qubit 0 ('ZZI'), or sparse factors ('Z0 Z1')
+function parsePauliString(pauli, numQubits) {
+    const text = String(pauli).replace(/\s+/g, '').toUpperCase();
+    if (text.length === numQubits && /^[IXYZ]+$/.test(text)) return text.split('');
+
+    const ops = new Array(numQubits).fill('I');
+    const factor = /([IXYZ])(\d+)/g;
+    let consumed = 0;
+    let match;
+    while ((match = factor.exec(text)) !== null && match.index === consumed) {
+        const qubit = parseInt(match[2], 10);
+        if (qubit >= numQubits) {
+            throw new Error(`Pauli string ${pauli} targets missing qubit ${qubit}`);
+        }
+        if (ops[qubit] !== 'I') {
+            throw new Error(`Pauli string ${pauli} repeats qubit ${qubit}`);
+        }
+        if (match[1] !== 'I') ops[qubit] = match[1];
+        consumed = factor.lastIndex;
+    }
+    if (consumed !== text.length) throw new Error(`Invalid Pauli string: ${pauli}`);
+    return ops;
+}
+
+function pauliLabel(ops) {
+    const factors = ops.map((op, q) => (op === 'I' ? null : `${op}${q}`)).filter(Boolean);
+    return factors.length > 0 ? factors.join(' ') : 'I';
+}
+
+// Accepts [{ coefficient, pauli }] or text such as '0.5 Z0 Z1 - 1.2 X0 + Y1'
+function parseObservable(observable, numQubits) {
+    const terms = typeof observable === 'string'
+        ? observable.replace(/\s+/g, '').split(/(?=[+-])/).filter(Boolean).map(term => {
+            const [, sign, number, pauli] = /^([+-]?)(\d*\.?\d*)\*?(.*)$/.exec(term);
+            const magnitude = number === '' ? 1 : parseFloat(number);
+            return { coefficient: sign === '-' ? -magnitude : magnitude, pauli };
+        })
+        : observable;
+
+    if (!Array.isArray(terms) || terms.length === 0) {
+        throw new Error('An observable needs at least one Pauli term');
+    }
+    return terms.map(({ coefficient = 1, pauli }) => {
+        if (!Number.isFinite(coefficient)) {
+            throw new Error(`Invalid coefficient for Pauli term ${pauli}`);
+        }
+        const ops = parsePauliString(pauli, numQubits);
+        return { coefficient, pauli: pauliLabel(ops), ops };
+    });
+}
+
+// Greedy qubit-wise commuting groups: on every qubit a term either acts
+// as identity or agrees with its group's basis, so one basis rotation
+// measures the whole group. Terms with the widest support are placed first.
+function groupQubitWise(terms) {
+    const weight = term => term.ops.filter(op => op !== 'I').length;
+    const groups = [];
+    [...terms].sort((a, b) => weight(b) - weight(a)).forEach(term => {
+        let group = groups.find(candidate => term.ops.every(
+            (op, q) => op === 'I' || candidate.basis[q] === 'I' || candidate.basis[q] === op
+        ));
+        if (!group) {
+            group = { basis: term.ops.map(() => 'I'), terms: [] };
+            groups.push(group);
+        }
+        term.ops.forEach((op, q) => {
+            if (op !== 'I') group.basis[q] = op;
+        });
+        group.terms.push(term);
+    });
+    return groups;
+}
+
+function isDiagonalBasis(basis) {
+    return basis.every(op => op === 'I' || op === 'Z');
+}
+
+function parity(x) {
+    x ^= x >>> 16;
+    x ^= x >>> 8;
+    x ^= x >>> 4;
+    return (0x6996 >>> (x & 0xf)) & 1;
+}
+
+// sum_i |a_i|^2 (-1)^popcount(i & mask) for every mask in one pass
+function diagonalExpectations(amplitudes, masks) {
+    const sums = new Float64Array(masks.length);
+    const size = amplitudes.length / 2;
+    for (let i = 0; i < size; i++) {
+        const p = amplitudes[2 * i] * amplitudes[2 * i] + amplitudes[2 * i + 1] * amplitudes[2 * i + 1];
+        if (p === 0) continue;
+        for (let t = 0; t < masks.length; t++) {
+            sums[t] += parity(i & masks[t]) ? -p : p;
+        }
+    }
+    return sums;
+}
+
+// Every term's expectation from one statevector. Diagonal groups read it
+// directly; the others rotate a single scratch copy into their basis
+// (H for X, S^dagger then H for Y) and read that. Callers evaluating many
+// states can pass the scratch register to reuse.
+function pauliExpectations(state, groups, scratch = null) {
+    const values = new Map();
+
+    groups.forEach(group => {
+        let amplitudes = state.amplitudes;
+        if (!isDiagonalBasis(group.basis)) {
+            if (scratch) scratch.amplitudes.set(state.amplitudes);
+            else scratch = state.clone();
+            group.basis.forEach((op, q) => {
+                if (op === 'Y') scratch.applyDiagonal(q, S_DAGGER_MATRIX);
+                if (op === 'X' || op === 'Y') scratch.applyHadamard(q);
+            });
+            amplitudes = scratch.amplitudes;
+        }
+
+        const masks = group.terms.map(term => term.ops.reduce(
+            (mask, op, q) => (op === 'I' ? mask : mask | state.bitMask(q)), 0
+        ));
+        const sums = diagonalExpectations(amplitudes, masks);
+        group.terms.forEach((term, t) => values.set(term, sums[t]));
+    });
+    return values;
+}
+
+// ==========================================
+// PARAMETER SWEEPS
+// ==========================================
+
+const ROTATION_GATES = new Set(['rx', 'ry', 'rz']);
+
+// Bindings address rotation gates by position, e.g. { '0:2': Math.PI }
+function sweepKey(gate) {
+    return `${gate.qubit}:${gate.column}`;
+}
+
+// Rotation gates of an ordered circuit in order, as { key, index }
+function rotationParameters(orderedGates) {
+    const parameters = [];
+    orderedGates.forEach((gate, index) => {
+        if (ROTATION_GATES.has(gate.gate)) parameters.push({ key: sweepKey(gate), index });
+    });
+    return parameters;
+}
+
+// Evenly spaced angles for one gate, endpoints included
+function angleSweepBindings(gate, from, to, steps) {
+    const key = sweepKey(gate);
+    return Array.from({ length: steps }, (_, k) => ({
+        [key]: steps > 1 ? from + (to - from) * k / (steps - 1) : from
+    }));
+}
+
+// ==========================================
+// PREFIX STATE CACHE
+// ==========================================
+
+const DEFAULT_PREFIX_CACHE_BYTES = 64 * 1024 * 1024;
+
+// 32-bit FNV-1a; two seeds give a 64-bit key so collisions are negligible
+function hashString(text, seed) {
+    let hash = seed >>> 0;
+    for (let i = 0; i < text.length; i++) {
+        hash ^= text.charCodeAt(i);
+        hash = Math.imul(hash, 0x01000193);
+    }
+    return hash >>> 0;
+}
+
+function hashKey(text) {
+    return hashString(text, 0x811c9dc5).toString(16).padStart(8, '0') +
+        hashString(text, 0x2f1b3c4d).toString(16).padStart(8, '0');
+}
+
+// Splits ordered gates into per-column segments. Each key hashes the width
+// and every gate up to and including that column, so a key only matches a
+// cached state when the whole prefix is unchanged.
+function columnSegments(orderedGates, numQubits) {
+    const segments = [];
+    let key = `${numQubits}`;
+    let start = 0;
+
+    while (start < orderedGates.length) {
+        const column = orderedGates[start].column;
+        let end = start;
+        let text = key;
+        while (end < orderedGates.length && orderedGates[end].column === column) {
+            const gate = orderedGates[end];
+            const angle = gate.gate.startsWith('r') ? gateAngle(gate) : '';
+            text += `|${gate.gate}:${gate.qubit}:${angle}`;
+            end++;
+        }
+        key = hashKey(text);
+        segments.push({ column, key, start, end });
+        start = end;
+    }
+    return segments;
+}
+
+// Statevector snapshots taken after each column, evicted least recently
+// used first once their total size passes maxBytes
+class PrefixStateCache {
+    constructor(maxBytes = DEFAULT_PREFIX_CACHE_BYTES) {
+        this.maxBytes = maxBytes;
+        this.entries = new Map();
+        this.bytes = 0;
+        this.hits = 0;
+        this.misses = 0;
+    }
+
+    // Deepest cached segment, or -1; counts as one hit or miss per run
+    lookup(segments) {
+        for (let i = segments.length - 1; i >= 0; i--) {
+            const amplitudes = this.entries.get(segments[i].key);
+            if (amplitudes) {
+                this.entries.delete(segments[i].key);
+                this.entries.set(segments[i].key, amplitudes);
+                this.hits++;
+                return { index: i, amplitudes };
+            }
+        }
+        this.misses++;
+        return { index: -1, amplitudes: null };
+    }
+
+    store(key, amplitudes) {
+        if (amplitudes.byteLength > this.maxBytes || this.entries.has(key)) return;
+
+        this.entries.set(key, amplitudes.slice());
+        this.bytes += amplitudes.byteLength;
+        this.evict();
+    }
+
+    evict() {
+        // Map iteration order is insertion order, oldest first
+        for (const [oldest, snapshot] of this.entries) {
+            if (this.bytes <= this.maxBytes) break;
+            this.entries.delete(oldest);
+            this.bytes -= snapshot.byteLength;
+        }
+    }
+
+    // How many snapshots of this size fit under the cap at once
+    capacityFor(bytes) {
+        return bytes > 0 ? Math.floor(this.maxBytes / bytes) : Infinity;
+    }
+
+    resize(maxBytes) {
+        this.maxBytes = maxBytes;
+        this.evict();
+    }
+
+    clear() {
+        this.entries.clear();
+        this.bytes = 0;
+    }
+
+    stats() {
+        return { hits: this.hits, misses: this.misses, entries: this.entries.size, bytes: this.bytes };
+    }
+}
+
+// ==========================================
+// RESULT CACHE
+// ==========================================
+
+const DEFAULT_RESULT_CACHE_BYTES = 32 * 1024 * 1024;
+const DEFAULT_PERSISTENT_CACHE_BYTES = 128 * 1024 * 1024;
+const RESULT_CACHE_DATABASE = 'qosmos-result-cache';
+
+// Bump when a fix changes simulation output so persisted results go stale
+const RESULT_CACHE_VERSION = 2;
+
+// Angles that agree to this many decimals hash the same
+const HASH_ANGLE_DECIMALS = 10;
+
+// Canonical key for a circuit plus the options that change its result.
+// Gates are ordered as the simulator applies them (column, then qubit)
+// whatever order they were placed in, and columns are numbered densely so
+// empty columns do not matter. Rotation angles are taken modulo 2π, which
+// only changes a global phase, and rounded to HASH_ANGLE_DECIMALS.
+function circuitHash(circuit, options = {}) {
+    const simulator = new QuantumSimulator(options);
+    const backend = simulator.selectBackend(circuit);
+    const scale = 10 ** HASH_ANGLE_DECIMALS;
+
+    let text = `v${RESULT_CACHE_VERSION}|${circuit.qubits}`;
+    let column = null;
+    let rank = -1;
+    for (const gate of simulator.orderGates(circuit.gates)) {
+        if (gate.column !== column) {
+            column = gate.column;
+            rank++;
+        }
+        let angle = '';
+        if (ROTATION_GATES.has(gate.gate)) {
+            const turn = 2 * Math.PI;
+            angle = Math.round((((gateAngle(gate) % turn) + turn) % turn) * scale) / scale + 0;
+        }
+        text += `|${rank}:${gate.gate}:${gate.qubit}:${angle}`;
+    }
+
+    text += '#' + JSON.stringify({
+        backend,
+        shots: simulator.sampling ? simulator.shots : 0,
+        seed: simulator.seed ?? null,
+        noise: simulator.noise,
+        trajectories: backend === 'trajectories' ? simulator.trajectories : 0,
+        maxBondDimension: backend === 'mps' ? simulator.maxBondDimension : 0
+    });
+    return hashKey(text);
+}
+
+// Whether replaying a result is indistinguishable from re-running it.
+// Exact probabilities always are; shot counts, sampled distributions and
+// trajectory averages only when their seed was fixed.
+function isReproducibleResult(result, sampling = false) {
+    const { seed = null, exactProbabilities, trajectories } = result.metadata;
+    if (seed !== null) return true;
+    return !sampling && !trajectories && exactProbabilities !== false;
+}
+
+function estimateResultBytes(result) {
+    const { probabilities, counts, metadata } = result;
+    const labelBytes = 2 * metadata.qubits + 48;
+    let bytes = ArrayBuffer.isView(probabilities)
+        ? probabilities.byteLength
+        : Object.keys(probabilities).length * labelBytes;
+    if (counts) bytes += ArrayBuffer.isView(counts) ? counts.byteLength : Object.keys(counts).length * labelBytes;
+    return bytes + 64 * result.blochVectors.length;
+}
+
+function requestResult(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+// Finished results by circuitHash(): an in-memory LRU in front of an
+// IndexedDB store that survives reloads. Both evict least recently used
+// entries past their byte caps. Only probabilities, Bloch vectors, counts
+// and metadata are kept; amplitudes are dropped.
+class ResultCache {
+    constructor({
+        maxBytes = DEFAULT_RESULT_CACHE_BYTES,
+        persistentBytes = DEFAULT_PERSISTENT_CACHE_BYTES,
+        databaseName = RESULT_CACHE_DATABASE
+    } = {}) {
+        this.maxBytes = maxBytes;
+        this.persistentBytes = persistentBytes;
+        this.entries = new Map();
+        this.bytes = 0;
+        this.hits = 0;
+        this.persistentHits = 0;
+        this.misses = 0;
+        this.database = persistentBytes > 0 && typeof indexedDB !== 'undefined'
+            ? this.openDatabase(databaseName)
+            : null;
+    }
+
+    // Payloads and their sizes live in separate stores so eviction can walk
+    // the sizes without reading the results back
+    openDatabase(name) {
+        const request = indexedDB.open(name, 1);
+        request.onupgradeneeded = () => {
+            const database = request.result;
+            database.createObjectStore('results');
+            database.createObjectStore('entries', { keyPath: 'key' }).createIndex('lastUsed', 'lastUsed');
+        };
+        return requestResult(request).catch(error => {
+            // Private browsing can refuse storage; the memory tier still works
+            console.warn('Result cache persistence unavailable:', error && error.message);
+            return null;
+        });
+    }
+
+    async get(key) {
+        const entry = this.entries.get(key);
+        if (entry) {
+            this.entries.delete(key);
+            this.entries.set(key, entry);
+            this.hits++;
+            return this.replay(entry.result, 'memory');
+        }
+
+        const database = this.database && await this.database;
+        if (database) {
+            try {
+                const transaction = database.transaction(['results', 'entries'], 'readwrite');
+                const result = await requestResult(transaction.objectStore('results').get(key));
+                if (result) {
+                    transaction.objectStore('entries').put({ key, bytes: estimateResultBytes(result), lastUsed: Date.now() });
+                    this.remember(key, result);
+                    this.hits++;
+                    this.persistentHits++;
+                    return this.replay(result, 'persistent');
+                }
+            } catch (error) {
+                console.warn('Result cache read failed:', error && error.message);
+            }
+        }
+
+        this.misses++;
+        return null;
+    }
+
+    set(key, result) {
+        const stored = {
+            probabilities: result.probabilities,
+            blochVectors: result.blochVectors,
+            counts: result.counts || null,
+            metadata: result.metadata
+        };
+        this.remember(key, stored);
+        this.persist(key, stored);
+    }
+
+    replay(result, tier) {
+        return { amplitudes: null, ...result, metadata: { ...result.metadata, resultCache: tier } };
+    }
+
+    remember(key, result) {
+        const bytes = estimateResultBytes(result);
+        if (bytes > this.maxBytes) return;
+        const previous = this.entries.get(key);
+        if (previous) {
+            this.entries.delete(key);
+            this.bytes -= previous.bytes;
+        }
+        this.entries.set(key, { result, bytes });
+        this.bytes += bytes;
+        this.evict();
+    }
+
+    evict() {
+        // Map iteration order is insertion order, oldest first
+        for (const [oldest, entry] of this.entries) {
+            if (this.bytes <= this.maxBytes) break;
+            this.entries.delete(oldest);
+            this.bytes -= entry.bytes;
+        }
+    }
+
+    async persist(key, result) {
+        const bytes = estimateResultBytes(result);
+        const database = this.database && await this.database;
+        if (!database || bytes > this.persistentBytes) return;
+
+        try {
+            const transaction = database.transaction(['results', 'entries'], 'readwrite');
+            const results = transaction.objectStore('results');
+            const entries = transaction.objectStore('entries');
+            results.put(result, key);
+            entries.put({ key, bytes, lastUsed: Date.now() });
+
+            // Newest first: keep entries while they fit, delete the rest
+            let total = 0;
+            const cursors = entries.index('lastUsed').openCursor(null, 'prev');
+            cursors.onsuccess = () => {
+                const cursor = cursors.result;
+                if (!cursor) return;
+                total += cursor.value.bytes;
+                if (total > this.persistentBytes) {
+                    results.delete(cursor.value.key);
+                    cursor.delete();
+                }
+                cursor.continue();
+            };
+            await new Promise((resolve, reject) => {
+                transaction.oncomplete = resolve;
+                transaction.onerror = () => reject(transaction.error);
+            });
+        } catch (error) {
+            console.warn('Result cache write failed:', error && error.message);
+        }
+    }
+
+    async clear() {
+        this.entries.clear();
+        this.bytes = 0;
+        const database = this.database && await this.database;
+        if (!database) return;
+        const transaction = database.transaction(['results', 'entries'], 'readwrite');
+        transaction.objectStore('results').clear();
+        transaction.objectStore('entries').clear();
+    }
+
+    stats() {
+        return {
+            hits: this.hits,
+            persistentHits: this.persistentHits,
+            misses: this.misses,
+            entries: this.entries.size,
+            bytes: this.bytes
+        };
+    }
+}
+
+// ==========================================
+// SHARED-MEMORY PARTITIONING
+// ==========================================
+
+// Below this width one worker finishes before barriers pay off
+const PARTITION_MIN_QUBITS = 20;
+// Every worker's chunk keeps at least 2^12 amplitudes
+const PARTITION_MIN_LOCAL_QUBITS = 12;
+
+// SharedArrayBuffer needs a cross-origin isolated page (COOP + COEP headers)
+function sharedMemoryAvailable() {
+    return typeof SharedArrayBuffer !== 'undefined' &&
+        (typeof crossOriginIsolated === 'undefined' || crossOriginIsolated);
+}
+
+// Generation barrier over an Int32Array [arrived, generation]: the last of
+// `parties` workers to arrive resets the count and wakes the others
+function partitionBarrier(counters, parties) {
+    const generation = Atomics.load(counters, 1);
+    if (Atomics.add(counters, 0, 1) === parties - 1) {
+        Atomics.store(counters, 0, 0);
+        Atomics.add(counters, 1, 1);
+        Atomics.notify(counters, 1);
+    } else {
+        Atomics.wait(counters, 1, generation);
+    }
+}
+
+// The same fused op on a chunk that leaves out the first `offset` wires
+function shiftOp(op, offset) {
+    return {
+        ...op,
+        qubit: op.qubit - offset,
+        gates: op.gates.map(gate => ({ ...gate, qubit: gate.qubit - offset }))
+    };
+}
+
+// Sums the parts' reduced density matrices; the amplitudes stay in the
+// shared buffer and the probabilities are copied out so they can be cached
+function combinePartitionResults(parts, partition, circuit, memoryBudgetBytes) {
+    const rho = new Float64Array(4 * circuit.qubits);
+    parts.forEach(part => part.rho.forEach((value, k) => {
+        rho[k] += value;
+    }));
+
+    return {
+        amplitudes: new Float64Array(partition.amplitudes),
+        probabilities: new Float64Array(partition.probabilities).slice(),
+        blochVectors: blochVectorsFromRdm(rho),
+        metadata: {
+            backend: 'statevector',
+            qubits: circuit.qubits,
+            gates: circuit.gates.length,
+            kernels: 'js',
+            partitions: parts.length,
+            barriers: parts[0].barriers,
+            passes: parts[0].passes,
+            durationMs: Math.max(...parts.map(part => part.durationMs)),
+            peakMemoryBytes: partition.amplitudes.byteLength + 2 * partition.probabilities.byteLength,
+            memoryBudgetBytes
+        }
+    };
+}
+
+// ==========================================
+// CIRCUIT MODEL
+// ==========================================
+
+// Cell keys are column * CELL_KEY_STRIDE + qubit, so wires stay below it
+const CELL_KEY_STRIDE = 1 << 20;
+
+function cellKey(qubit, column) {
+    return column * CELL_KEY_STRIDE + qubit;
+}
+
+// Index in a list ordered by key(item) at which value belongs
+function sortedIndex(list, value, key) {
+    let lo = 0;
+    let hi = list.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (key(list[mid]) < value) lo = mid + 1;
+        else hi = mid;
+    }
+    return lo;
+}
+
+const byQubit = gate => gate.qubit;
+const byColumn = gate => gate.column;
+
+// Frozen copy of a gate as it stood when a history entry recorded it
+function gateSnapshot(gate) {
+    return Object.freeze({
+        gate: gate.gate,
+        qubit: gate.qubit,
+        column: gate.column,
+        params: Object.freeze({ ...gate.params })
+    });
+}
+
+function sameSnapshot(a, b) {
+    if (!a || !b) return a === b;
+    return a.gate === b.gate && JSON.stringify(a.params) === JSON.stringify(b.params);
+}
+
+// The builder's circuit: the persisted {gate, qubit, column, params}
+// objects, indexed by cell for O(1) lookups, in per-column buckets ordered
+// by qubit and in per-wire lists ordered by column. At most one gate
+// occupies a cell; placing another replaces it. While a CircuitHistory
+// entry is open, `recorder` collects each touched cell's before and after.
+class CircuitModel {
+    constructor(gates = []) {
+        this.cells = new Map();
+        this.columns = [];
+        this.wires = [];
+        this.orderedGates = null;
+        this.recorder = null;
+        this.revision = 0; // bumped by every edit
+        gates.forEach(gate => this.set(gate));
+    }
+
+    static fromJSON(gates) {
+        return new CircuitModel(Array.isArray(gates) ? gates : []);
+    }
+
+    get size() {
+        return this.cells.size;
+    }
+
+    // One past the last occupied column
+    get depth() {
+        return this.columns.length;
+    }
+
+    get(qubit, column) {
+        return this.cells.get(cellKey(qubit, column));
+    }
+
+    has(qubit, column) {
+        return this.cells.has(cellKey(qubit, column));
+    }
+
+    // Gates in a column, ordered by qubit
+    column(column) {
+        return this.columns[column] || [];
+    }
+
+    // Gates on a wire, ordered by column
+    wire(qubit) {
+        return this.wires[qubit] || [];
+    }
+
+    // Keeps the first `before` and the latest `after` of each cell
+    record(key, before, after) {
+        const change = this.recorder.get(key);
+        if (change) change.after = after;
+        else this.recorder.set(key, { before, after });
+    }
+
+    // Places a gate object at its (qubit, column); returns the gate it replaced
+    set(gate) {
+        const replaced = this.remove(gate.qubit, gate.column);
+        const key = cellKey(gate.qubit, gate.column);
+        this.cells.set(key, gate);
+        if (this.recorder) this.record(key, null, gateSnapshot(gate));
+
+        const bucket = this.columns[gate.column] || (this.columns[gate.column] = []);
+        bucket.splice(sortedIndex(bucket, gate.qubit, byQubit), 0, gate);
+        const wire = this.wires[gate.qubit] || (this.wires[gate.qubit] = []);
+        wire.splice(sortedIndex(wire, gate.column, byColumn), 0, gate);
+
+        this.orderedGates = null;
+        this.revision++;
+        return replaced;
+    }
+
+    remove(qubit, column) {
+        const key = cellKey(qubit, column);
+        const gate = this.cells.get(key);
+        if (!gate) return null;
+        this.cells.delete(key);
+        if (this.recorder) this.record(key, gateSnapshot(gate), null);
+
+        const bucket = this.columns[column];
+        bucket.splice(sortedIndex(bucket, qubit, byQubit), 1);
+        const wire = this.wires[qubit];
+        wire.splice(sortedIndex(wire, column, byColumn), 1);
+        // Keep depth at one past the last occupied column
+        while (this.columns.length > 0 && !this.columns[this.columns.length - 1]?.length) {
+            this.columns.pop();
+        }
+
+        this.orderedGates = null;
+        this.revision++;
+        return gate;
+    }
+
+    // Moves the gate at (qubit, column) to a new cell; returns the gate it
+    // replaced there, or null
+    move(qubit, column, newQubit, newColumn) {
+        const gate = this.remove(qubit, column);
+        if (!gate) return null;
+        gate.qubit = newQubit;
+        gate.column = newColumn;
+        return this.set(gate);
+    }
+
+    // Drops every gate on a wire, e.g. when the last qubit is removed
+    removeWire(qubit) {
+        [...this.wire(qubit)].forEach(gate => this.remove(gate.qubit, gate.column));
+    }
+
+    clear() {
+        if (this.recorder) {
+            this.cells.forEach((gate, key) => this.record(key, gateSnapshot(gate), null));
+        }
+        this.cells.clear();
+        this.columns = [];
+        this.wires = [];
+        this.orderedGates = null;
+        this.revision++;
+    }
+
+    // Swaps in another circuit's gates (import, templates, loading)
+    replaceAll(gates) {
+        this.clear();
+        (Array.isArray(gates) ? gates : []).forEach(gate => this.set(gate));
+    }
+
+    // Gates by column then qubit: the order the simulator and code
+    // generators consume, rebuilt from the buckets only after an edit.
+    // Callers must not reorder the returned array.
+    ordered() {
+        if (!this.orderedGates) {
+            this.orderedGates = [];
+            for (const bucket of this.columns) {
+                if (bucket) this.orderedGates.push(...bucket);
+            }
+        }
+        return this.orderedGates;
+    }
+
+    some(predicate) {
+        return this.ordered().some(predicate);
+    }
+
+    forEach(callback) {
+        this.ordered().forEach(callback);
+    }
+
+    [Symbol.iterator]() {
+        return this.ordered()[Symbol.iterator]();
+    }
+
+    // Persisted form: the plain gate array
+    toJSON() {
+        return this.ordered();
+    }
+}
+
+// ==========================================
+// EDIT HISTORY
+// ==========================================
+
+const DEFAULT_HISTORY_BYTES = 4 * 1024 * 1024;
+
+// Edits that continue the previous one this soon merge into its entry
+const HISTORY_COALESCE_MS = 2000;
+
+// Approximate V8 heap cost of an entry (object and Map), of one recorded
+// cell and of one frozen gate snapshot, measured with --expose-gc
+const HISTORY_ENTRY_BYTES = 300;
+const HISTORY_CHANGE_BYTES = 72;
+const GATE_SNAPSHOT_BYTES = 120;
+
+function historyEntryBytes(entry) {
+    let bytes = HISTORY_ENTRY_BYTES + HISTORY_CHANGE_BYTES * entry.changes.size;
+    for (const { before, after } of entry.changes.values()) {
+        if (before) bytes += GATE_SNAPSHOT_BYTES;
+        if (after) bytes += GATE_SNAPSHOT_BYTES;
+    }
+    return bytes;
+}
+
+// Undo/redo as per-cell diffs instead of whole-circuit copies. An entry
+// holds, for each cell an edit touched, the gate before and after it (or
+// null) plus the qubit count on either side; undo writes the befores back
+// and redo the afters. Cells are independent, so the order edits happened
+// in does not matter and an entry costs only what it changed. Entries are
+// evicted oldest first once their total passes maxBytes (Infinity keeps
+// everything).
+class CircuitHistory {
+    constructor(maxBytes = DEFAULT_HISTORY_BYTES) {
+        this.maxBytes = maxBytes;
+        this.undoStack = [];
+        this.redoStack = [];
+        this.bytes = 0;
+        this.open = null;
+        this.model = null;
+    }
+
+    get canUndo() {
+        return this.undoStack.length > 0;
+    }
+
+    get canRedo() {
+        return this.redoStack.length > 0;
+    }
+
+    get nextUndo() {
+        return this.undoStack[this.undoStack.length - 1] || null;
+    }
+
+    get nextRedo() {
+        return this.redoStack[this.redoStack.length - 1] || null;
+    }
+
+    // Records the model's edits from here on into a new entry. An edit whose
+    // `from` matches the last entry's `to` (the same gate dragged again)
+    // reopens that entry instead, so a run of drags undoes in one step.
+    checkpoint(model, qubits, { label = 'Edit', from = null, to = null } = {}) {
+        this.close(qubits);
+        const last = this.nextUndo;
+        const now = Date.now();
+        if (from !== null && last && last.to === from && !this.canRedo &&
+            now - last.time < HISTORY_COALESCE_MS) {
+            this.bytes -= last.bytes;
+            this.open = last;
+        } else {
+            this.clearRedo();
+            this.open = { label, changes: new Map(), qubits: [qubits, qubits], time: now, to: null, bytes: 0 };
+            this.undoStack.push(this.open);
+        }
+        this.open.to = to;
+        this.open.time = now;
+        this.model = model;
+        model.recorder = this.open.changes;
+    }
+
+    // Stops recording; cells that ended where they started are dropped,
+    // and so is an entry left with nothing to undo
+    close(qubits) {
+        const entry = this.open;
+        if (!entry) return;
+        this.open = null;
+        this.model.recorder = null;
+        entry.qubits[1] = qubits;
+
+        entry.changes.forEach((change, key) => {
+            if (sameSnapshot(change.before, change.after)) entry.changes.delete(key);
+        });
+        if (entry.changes.size === 0 && entry.qubits[0] === entry.qubits[1]) {
+            this.undoStack.pop();
+            return;
+        }
+        entry.bytes = historyEntryBytes(entry);
+        this.bytes += entry.bytes;
+        while (this.bytes > this.maxBytes && this.undoStack.length > 1) {
+            this.bytes -= this.undoStack.shift().bytes;
+        }
+    }
+
+    // Reverts the newest entry on the model; returns it so the caller can
+    // restore entry.qubits[0], or null when there is nothing to undo
+    undo(model, qubits) {
+        this.close(qubits);
+        const entry = this.undoStack.pop();
+        if (!entry) return null;
+        this.applyChanges(model, entry, 'before');
+        this.redoStack.push(entry);
+        return entry;
+    }
+
+    redo(model, qubits) {
+        this.close(qubits);
+        const entry = this.redoStack.pop();
+        if (!entry) return null;
+        this.applyChanges(model, entry, 'after');
+        this.undoStack.push(entry);
+        return entry;
+    }
+
+    applyChanges(model, entry, side) {
+        entry.changes.forEach(({ before, after }) => {
+            const cell = before || after;
+            model.remove(cell.qubit, cell.column);
+        });
+        entry.changes.forEach(change => {
+            const gate = change[side];
+            if (gate) model.set({ ...gate, params: { ...gate.params } });
+        });
+    }
+
+    clearRedo() {
+        this.redoStack.forEach(entry => {
+            this.bytes -= entry.bytes;
+        });
+        this.redoStack = [];
+    }
+
+    clear() {
+        if (this.open) this.model.recorder = null;
+        this.open = null;
+        this.undoStack = [];
+        this.redoStack = [];
+        this.bytes = 0;
+    }
+
+    // Bytes held by each entry, newest undo first, then the redo stack
+    report() {
+        const describe = stack => entry => ({
+            stack,
+            label: entry.label,
+            cells: entry.changes.size,
+            bytes: entry === this.open ? historyEntryBytes(entry) : entry.bytes
+        });
+        return {
+            entries: [
+                ...this.undoStack.map(describe('undo')).reverse(),
+                ...this.redoStack.map(describe('redo')).reverse()
+            ],
+            bytes: this.bytes,
+            maxBytes: this.maxBytes
+        };
+    }
+}
+
+// ==========================================
+// CIRCUIT SIMULATOR
+// ==========================================
+
+class QuantumSimulator {
+    constructor(options = {}) {
+        this.memoryBudgetBytes = options.memoryBudgetBytes ?? DEFAULT_MEMORY_BUDGET_BYTES;
+        this.backend = options.backend || 'auto';
+        this.fusion = options.fusion ?? true;
+        this.passes = { unfused: 0, fused: 0 };
+        this.prefixCache = options.prefixCache || null;
+        this.prefixStats = null;
+        this.shots = options.shots ?? DEFAULT_SHOTS;
+        this.seed = options.seed;
+        this.sampling = options.sampling ?? false;
+        this.maxBondDimension = options.maxBondDimension ?? DEFAULT_MAX_BOND_DIMENSION;
+        this.noise = options.noise || null;
+        this.trajectories = options.trajectories ?? DEFAULT_TRAJECTORIES;
+        this.simd = options.simd ?? true;
+        this.currentMemoryBytes = 0;
+        this.peakMemoryBytes = 0;
+    }
+
+    // Statevector plus the probability buffer derived from it. 2 ** n
+    // compiles to a pow() call, so widths the engine can hold use a shift.
+    static estimateMemoryBytes(qubits) {
+        const size = qubits >= 0 && qubits <= MAX_ENGINE_QUBITS ? 1 << qubits : 2 ** qubits;
+        return size * (BYTES_PER_AMPLITUDE + BYTES_PER_PROBABILITY);
+    }
+
+    static maxQubitsForBudget(budgetBytes = DEFAULT_MEMORY_BUDGET_BYTES) {
+        let qubits = 0;
+        while (qubits < MAX_ENGINE_QUBITS && QuantumSimulator.estimateMemoryBytes(qubits + 1) <= budgetBytes) {
+            qubits++;
+        }
+        return qubits;
+    }
+
+    // Circuits wider than the statevector budget run on the stabilizer
+    // backend when Clifford-only and on the MPS backend otherwise
+    static maxQubitsForCircuit(gates) {
+        return isCliffordCircuit(gates) ? MAX_STABILIZER_QUBITS : MAX_MPS_QUBITS;
+    }
+
+    // Noisy circuits use the exact density matrix while 4^n amplitudes fit
+    // the budget and Monte Carlo trajectories beyond that. Clifford circuits
+    // stay on the exact statevector while it fits, since the stabilizer
+    // backend estimates wide output distributions from shots.
+    selectBackend(circuit) {
+        if (this.backend !== 'auto') return this.backend;
+        if (this.noise) {
+            return DensityMatrix.estimateMemoryBytes(circuit.qubits) <= this.memoryBudgetBytes &&
+                2 * circuit.qubits <= MAX_ENGINE_QUBITS
+                ? 'density'
+                : 'trajectories';
+        }
+        const fits = QuantumSimulator.estimateMemoryBytes(circuit.qubits) <= this.memoryBudgetBytes;
+        if (!fits && isCliffordCircuit(circuit.gates)) return 'stabilizer';
+        if (this.prefersSparse(circuit)) return 'sparse';
+        return fits ? 'statevector' : 'mps';
+    }
+
+    // Each H, RX or RY at most doubles the nonzero amplitudes, so few of
+    // them on a wide register bound the fill well below the dense size
+    prefersSparse(circuit) {
+        const n = circuit.qubits;
+        if (n < SPARSE_MIN_QUBITS || n > MAX_SPARSE_QUBITS) return false;
+        const bound = 2 ** countBranchingGates(circuit.gates);
+        return bound <= SPARSE_FILL_THRESHOLD * 2 ** n &&
+            bound * BYTES_PER_SPARSE_AMPLITUDE <= this.memoryBudgetBytes;
+    }
+
+    // Dense registers use the SIMD kernels once loadSimdKernels has run
+    usesSimd(qubits) {
+        return this.simd && simdKernelsLoaded() && qubits <= MAX_SIMD_QUBITS;
+    }
+
+    createState(qubits) {
+        return this.usesSimd(qubits) ? new SimdStateVector(qubits) : new StateVector(qubits);
+    }
+
+    checkMemoryBudget(qubits) {
+        const required = QuantumSimulator.estimateMemoryBytes(qubits);
+        if (required > this.memoryBudgetBytes) {
+            const maxQubits = QuantumSimulator.maxQubitsForBudget(this.memoryBudgetBytes);
+            throw new Error(
+                `${qubits} qubits need ${formatBytes(required)} of simulation memory, ` +
+                `which exceeds the ${formatBytes(this.memoryBudgetBytes)} budget (max ${maxQubits} qubits)`
+            );
+        }
+    }
+
+    trackAllocation(bytes) {
+        this.currentMemoryBytes += bytes;
+        this.peakMemoryBytes = Math.max(this.peakMemoryBytes, this.currentMemoryBytes);
+    }
+
+    releaseAllocation(bytes) {
+        this.currentMemoryBytes = Math.max(0, this.currentMemoryBytes - bytes);
+    }
+
+    // Tracks buffers allocated after the up-front budget check
+    reserveAllocation(bytes, purpose) {
+        if (this.currentMemoryBytes + bytes > this.memoryBudgetBytes) {
+            throw new Error(
+                `${purpose} needs ${formatBytes(bytes)} more than the ` +
+                `${formatBytes(this.memoryBudgetBytes)} simulation budget allows`
+            );
+        }
+        this.trackAllocation(bytes);
+    }
+
+    checkTrajectories() {
+        if (!Number.isInteger(this.trajectories) || this.trajectories < 1) {
+            throw new Error(`Trajectory count must be a positive integer, got ${this.trajectories}`);
+        }
+    }
+
+    checkShots() {
+        if (!Number.isInteger(this.shots) || this.shots < 1) {
+            throw new Error(`Shot count must be a positive integer, got ${this.shots}`);
+        }
+    }
+
+    // Depth-first over mid-circuit measurement outcomes. Each branch carries
+    // the shots that landed on it, so there are at most min(shots, 2^m)
+    // leaves and at most m + 1 registers alive at once.
+    sampleBranches(register, segments, index, shots, random, apply, leaf) {
+        const segment = segments[index];
+        apply(register, segment.gates);
+        if (!segment.measure) {
+            leaf(register, shots);
+            return;
+        }
+
+        const q = segment.measure.qubit;
+        const p1 = register.probabilityOfOne(q);
+        let ones = 0;
+        for (let shot = 0; shot < shots; shot++) {
+            if (random() < p1) ones++;
+        }
+
+        const outcomes = [[0, shots - ones], [1, ones]].filter(([, count]) => count > 0);
+        outcomes.forEach(([outcome, count], k) => {
+            let branch = register;
+            if (k < outcomes.length - 1) {
+                this.reserveAllocation(register.byteLength, 'Branching on a mid-circuit measurement');
+                branch = register.clone();
+            }
+            branch.collapse(q, outcome);
+            this.sampleBranches(branch, segments, index + 1, count, random, apply, leaf);
+            if (branch !== register) this.releaseAllocation(branch.byteLength);
+        });
+    }
+
+    orderGates(gates) {
+        for (let i = 1; i < gates.length; i++) {
+            if (byPosition(gates[i - 1], gates[i]) > 0) {
+                return [...gates].sort(byPosition);
+            }
+        }
+        return gates;
+    }
+
+    applyGate(state, gate) {
+        const q = gate.qubit;
+
+        switch (gate.gate) {
+            case 'measure':
+                // Terminal measurements do not change the outcome distribution
+                return;
+            case 'cx':
+            case 'cz':
+            case 'swap':
+                // Two-qubit gates act on (qubit, qubit + 1), as in code generation
+                if (q + 1 >= state.numQubits) return;
+                if (gate.gate === 'cx') state.applyCX(q, q + 1);
+                else if (gate.gate === 'cz') state.applyCZ(q, q + 1);
+                else state.applySwap(q, q + 1);
+                return;
+            case 'h':
+                state.applyHadamard(q);
+                return;
+            case 'x':
+                state.applyPauliX(q);
+                return;
+            case 'z':
+            case 's':
+            case 't':
+            case 'rz':
+                state.applyDiagonal(q, gateMatrix(gate));
+                return;
+            default:
+                state.applyMatrix(q, gateMatrix(gate));
+        }
+    }
+
+    applyOp(state, op) {
+        if (op.gates.length === 1) {
+            this.applyGate(state, op.gates[0]);
+        } else if (op.type === 'pair') {
+            state.applyMatrix4(op.qubit, op.matrix);
+        } else if (isDiagonal2x2(op.matrix)) {
+            state.applyDiagonal(op.qubit, op.matrix);
+        } else {
+            state.applyMatrix(op.qubit, op.matrix);
+        }
+    }
+
+    // Applies gates to the state, fused when the state is wide enough to
+    // make it pay, and returns how many sweeps that took with and without
+    applyGates(state, gates) {
+        if (state.numQubits <= SMALL_CIRCUIT_QUBITS) {
+            const sweeps = this.applySmallGates(state, gates);
+            return { unfused: sweeps, fused: sweeps };
+        }
+
+        let unfused = 0;
+        for (const gate of gates) {
+            if (sweepsState(gate, state.numQubits)) unfused++;
+        }
+
+        if (this.fusion && state.numQubits >= FUSION_MIN_QUBITS) {
+            const ops = fuseGates(gates, state.numQubits);
+            ops.forEach(op => this.applyOp(state, op));
+            return { unfused, fused: ops.filter(op => op.type !== 'barrier').length };
+        }
+        gates.forEach(gate => this.applyGate(state, gate));
+        return { unfused, fused: unfused };
+    }
+
+    // On a small register a sweep is a handful of iterations, so calling a
+    // kernel and setting it up costs as much as the sweep. Here the fixed
+    // gates run inline in one switch: X, Y, Z and S only move or negate
+    // amplitudes, and the arithmetic matches the kernels bit for bit. The
+    // rest go through applyGate. The k-th (|..0..⟩, |..1..⟩) pair starts at
+    // k + (k & -bit), which inserts a 0 at the target bit, so each sweep is
+    // one flat loop. Returns the number of sweeps.
+    applySmallGates(state, gates) {
+        const amps = state.amplitudes;
+        const n = state.numQubits;
+        const half = state.size >> 1;
+        let sweeps = 0;
+
+        for (const gate of gates) {
+            const q = gate.qubit;
+            const bit = state.bitMask(q);
+
+            switch (gate.gate) {
+                case 'h':
+                    for (let k = 0; k < half; k++) {
+                        const p = 2 * (k + (k & -bit));
+                        const r = p + 2 * bit;
+                        const xr = amps[p], xi = amps[p + 1];
+                        const yr = amps[r], yi = amps[r + 1];
+                        amps[p] = ENGINE_INV_SQRT2 * (xr + yr);
+                        amps[p + 1] = ENGINE_INV_SQRT2 * (xi + yi);
+                        amps[r] = ENGINE_INV_SQRT2 * (xr - yr);
+                        amps[r + 1] = ENGINE_INV_SQRT2 * (xi - yi);
+                    }
+                    break;
+                case 'x':
+                    for (let k = 0; k < half; k++) {
+                        const p = 2 * (k + (k & -bit));
+                        const r = p + 2 * bit;
+                        const xr = amps[p], xi = amps[p + 1];
+                        amps[p] = amps[r];
+                        amps[p + 1] = amps[r + 1];
+                        amps[r] = xr;
+                        amps[r + 1] = xi;
+                    }
+                    break;
+                case 'y':
+                    // |0⟩ <- -i|1⟩, |1⟩ <- i|0⟩
+                    for (let k = 0; k < half; k++) {
+                        const p = 2 * (k + (k & -bit));
+                        const r = p + 2 * bit;
+                        const xr = amps[p], xi = amps[p + 1];
+                        amps[p] = amps[r + 1];
+                        amps[p + 1] = -amps[r];
+                        amps[r] = -xi;
+                        amps[r + 1] = xr;
+                    }
+                    break;
+                case 'z':
+                    for (let k = 0; k < half; k++) {
+                        const r = 2 * (k + (k & -bit) + bit);
+                        amps[r] = -amps[r];
+                        amps[r + 1] = -amps[r + 1];
+                    }
+                    break;
+                case 's':
+                    for (let k = 0; k < half; k++) {
+                        const r = 2 * (k + (k & -bit) + bit);
+                        const yr = amps[r];
+                        amps[r] = -amps[r + 1];
+                        amps[r + 1] = yr;
+                    }
+                    break;
+                case 't':
+                    for (let k = 0; k < half; k++) {
+                        const r = 2 * (k + (k & -bit) + bit);
+                        const yr = amps[r], yi = amps[r + 1];
+                        amps[r] = ENGINE_INV_SQRT2 * yr - ENGINE_INV_SQRT2 * yi;
+                        amps[r + 1] = ENGINE_INV_SQRT2 * yi + ENGINE_INV_SQRT2 * yr;
+                    }
+                    break;
+                case 'cx':
+                    // Control is the qubit, target the one below it
+                    if (q + 1 >= n) continue;
+                    for (let k = 0; k < half >> 1; k++) {
+                        const p = 2 * (state.spreadIndex(k, bit >> 1, bit) + bit);
+                        const r = p + bit;
+                        const xr = amps[p], xi = amps[p + 1];
+                        amps[p] = amps[r];
+                        amps[p + 1] = amps[r + 1];
+                        amps[r] = xr;
+                        amps[r + 1] = xi;
+                    }
+                    break;
+                case 'cz':
+                    if (q + 1 >= n) continue;
+                    for (let k = 0; k < half >> 1; k++) {
+                        const r = 2 * (state.spreadIndex(k, bit >> 1, bit) + bit) + bit;
+                        amps[r] = -amps[r];
+                        amps[r + 1] = -amps[r + 1];
+                    }
+                    break;
+                default:
+                    this.applyGate(state, gate);
+                    if (!sweepsState(gate, n)) continue;
+            }
+            sweeps++;
+        }
+        return sweeps;
+    }
+
+    simulateState(circuit) {
+        this.checkMemoryBudget(circuit.qubits);
+        const state = this.createState(circuit.qubits);
+        this.trackAllocation(state.amplitudes.byteLength);
+
+        const gates = this.orderGates(circuit.gates);
+        for (const gate of gates) {
+            if (gate.qubit >= circuit.qubits) {
+                throw new Error(`Gate ${gate.gate} targets missing qubit ${gate.qubit}`);
+            }
+        }
+
+        if (!this.prefixCache) {
+            this.passes = this.applyGates(state, gates);
+            return state;
+        }
+
+        // Resume from the deepest column whose prefix is unchanged, then
+        // snapshot the columns simulated after it. Only the trailing columns
+        // would survive eviction, so earlier ones are not copied at all.
+        const segments = columnSegments(gates, circuit.qubits);
+        const cached = this.prefixCache.lookup(segments);
+        if (cached.amplitudes) state.amplitudes.set(cached.amplitudes);
+        const firstSnapshot = segments.length - this.prefixCache.capacityFor(state.amplitudes.byteLength);
+
+        this.passes = { unfused: 0, fused: 0 };
+        for (let i = cached.index + 1; i < segments.length; i++) {
+            const { start, end, key } = segments[i];
+            const passes = this.applyGates(state, gates.slice(start, end));
+            this.passes.unfused += passes.unfused;
+            this.passes.fused += passes.fused;
+            if (i >= firstSnapshot) this.prefixCache.store(key, state.amplitudes);
+        }
+
+        this.prefixStats = {
+            resumedFromColumn: cached.index >= 0 ? segments[cached.index].column : null,
+            columnsSimulated: segments.length - cached.index - 1,
+            ...this.prefixCache.stats()
+        };
+        return state;
+    }
+
+    // Raw result with typed buffers, suitable for transfer from a worker
+    simulate(circuit) {
+        const started = performance.now();
+        this.currentMemoryBytes = 0;
+        this.peakMemoryBytes = 0;
+
+        const small = this.smallCircuitGates(circuit);
+        if (small) return this.simulateSmall(circuit, small, started);
+
+        const backend = this.selectBackend(circuit);
+        let result;
+        if (backend === 'stabilizer') result = this.simulateStabilizer(circuit);
+        else if (backend === 'mps') result = this.simulateMps(circuit);
+        else if (backend === 'sparse') result = this.simulateSparse(circuit);
+        else if (backend === 'density') result = this.simulateDensity(circuit);
+        else if (backend === 'trajectories') result = this.simulateTrajectories(circuit);
+        else result = this.simulateStatevector(circuit);
+
+        result.metadata = {
+            backend,
+            qubits: circuit.qubits,
+            gates: circuit.gates.length,
+            durationMs: performance.now() - started,
+            peakMemoryBytes: this.peakMemoryBytes,
+            memoryBudgetBytes: this.memoryBudgetBytes,
+            ...result.metadata
+        };
+        return result;
+    }
+
+    // Ordered gates when the circuit can take the small fast path: auto or
+    // statevector backend, no noise, sampling or prefix cache, and no
+    // mid-circuit measurement. Null otherwise.
+    smallCircuitGates(circuit) {
+        if (circuit.qubits > SMALL_CIRCUIT_QUBITS || this.noise || this.sampling || this.prefixCache) return null;
+        if (this.backend !== 'auto' && this.backend !== 'statevector') return null;
+        const gates = this.orderGates(circuit.gates);
+        if (gates.some(gate => gate.gate === 'measure') &&
+            splitAtMidCircuitMeasurements(gates, circuit.qubits).length > 1) {
+            return null;
+        }
+        return gates;
+    }
+
+    simulateSmall(circuit, gates, started) {
+        this.checkMemoryBudget(circuit.qubits);
+        this.checkGateQubits(gates, circuit.qubits);
+        const state = new StateVector(circuit.qubits);
+        this.passes = this.applyGates(state, gates);
+        const probabilities = state.probabilities();
+        this.trackAllocation(state.amplitudes.byteLength + probabilities.byteLength);
+
+        return {
+            state,
+            probabilities,
+            blochVectors: state.blochVectors(),
+            metadata: {
+                backend: 'statevector',
+                qubits: circuit.qubits,
+                gates: circuit.gates.length,
+                durationMs: performance.now() - started,
+                peakMemoryBytes: this.peakMemoryBytes,
+                memoryBudgetBytes: this.memoryBudgetBytes,
+                passes: this.passes,
+                kernels: 'js'
+            }
+        };
+    }
+
+    simulateStatevector(circuit) {
+        const segments = splitAtMidCircuitMeasurements(this.orderGates(circuit.gates), circuit.qubits);
+        if (segments.length > 1) return this.sampleStatevectorBranches(circuit, segments);
+
+        const state = this.simulateState(circuit);
+
+        const probabilities = state.probabilities();
+        this.trackAllocation(probabilities.byteLength);
+
+        const blochVectors = state.blochVectors();
+
+        const metadata = { passes: this.passes, kernels: this.usesSimd(circuit.qubits) ? 'simd' : 'js' };
+        if (this.prefixCache) metadata.prefixCache = this.prefixStats;
+        const result = {
+            state: state instanceof SimdStateVector ? state.toStateVector() : state,
+            probabilities,
+            blochVectors,
+            metadata
+        };
+
+        if (this.sampling) this.sampleExact(result, circuit.qubits);
+        return result;
+    }
+
+    // Draws shot counts from an exact outcome distribution
+    sampleExact(result, qubits) {
+        this.checkShots();
+        this.reserveAllocation(result.probabilities.length * BYTES_PER_ALIAS_ENTRY, 'Shot sampling');
+        const histogram = new ShotHistogram(qubits, this.shots);
+        this.trackAllocation(histogram.byteLength);
+        new AliasSampler(result.probabilities).sampleInto(histogram, this.shots, createRandom(this.seed));
+        result.counts = histogram.toCounts();
+        Object.assign(result.metadata, { shots: this.shots, seed: this.seed ?? null, exactProbabilities: true });
+    }
+
+    checkGateQubits(gates, qubits) {
+        for (const gate of gates) {
+            if (gate.qubit >= qubits) {
+                throw new Error(`Gate ${gate.gate} targets missing qubit ${gate.qubit}`);
+            }
+        }
+    }
+
+    // Exact mixed-state evolution under the noise model. Unread mid-circuit
+    // measurements dephase the measured qubit; readout error is applied to
+    // the final distribution.
+    simulateDensity(circuit) {
+        const n = circuit.qubits;
+        const required = DensityMatrix.estimateMemoryBytes(n);
+        if (required > this.memoryBudgetBytes || 2 * n > MAX_ENGINE_QUBITS) {
+            throw new Error(
+                `${n} qubits need ${formatBytes(required)} for density-matrix simulation, ` +
+                `which exceeds the ${formatBytes(this.memoryBudgetBytes)} budget; use trajectories instead`
+            );
+        }
+
+        const gates = this.orderGates(circuit.gates);
+        this.checkGateQubits(gates, n);
+        const noise = this.noise || {};
+
+        const rho = new DensityMatrix(n);
+        this.trackAllocation(rho.byteLength);
+        const dephasing = krausChannel('measurement', 1).superoperator;
+        let channels = 0;
+
+        const segments = splitAtMidCircuitMeasurements(gates, n);
+        segments.forEach(segment => {
+            segment.gates.forEach(gate => {
+                const gateChannels = gateNoise(noise, gate, n);
+                rho.applyGate(gate, gateChannels);
+                gateChannels.forEach(wire => {
+                    channels += wire.channels.length;
+                });
+            });
+            if (segment.measure) rho.applySuperoperator(segment.measure.qubit, dephasing);
+        });
+
+        const probabilities = applyReadoutError(rho.probabilities(), n, noise.readoutError);
+        this.trackAllocation(probabilities.byteLength);
+
+        const result = {
+            state: null,
+            probabilities,
+            blochVectors: rho.blochVectors(),
+            metadata: {
+                noise: true,
+                channels,
+                readoutError: noise.readoutError || 0,
+                midCircuitMeasurements: segments.length - 1
+            }
+        };
+        if (this.sampling) this.sampleExact(result, n);
+        return result;
+    }
+
+    // Picks one Kraus operator with probability ||K psi||^2 and renormalises.
+    // Unitary mixtures are chosen by their fixed weights without a pass over
+    // the state, and the last operator's weight is whatever remains.
+    applyKraus(state, qubit, entry, random) {
+        const r = random();
+        if (entry.mixture) {
+            let k = 0;
+            let cumulative = entry.mixture[0];
+            while (r >= cumulative && k < entry.mixture.length - 1) cumulative += entry.mixture[++k];
+            if (k > 0) state.applyMatrix(qubit, entry.unitaries[k]);
+            return;
+        }
+
+        const last = entry.kraus.length - 1;
+        let cumulative = 0;
+        for (let k = 0; k <= last; k++) {
+            const weight = k < last ? state.normAfter(qubit, entry.kraus[k]) : 1 - cumulative;
+            cumulative += weight;
+            if ((r < cumulative || k === last) && weight > 0) {
+                state.applyMatrix(qubit, entry.kraus[k]);
+                state.scale(1 / Math.sqrt(weight));
+                return;
+            }
+        }
+    }
+
+    // Monte Carlo wavefunction: every trajectory is a pure state that takes
+    // one Kraus branch per channel, so memory stays at one statevector and
+    // the averages converge as 1/sqrt(trajectories)
+    simulateTrajectories(circuit) {
+        const n = circuit.qubits;
+        this.checkMemoryBudget(n);
+        this.checkTrajectories();
+
+        const gates = this.orderGates(circuit.gates);
+        this.checkGateQubits(gates, n);
+        const noise = this.noise || {};
+        const segments = splitAtMidCircuitMeasurements(gates, n).map(segment => ({
+            measure: segment.measure,
+            steps: segment.gates.map(gate => ({ gate, channels: gateNoise(noise, gate, n) }))
+        }));
+
+        const random = createRandom(this.seed);
+        const state = this.createState(n);
+        this.trackAllocation(state.byteLength);
+        const probabilities = new Float64Array(state.size);
+        this.trackAllocation(probabilities.byteLength);
+        const blochVectors = Array.from({ length: n }, () => ({ x: 0, y: 0, z: 0 }));
+        const amps = state.amplitudes;
+
+        for (let t = 0; t < this.trajectories; t++) {
+            amps.fill(0);
+            amps[0] = 1;
+            for (const segment of segments) {
+                for (const { gate, channels } of segment.steps) {
+                    this.applyGate(state, gate);
+                    for (const wire of channels) {
+                        for (const entry of wire.channels) this.applyKraus(state, wire.qubit, entry, random);
+                    }
+                }
+                if (segment.measure) {
+                    const q = segment.measure.qubit;
+                    state.collapse(q, random() < state.probabilityOfOne(q) ? 1 : 0);
+                }
+            }
+
+            for (let i = 0; i < state.size; i++) {
+                probabilities[i] += amps[2 * i] * amps[2 * i] + amps[2 * i + 1] * amps[2 * i + 1];
+            }
+            addWeightedBloch(blochVectors, state, 1 / this.trajectories);
+        }
+
+        for (let i = 0; i < probabilities.length; i++) probabilities[i] /= this.trajectories;
+        applyReadoutError(probabilities, n, noise.readoutError);
+
+        const result = {
+            state: null,
+            probabilities,
+            blochVectors,
+            metadata: {
+                noise: true,
+                trajectories: this.trajectories,
+                seed: this.seed ?? null,
+                readoutError: noise.readoutError || 0,
+                midCircuitMeasurements: segments.length - 1
+            }
+        };
+        if (this.sampling) {
+            this.sampleExact(result, n);
+            result.metadata.exactProbabilities = false;
+        }
+        return result;
+    }
+
+    // Mid-circuit measurements make the outcome a mixture, so every leaf
+    // branch is sampled and probabilities are estimated from the counts
+    sampleStatevectorBranches(circuit, segments) {
+        this.checkShots();
+        this.checkMemoryBudget(circuit.qubits);
+        for (const gate of circuit.gates) {
+            if (gate.qubit >= circuit.qubits) {
+                throw new Error(`Gate ${gate.gate} targets missing qubit ${gate.qubit}`);
+            }
+        }
+
+        const random = createRandom(this.seed);
+        const state = this.createState(circuit.qubits);
+        this.trackAllocation(state.byteLength);
+
+        const histogram = new ShotHistogram(circuit.qubits, this.shots);
+        this.trackAllocation(histogram.byteLength);
+        const blochVectors = Array.from({ length: circuit.qubits }, () => ({ x: 0, y: 0, z: 0 }));
+        const passes = { unfused: 0, fused: 0 };
+
+        const apply = (register, gates) => {
+            const applied = this.applyGates(register, gates);
+            passes.unfused += applied.unfused;
+            passes.fused += applied.fused;
+        };
+        const leaf = (register, shots) => {
+            const probabilities = register.probabilities();
+            const bytes = probabilities.byteLength + probabilities.length * BYTES_PER_ALIAS_ENTRY;
+            this.reserveAllocation(bytes, 'Shot sampling');
+            new AliasSampler(probabilities).sampleInto(histogram, shots, random);
+            this.releaseAllocation(bytes);
+            addWeightedBloch(blochVectors, register, shots / this.shots);
+        };
+        this.sampleBranches(state, segments, 0, this.shots, random, apply, leaf);
+
+        const counts = histogram.toCounts();
+
+        return {
+            state: null,
+            probabilities: this.densify(countFrequencies(counts, this.shots), circuit.qubits),
+            blochVectors,
+            counts,
+            metadata: {
+                passes,
+                kernels: this.usesSimd(circuit.qubits) ? 'simd' : 'js',
+                shots: this.shots,
+                seed: this.seed ?? null,
+                exactProbabilities: false,
+                midCircuitMeasurements: segments.length - 1
+            }
+        };
+    }
+
+    // Approximate for entangled circuits: every two-qubit split keeps at most
+    // maxBondDimension singular values and the discarded weight is reported
+    // as truncationError. Probabilities are exact for small registers and
+    // estimated from the shot counts otherwise.
+    simulateMps(circuit) {
+        const required = MatrixProductState.estimateMemoryBytes(circuit.qubits, this.maxBondDimension);
+        if (required > this.memoryBudgetBytes) {
+            throw new Error(
+                `${circuit.qubits} qubits at bond dimension ${this.maxBondDimension} need up to ` +
+                `${formatBytes(required)} for MPS simulation, which exceeds the ` +
+                `${formatBytes(this.memoryBudgetBytes)} budget`
+            );
+        }
+        this.checkShots();
+
+        const gates = this.orderGates(circuit.gates);
+        for (const gate of gates) {
+            if (gate.qubit >= circuit.qubits) {
+                throw new Error(`Gate ${gate.gate} targets missing qubit ${gate.qubit}`);
+            }
+        }
+
+        const mps = new MatrixProductState(circuit.qubits, { maxBond: this.maxBondDimension });
+        const random = createRandom(this.seed);
+        const segments = splitAtMidCircuitMeasurements(gates, circuit.qubits);
+        const apply = (register, segmentGates) => register.applyOps(fuseGates(segmentGates, circuit.qubits));
+
+        const counts = {};
+        const blochVectors = Array.from({ length: circuit.qubits }, () => ({ x: 0, y: 0, z: 0 }));
+        let truncationError = 0;
+        let bondDimension = 1;
+        const leaf = (register, shots) => {
+            Object.entries(register.sampleCounts(shots, random)).forEach(([label, count]) => {
+                counts[label] = (counts[label] || 0) + count;
+            });
+            addWeightedBloch(blochVectors, register, shots / this.shots);
+            this.peakMemoryBytes = Math.max(this.peakMemoryBytes, this.currentMemoryBytes + register.byteLength);
+            truncationError = Math.max(truncationError, register.truncationError);
+            bondDimension = Math.max(bondDimension, register.maxBondReached);
+        };
+        this.sampleBranches(mps, segments, 0, this.shots, random, apply, leaf);
+
+        const exact = segments.length === 1 && circuit.qubits <= MAX_LABELLED_QUBITS;
+        let probabilities;
+        if (exact) {
+            const amplitudes = mps.toAmplitudes();
+            probabilities = new Float64Array(amplitudes.length / 2);
+            for (let i = 0; i < probabilities.length; i++) {
+                probabilities[i] = amplitudes[2 * i] ** 2 + amplitudes[2 * i + 1] ** 2;
+            }
+        } else {
+            probabilities = {};
+            Object.entries(counts).forEach(([label, count]) => {
+                probabilities[label] = count / this.shots;
+            });
+            probabilities = this.densify(probabilities, circuit.qubits);
+        }
+
+        return {
+            mps: segments.length === 1 ? mps : null,
+            probabilities,
+            blochVectors,
+            counts,
+            metadata: {
+                shots: this.shots,
+                seed: this.seed ?? null,
+                exactProbabilities: exact,
+                maxBondDimension: this.maxBondDimension,
+                bondDimension,
+                truncationError,
+                midCircuitMeasurements: segments.length - 1
+            }
+        };
+    }
+
+    // Exact at any width up to MAX_SPARSE_QUBITS while few amplitudes are
+    // nonzero. Once the fill passes SPARSE_FILL_THRESHOLD the state moves
+    // to a dense statevector, if one fits the budget, for the rest of the
+    // circuit.
+    simulateSparse(circuit) {
+        const n = circuit.qubits;
+        if (n > MAX_SPARSE_QUBITS) {
+            throw new Error(`Sparse simulation supports up to ${MAX_SPARSE_QUBITS} qubits, got ${n}`);
+        }
+        const gates = this.orderGates(circuit.gates);
+        this.checkGateQubits(gates, n);
+
+        const checkSize = (register) => {
+            this.peakMemoryBytes = Math.max(this.peakMemoryBytes, this.currentMemoryBytes + register.byteLength);
+            if (this.currentMemoryBytes + register.byteLength > this.memoryBudgetBytes) {
+                throw new Error(
+                    `The sparse state grew to ${register.size} nonzero amplitudes (${formatBytes(register.byteLength)}), ` +
+                    `which exceeds the ${formatBytes(this.memoryBudgetBytes)} budget`
+                );
+            }
+        };
+
+        const segments = splitAtMidCircuitMeasurements(gates, n);
+        if (segments.length > 1) return this.sampleSparseBranches(circuit, segments, checkSize);
+
+        const denseFits = n <= MAX_ENGINE_QUBITS && QuantumSimulator.estimateMemoryBytes(n) <= this.memoryBudgetBytes;
+        let state = new SparseState(n);
+        let densifiedAtGate = null;
+        let maxNonzero = 1;
+        for (let i = 0; i < gates.length; i++) {
+            this.applyGate(state, gates[i]);
+            maxNonzero = Math.max(maxNonzero, state.size);
+            if (denseFits && state.fill > SPARSE_FILL_THRESHOLD) {
+                state = state.toStateVector();
+                this.trackAllocation(state.byteLength);
+                densifiedAtGate = i;
+                this.passes = this.applyGates(state, gates.slice(i + 1));
+                break;
+            }
+            checkSize(state);
+        }
+
+        const metadata = { nonzeroAmplitudes: maxNonzero, densifiedAtGate };
+        if (densifiedAtGate !== null) {
+            const probabilities = state.probabilities();
+            this.trackAllocation(probabilities.byteLength);
+            const result = { state, probabilities, blochVectors: state.blochVectors(), metadata };
+            if (this.sampling) this.sampleExact(result, n);
+            return result;
+        }
+
+        const { indices, probabilities: nonzero } = state.probabilities();
+        let probabilities;
+        if (n <= MAX_LABELLED_QUBITS) {
+            probabilities = new Float64Array(2 ** n);
+            indices.forEach((index, k) => {
+                probabilities[index] = nonzero[k];
+            });
+        } else {
+            probabilities = {};
+            indices.forEach((index, k) => {
+                probabilities[index.toString(2).padStart(n, '0')] = nonzero[k];
+            });
+        }
+
+        const result = { state: null, probabilities, blochVectors: state.blochVectors(), metadata };
+        if (this.sampling) {
+            this.checkShots();
+            const histogram = new ShotHistogram(n, this.shots);
+            state.sampleInto(histogram, this.shots, createRandom(this.seed));
+            result.counts = histogram.toCounts();
+            Object.assign(metadata, { shots: this.shots, seed: this.seed ?? null, exactProbabilities: true });
+        }
+        return result;
+    }
+
+    sampleSparseBranches(circuit, segments, checkSize) {
+        this.checkShots();
+        const random = createRandom(this.seed);
+        const histogram = new ShotHistogram(circuit.qubits, this.shots);
+        const blochVectors = Array.from({ length: circuit.qubits }, () => ({ x: 0, y: 0, z: 0 }));
+        let maxNonzero = 1;
+
+        const apply = (register, gates) => {
+            gates.forEach(gate => {
+                this.applyGate(register, gate);
+                maxNonzero = Math.max(maxNonzero, register.size);
+            });
+            checkSize(register);
+        };
+        const leaf = (register, shots) => {
+            register.sampleInto(histogram, shots, random);
+            addWeightedBloch(blochVectors, register, shots / this.shots);
+        };
+        this.sampleBranches(new SparseState(circuit.qubits), segments, 0, this.shots, random, apply, leaf);
+
+        const counts = histogram.toCounts();
+
+        return {
+            state: null,
+            probabilities: this.densify(countFrequencies(counts, this.shots), circuit.qubits),
+            blochVectors,
+            counts,
+            metadata: {
+                nonzeroAmplitudes: maxNonzero,
+                shots: this.shots,
+                seed: this.seed ?? null,
+                exactProbabilities: false,
+                midCircuitMeasurements: segments.length - 1
+            }
+        };
+    }
+
+    // Small registers list every basis state, zeros included
+    densify(probabilities, qubits) {
+        if (ArrayBuffer.isView(probabilities) || qubits > MAX_LABELLED_QUBITS) return probabilities;
+        const dense = new Float64Array(2 ** qubits);
+        Object.entries(probabilities).forEach(([label, p]) => {
+            dense[parseInt(label, 2)] = p;
+        });
+        return dense;
+    }
+
+    simulateStabilizer(circuit) {
+        const required = StabilizerTableau.estimateMemoryBytes(circuit.qubits);
+        if (required > this.memoryBudgetBytes) {
+            throw new Error(
+                `${circuit.qubits} qubits need ${formatBytes(required)} for stabilizer simulation, ` +
+                `which exceeds the ${formatBytes(this.memoryBudgetBytes)} budget`
+            );
+        }
+        this.checkShots();
+
+        const gates = this.orderGates(circuit.gates);
+        for (const gate of gates) {
+            if (gate.qubit >= circuit.qubits) {
+                throw new Error(`Gate ${gate.gate} targets missing qubit ${gate.qubit}`);
+            }
+        }
+
+        const tableau = new StabilizerTableau(circuit.qubits);
+        this.trackAllocation(tableau.byteLength);
+        const random = createRandom(this.seed);
+        const segments = splitAtMidCircuitMeasurements(gates, circuit.qubits);
+
+        if (segments.length > 1) {
+            const counts = {};
+            const blochVectors = Array.from({ length: circuit.qubits }, () => ({ x: 0, y: 0, z: 0 }));
+            const apply = (register, segmentGates) => segmentGates.forEach(gate => register.applyGate(gate));
+            const leaf = (register, shots) => {
+                Object.entries(register.sampleCounts(shots, random)).forEach(([label, count]) => {
+                    counts[label] = (counts[label] || 0) + count;
+                });
+                addWeightedBloch(blochVectors, register, shots / this.shots);
+            };
+            this.sampleBranches(tableau, segments, 0, this.shots, random, apply, leaf);
+
+            const probabilities = {};
+            Object.entries(counts).forEach(([label, count]) => {
+                probabilities[label] = count / this.shots;
+            });
+            return {
+                tableau: null,
+                probabilities: this.densify(probabilities, circuit.qubits),
+                blochVectors,
+                counts,
+                metadata: {
+                    shots: this.shots,
+                    seed: this.seed ?? null,
+                    exactProbabilities: false,
+                    midCircuitMeasurements: segments.length - 1
+                }
+            };
+        }
+
+        gates.forEach(gate => tableau.applyGate(gate));
+        const support = tableau.measurementSupport();
+
+        // Exact when the support is small enough to list, sampled otherwise;
+        // shots are only drawn when requested or needed for the estimate
+        const exact = support.basis.length <= MAX_EXACT_SUPPORT_BITS;
+        const counts = this.sampling || !exact ? tableau.sampleCounts(this.shots, random, support) : null;
+        let probabilities;
+        if (exact) {
+            probabilities = tableau.exactProbabilities(support);
+        } else {
+            probabilities = {};
+            Object.entries(counts).forEach(([label, count]) => {
+                probabilities[label] = count / this.shots;
+            });
+        }
+
+        const blochVectors = tableau.blochVectors();
+
+        const metadata = { exactProbabilities: exact };
+        if (counts) Object.assign(metadata, { shots: this.shots, seed: this.seed ?? null });
+        return {
+            tableau,
+            probabilities: this.densify(probabilities, circuit.qubits),
+            blochVectors,
+            counts,
+            metadata
+        };
+    }
+
+    // Evaluates one circuit under many rotation-angle bindings. Gates before
+    // the first bound gate are simulated once; the rest are applied gate by
+    // gate across a batch of states sized to the memory budget. Returns a
+    // row-major probability matrix with one row per binding.
+    sweep(circuit, bindings) {
+        const started = performance.now();
+        this.currentMemoryBytes = 0;
+        this.peakMemoryBytes = 0;
+
+        if (!Array.isArray(bindings) || bindings.length === 0) {
+            throw new Error('A parameter sweep needs at least one binding');
+        }
+
+        const gates = this.orderGates(circuit.gates);
+        const bound = new Set(bindings.flatMap(binding => Object.keys(binding)));
+        bound.forEach(key => {
+            const gate = gates.find(g => sweepKey(g) === key);
+            if (!gate || !ROTATION_GATES.has(gate.gate)) {
+                throw new Error(`Binding ${key} does not match an rx, ry or rz gate`);
+            }
+        });
+        if (splitAtMidCircuitMeasurements(gates, circuit.qubits).length > 1) {
+            throw new Error('Parameter sweeps support terminal measurements only');
+        }
+
+        const split = Math.max(0, gates.findIndex(gate => bound.has(sweepKey(gate))));
+        const prefix = this.simulateState({ qubits: circuit.qubits, gates: gates.slice(0, split) });
+        const suffix = gates.slice(split).map(gate => ({ gate, key: bound.has(sweepKey(gate)) ? sweepKey(gate) : null }));
+
+        const rows = bindings.length;
+        const size = prefix.size;
+        this.reserveAllocation(rows * size * BYTES_PER_PROBABILITY, 'The sweep probability matrix');
+        const probabilities = new Float64Array(rows * size);
+
+        const stateBytes = size * BYTES_PER_AMPLITUDE;
+        const available = this.memoryBudgetBytes - this.currentMemoryBytes;
+        const batchSize = Math.max(1, Math.min(rows, Math.floor(available / stateBytes)));
+        this.reserveAllocation(batchSize * stateBytes, 'The sweep batch');
+        const buffer = new Float64Array(batchSize * 2 * size);
+        const batch = Array.from({ length: batchSize }, (_, b) =>
+            StateVector.fromAmplitudes(circuit.qubits, buffer.subarray(2 * b * size, 2 * (b + 1) * size))
+        );
+
+        for (let start = 0; start < rows; start += batchSize) {
+            const count = Math.min(batchSize, rows - start);
+            for (let b = 0; b < count; b++) batch[b].amplitudes.set(prefix.amplitudes);
+
+            for (const { gate, key } of suffix) {
+                for (let b = 0; b < count; b++) {
+                    const angle = key === null ? undefined : bindings[start + b][key];
+                    this.applyGate(batch[b], angle === undefined
+                        ? gate
+                        : { ...gate, params: { ...gate.params, angle } });
+                }
+            }
+
+            for (let b = 0; b < count; b++) {
+                const amps = batch[b].amplitudes;
+                const offset = (start + b) * size;
+                for (let i = 0; i < size; i++) {
+                    probabilities[offset + i] = amps[2 * i] * amps[2 * i] + amps[2 * i + 1] * amps[2 * i + 1];
+                }
+            }
+        }
+
+        return {
+            probabilities,
+            rows,
+            columns: size,
+            metadata: {
+                backend: 'statevector',
+                qubits: circuit.qubits,
+                gates: circuit.gates.length,
+                bindings: rows,
+                sharedPrefixGates: split,
+                batchSize,
+                durationMs: performance.now() - started,
+                peakMemoryBytes: this.peakMemoryBytes,
+                memoryBudgetBytes: this.memoryBudgetBytes
+            }
+        };
+    }
+
+    // <H> for an observable given as weighted Pauli strings (see
+    // parseObservable), with every term read from one statevector
+    expectation(circuit, observable) {
+        const started = performance.now();
+        this.currentMemoryBytes = 0;
+        this.peakMemoryBytes = 0;
+
+        const terms = parseObservable(observable, circuit.qubits);
+        if (splitAtMidCircuitMeasurements(this.orderGates(circuit.gates), circuit.qubits).length > 1) {
+            throw new Error('Expectation values support terminal measurements only');
+        }
+
+        const state = this.simulateState(circuit);
+        const groups = groupQubitWise(terms);
+        if (!groups.every(group => isDiagonalBasis(group.basis))) {
+            this.reserveAllocation(state.byteLength, 'The basis-rotation scratch state');
+        }
+        const values = pauliExpectations(state, groups);
+
+        return {
+            value: terms.reduce((sum, term) => sum + term.coefficient * values.get(term), 0),
+            terms: terms.map(term => ({ pauli: term.pauli, coefficient: term.coefficient, value: values.get(term) })),
+            groups: groups.map(group => pauliLabel(group.basis)),
+            metadata: {
+                backend: 'statevector',
+                qubits: circuit.qubits,
+                gates: circuit.gates.length,
+                terms: terms.length,
+                measurementGroups: groups.length,
+                durationMs: performance.now() - started,
+                peakMemoryBytes: this.peakMemoryBytes,
+                memoryBudgetBytes: this.memoryBudgetBytes
+            }
+        };
+    }
+
+    // d<H>/d(angle) for rx/ry/rz gates by the parameter-shift rule,
+    // (<H>(angle + pi/2) - <H>(angle - pi/2)) / 2, which is exact for
+    // exp(-i angle P / 2). One forward pass is shared: at each rotation
+    // both shifted branches continue from the same prefix state, so the
+    // prefix is simulated once, not twice per parameter. `parameters`
+    // restricts the result to some sweepKeys, e.g. one worker's share.
+    gradient(circuit, observable, parameters = null) {
+        const started = performance.now();
+        this.currentMemoryBytes = 0;
+        this.peakMemoryBytes = 0;
+
+        const terms = parseObservable(observable, circuit.qubits);
+        const groups = groupQubitWise(terms);
+        const gates = this.orderGates(circuit.gates);
+        if (splitAtMidCircuitMeasurements(gates, circuit.qubits).length > 1) {
+            throw new Error('Gradients support terminal measurements only');
+        }
+
+        this.checkGateQubits(gates, circuit.qubits);
+        const wanted = parameters ? new Set(parameters) : null;
+        const targets = rotationParameters(gates).filter(({ key }) => !wanted || wanted.has(key));
+
+        // Forward state, shifted branch and the basis-rotation scratch
+        this.checkMemoryBudget(circuit.qubits);
+        this.reserveAllocation(3 * 2 ** circuit.qubits * BYTES_PER_AMPLITUDE, 'Gradient evaluation');
+        const forward = this.createState(circuit.qubits);
+        const branch = this.createState(circuit.qubits);
+        const scratch = this.createState(circuit.qubits);
+
+        const energy = state => {
+            const values = pauliExpectations(state, groups, scratch);
+            return terms.reduce((sum, term) => sum + term.coefficient * values.get(term), 0);
+        };
+
+        // forward holds every gate before `applied`
+        let applied = 0;
+        const shifted = (gate, shift) => {
+            branch.amplitudes.set(forward.amplitudes);
+            this.applyGate(branch, { ...gate, params: { ...gate.params, angle: gateAngle(gate) + shift } });
+            this.applyGates(branch, gates.slice(applied + 1));
+            return energy(branch);
+        };
+
+        const gradient = targets.map(({ key, index }) => {
+            this.applyGates(forward, gates.slice(applied, index));
+            applied = index;
+            const gate = gates[index];
+            return {
+                key,
+                gate: gate.gate,
+                qubit: gate.qubit,
+                column: gate.column,
+                angle: gateAngle(gate),
+                derivative: (shifted(gate, Math.PI / 2) - shifted(gate, -Math.PI / 2)) / 2
+            };
+        });
+        this.applyGates(forward, gates.slice(applied));
+
+        return {
+            value: energy(forward),
+            gradient,
+            metadata: {
+                backend: 'statevector',
+                qubits: circuit.qubits,
+                gates: circuit.gates.length,
+                parameters: gradient.length,
+                evaluations: 2 * gradient.length + 1,
+                measurementGroups: groups.length,
+                durationMs: performance.now() - started,
+                peakMemoryBytes: this.peakMemoryBytes,
+                memoryBudgetBytes: this.memoryBudgetBytes
+            }
+        };
+    }
+
+    // One worker's share of a statevector split across `parts` workers in
+    // a SharedArrayBuffer. Worker `index` owns the chunk whose global
+    // qubits 0 .. log2(parts) - 1 spell out `index`. Ops on the other,
+    // local qubits sweep that chunk alone. An op touching a global qubit
+    // splits its pair index space evenly between the workers and runs
+    // between two barriers, since it reads and writes other chunks.
+    simulatePartition(circuit, partition) {
+        const started = performance.now();
+        const { amplitudes, probabilities, control, index, parts } = partition;
+        const n = circuit.qubits;
+        const globalQubits = Math.log2(parts);
+        const chunk = 2 ** (n - globalQubits);
+
+        const amps = new Float64Array(amplitudes);
+        const state = StateVector.fromAmplitudes(n, amps);
+        const own = StateVector.fromAmplitudes(n - globalQubits, amps.subarray(2 * index * chunk, 2 * (index + 1) * chunk));
+        const counters = new Int32Array(control);
+
+        const gates = this.orderGates(circuit.gates);
+        this.checkGateQubits(gates, n);
+        const ops = this.fusion && n >= FUSION_MIN_QUBITS
+            ? fuseGates(gates, n)
+            : gates.map(gate => ({
+                type: gate.gate === 'measure' ? 'barrier' : TWO_QUBIT_GATE_MATRICES[gate.gate] ? 'pair' : 'single',
+                qubit: gate.qubit,
+                gates: [gate]
+            }));
+        const sweeps = (gate) => sweepsState(gate, n);
+
+        let barriers = 0;
+        const sync = () => {
+            partitionBarrier(counters, parts);
+            barriers++;
+        };
+
+        let previousGlobal = false;
+        for (const op of ops) {
+            if (op.type === 'barrier') continue;
+            const global = op.qubit < globalQubits;
+            if (global || previousGlobal) sync();
+            previousGlobal = global;
+
+            if (!global) {
+                this.applyOp(own, shiftOp(op, globalQubits));
+            } else if (op.type === 'pair') {
+                const matrix = op.gates.length === 1 ? twoQubitMatrix(op.gates[0]) : op.matrix;
+                state.applyMatrix4(op.qubit, matrix, op.qubit + 1, index * chunk / 4, (index + 1) * chunk / 4);
+            } else {
+                const matrix = op.gates.length === 1 ? gateMatrix(op.gates[0]) : op.matrix;
+                state.applyMatrixRange(op.qubit, matrix, index * chunk / 2, (index + 1) * chunk / 2);
+            }
+        }
+        // Global-qubit coherences read the partner chunks
+        sync();
+
+        const probs = new Float64Array(probabilities, index * chunk * BYTES_PER_PROBABILITY, chunk);
+        const local = own.amplitudes;
+        let weight = 0;
+        for (let i = 0; i < chunk; i++) {
+            probs[i] = local[2 * i] * local[2 * i] + local[2 * i + 1] * local[2 * i + 1];
+            weight += probs[i];
+        }
+
+        const rho = new Float64Array(4 * n);
+        rho.set(own.reducedDensityMatrices(), 4 * globalQubits);
+        for (let q = 0; q < globalQubits; q++) {
+            const mask = 1 << (globalQubits - 1 - q);
+            if (index & mask) {
+                rho[4 * q + 1] = weight;
+                continue;
+            }
+            rho[4 * q] = weight;
+            const partner = amps.subarray(2 * (index | mask) * chunk, 2 * ((index | mask) + 1) * chunk);
+            let cohRe = 0, cohIm = 0;
+            for (let p = 0; p < 2 * chunk; p += 2) {
+                const xr = local[p], xi = local[p + 1];
+                const yr = partner[p], yi = partner[p + 1];
+                cohRe += xr * yr + xi * yi;
+                cohIm += xi * yr - xr * yi;
+            }
+            rho[4 * q + 2] = cohRe;
+            rho[4 * q + 3] = cohIm;
+        }
+
+        return {
+            part: index,
+            rho,
+            barriers,
+            passes: { unfused: gates.filter(sweeps).length, fused: ops.filter(op => op.type !== 'barrier').length },
+            durationMs: performance.now() - started
+        };
+    }
+
+    run(circuit) {
+        const result = this.simulate(circuit);
+        return {
+            ...result,
+            probabilities: labelProbabilities(result.probabilities, circuit.qubits),
+            ...(result.counts && { counts: labelCounts(result.counts, circuit.qubits) })
+        };
+    }
+}
+
+function labelProbabilities(probs, qubits) {
+    // Sparse backends already return maps keyed by bitstring
+    if (!ArrayBuffer.isView(probs)) return probs;
+
+    if (qubits <= MAX_LABELLED_QUBITS) {
+        const { labels, template } = basisLabels(qubits);
+        const probabilities = { ...template };
+        for (let index = 0; index < probs.length; index++) probabilities[labels[index]] = probs[index];
+        return probabilities;
+    }
+
+    const probabilities = {};
+    probs.forEach((p, index) => {
+        probabilities[basisLabel(index, qubits)] = p;
+    });
+    return probabilities;
+}
+
+// Bitstring-keyed counts of the outcomes drawn, like Qiskit's get_counts()
+function labelCounts(counts, qubits) {
+    if (!ArrayBuffer.isView(counts)) return counts;
+    const labelled = {};
+    counts.forEach((count, index) => {
+        if (count > 0) labelled[basisLabel(index, qubits)] = count;
+    });
+    return labelled;
+}
+
+// Averages trajectory runs weighted by how many trajectories each ran
+function combineTrajectoryResults(results, seed) {
+    const total = results.reduce((sum, result) => sum + result.metadata.trajectories, 0);
+    const probabilities = new Float64Array(results[0].probabilities.length);
+    const blochVectors = results[0].blochVectors.map(() => ({ x: 0, y: 0, z: 0 }));
+    let counts = null;
+
+    results.forEach(result => {
+        const weight = result.metadata.trajectories / total;
+        result.probabilities.forEach((p, i) => {
+            probabilities[i] += weight * p;
+        });
+        result.blochVectors.forEach((bloch, q) => {
+            blochVectors[q].x += weight * bloch.x;
+            blochVectors[q].y += weight * bloch.y;
+            blochVectors[q].z += weight * bloch.z;
+        });
+        if (result.counts) counts = addCounts(counts, result.counts);
+    });
+
+    const metadata = {
+        ...results[0].metadata,
+        trajectories: total,
+        workers: results.length,
+        seed: seed ?? null,
+        durationMs: Math.max(...results.map(result => result.metadata.durationMs)),
+        peakMemoryBytes: Math.max(...results.map(result => result.metadata.peakMemoryBytes))
+    };
+    if (counts) metadata.shots = results.reduce((sum, result) => sum + result.metadata.shots, 0);
+
+    return { amplitudes: null, probabilities, blochVectors, counts, metadata };
+}
+
+// ==========================================
+// RESULT QUERIES
+// ==========================================
+
+// Rows the results views list before folding the rest into one line
+const DEFAULT_TOP_STATES = 16;
+const PROBABILITY_CHUNK_SIZE = 4096;
+
+// Basis indices above 2^53 are not exact doubles and come back as BigInt
+const MAX_NUMBER_INDEX_QUBITS = 53;
+
+function basisLabel(index, qubits) {
+    return index.toString(2).padStart(qubits, '0');
+}
+
+// Labels of a small register and an object with every label as a key,
+// built once per width. Copying that object gives the result its final
+// shape at once instead of adding 2^n keys one by one.
+const BASIS_LABELS = [];
+
+function basisLabels(qubits) {
+    if (!BASIS_LABELS[qubits]) {
+        const labels = Array.from({ length: 2 ** qubits }, (_, index) => basisLabel(index, qubits));
+        const template = {};
+        labels.forEach(label => {
+            template[label] = 0;
+        });
+        BASIS_LABELS[qubits] = { labels, template };
+    }
+    return BASIS_LABELS[qubits];
+}
+
+// Streams the nonzero entries of a result's probabilities, either a dense
+// Float64Array or a map keyed by bitstring, as parallel index/probability
+// arrays of at most chunkSize entries. Dense results are read in place,
+// so a 20-qubit result never builds a label per basis state.
+function* probabilityChunks(probabilities, { chunkSize = PROBABILITY_CHUNK_SIZE, minProbability = 0 } = {}) {
+    if (!Number.isInteger(chunkSize) || chunkSize < 1) {
+        throw new Error(`Chunk size must be a positive integer, got ${chunkSize}`);
+    }
+
+    if (ArrayBuffer.isView(probabilities)) {
+        let indices = new Float64Array(chunkSize);
+        let values = new Float64Array(chunkSize);
+        let count = 0;
+        for (let i = 0; i < probabilities.length; i++) {
+            if (probabilities[i] <= minProbability) continue;
+            indices[count] = i;
+            values[count++] = probabilities[i];
+            if (count === chunkSize) {
+                yield { indices, probabilities: values };
+                indices = new Float64Array(chunkSize);
+                values = new Float64Array(chunkSize);
+                count = 0;
+            }
+        }
+        if (count > 0) yield { indices: indices.subarray(0, count), probabilities: values.subarray(0, count) };
+        return;
+    }
+
+    let indices = [];
+    let values = [];
+    for (const label in probabilities) {
+        const p = probabilities[label];
+        if (p <= minProbability) continue;
+        indices.push(label.length <= MAX_NUMBER_INDEX_QUBITS ? parseInt(label, 2) : BigInt('0b' + label));
+        values.push(p);
+        if (values.length === chunkSize) {
+            yield { indices, probabilities: Float64Array.from(values) };
+            indices = [];
+            values = [];
+        }
+    }
+    if (values.length > 0) yield { indices, probabilities: Float64Array.from(values) };
+}
+
+// The k most likely basis states, largest first, from one pass with a
+// size-k min-heap: O(2^n log k) time and O(k) memory. Ties keep the lower
+// basis index, and only the returned states get a label.
+function topStates(probabilities, qubits, k = DEFAULT_TOP_STATES) {
+    if (!Number.isInteger(k) || k < 0) {
+        throw new Error(`Top-k needs a non-negative integer, got ${k}`);
+    }
+
+    const heapProbabilities = new Float64Array(k);
+    const heapIndices = new Array(k);
+    let size = 0;
+
+    // Entry i ranks below (p, index), so the root is the weakest kept entry
+    const below = (i, p, index) =>
+        heapProbabilities[i] < p || (heapProbabilities[i] === p && heapIndices[i] > index);
+    const swap = (i, j) => {
+        [heapProbabilities[i], heapProbabilities[j]] = [heapProbabilities[j], heapProbabilities[i]];
+        [heapIndices[i], heapIndices[j]] = [heapIndices[j], heapIndices[i]];
+    };
+
+    for (const chunk of probabilityChunks(probabilities)) {
+        for (let j = 0; j < chunk.indices.length; j++) {
+            const p = chunk.probabilities[j];
+            const index = chunk.indices[j];
+            if (size < k) {
+                heapProbabilities[size] = p;
+                heapIndices[size] = index;
+                for (let i = size++; i > 0;) {
+                    const parent = (i - 1) >> 1;
+                    if (!below(i, heapProbabilities[parent], heapIndices[parent])) break;
+                    swap(i, parent);
+                    i = parent;
+                }
+            } else if (k > 0 && below(0, p, index)) {
+                heapProbabilities[0] = p;
+                heapIndices[0] = index;
+                for (let i = 0; ;) {
+                    const left = 2 * i + 1;
+                    const right = left + 1;
+                    let weakest = i;
+                    if (left < size && below(left, heapProbabilities[weakest], heapIndices[weakest])) weakest = left;
+                    if (right < size && below(right, heapProbabilities[weakest], heapIndices[weakest])) weakest = right;
+                    if (weakest === i) break;
+                    swap(i, weakest);
+                    i = weakest;
+                }
+            }
+        }
+    }
+
+    const states = [];
+    for (let i = 0; i < size; i++) {
+        states.push({ index: heapIndices[i], label: basisLabel(heapIndices[i], qubits), probability: heapProbabilities[i] });
+    }
+    return states.sort((a, b) => b.probability - a.probability || (a.index < b.index ? -1 : 1));
+}
+
+// Outcome distribution of the listed qubits with the rest traced out,
+// indexed like a register of those qubits: targets[0] is the high bit
+function marginalProbabilities(probabilities, qubits, targets) {
+    const seen = new Set();
+    targets.forEach(q => {
+        if (!Number.isInteger(q) || q < 0 || q >= qubits) {
+            throw new Error(`Qubit ${q} is outside the ${qubits}-qubit register`);
+        }
+        if (seen.has(q)) throw new Error(`Qubit ${q} is listed twice`);
+        seen.add(q);
+    });
+    if (targets.length > MAX_ENGINE_QUBITS) {
+        throw new Error(`Marginals cover at most ${MAX_ENGINE_QUBITS} qubits, got ${targets.length}`);
+    }
+
+    const shifts = targets.map(q => qubits - 1 - q);
+    const bit = qubits <= 31
+        ? (index, shift) => (index >>> shift) & 1
+        : (index, shift) => typeof index === 'bigint'
+            ? Number((index >> BigInt(shift)) & 1n)
+            : Math.floor(index / 2 ** shift) % 2;
+
+    const marginal = new Float64Array(2 ** targets.length);
+    for (const chunk of probabilityChunks(probabilities)) {
+        for (let j = 0; j < chunk.indices.length; j++) {
+            let outcome = 0;
+            for (let t = 0; t < shifts.length; t++) {
+                outcome = 2 * outcome + bit(chunk.indices[j], shifts[t]);
+            }
+            marginal[outcome] += chunk.probabilities[j];
+        }
+    }
+    return marginal;
+}
+
+// ==========================================
+// WORKER POOL
+// ==========================================
+
+// Runs simulations in simulation-worker.js so the UI thread never blocks.
+// A run submitted on a channel cancels the previous run on that channel;
+// a busy worker cannot be interrupted, so it is terminated and replaced.
+class SimulationWorkerPool {
+    constructor(options = {}) {
+        const cores = (typeof navigator !== 'undefined' && navigator.hardwareConcurrency) || 2;
+        this.workerUrl = options.workerUrl || 'simulation-worker.js';
+        this.size = options.size || Math.max(1, Math.min(4, cores - 1));
+        this.workers = [];
+        this.idleWorkers = [];
+        this.queue = [];
+        this.channels = new Map();
+        this.channelWorkers = new Map();
+        this.nextJobId = 1;
+        this.inline = typeof Worker === 'undefined';
+        this.inlinePrefixCache = null;
+    }
+
+    // Wide statevector runs are split across the whole pool when the page
+    // can share memory with its workers; see runPartitioned
+    run(circuit, options = {}) {
+        const parts = this.partitionsFor(circuit, options);
+        return parts > 1 ? this.runPartitioned(circuit, parts, options) : this.submit(circuit, {}, options);
+    }
+
+    // Largest power of two up to the pool size that leaves every worker
+    // PARTITION_MIN_LOCAL_QUBITS local qubits, or 1 to run on one worker
+    partitionsFor(circuit, options = {}) {
+        if (this.inline || options.partition === false || !sharedMemoryAvailable()) return 1;
+        if (circuit.qubits < PARTITION_MIN_QUBITS) return 1;
+
+        const simulator = new QuantumSimulator(options);
+        if (simulator.selectBackend(circuit) !== 'statevector') return 1;
+        if (splitAtMidCircuitMeasurements(simulator.orderGates(circuit.gates), circuit.qubits).length > 1) return 1;
+
+        let parts = 1;
+        while (2 * parts <= this.size && circuit.qubits - Math.log2(2 * parts) >= PARTITION_MIN_LOCAL_QUBITS) {
+            parts *= 2;
+        }
+        return parts;
+    }
+
+    // Runs one statevector on `parts` workers at once. The amplitudes and
+    // probabilities live in SharedArrayBuffers and each worker sweeps its
+    // own chunk (see QuantumSimulator.simulatePartition); the parts only
+    // send back their share of the reduced density matrices. Partitioned
+    // runs skip the workers' prefix caches.
+    runPartitioned(circuit, parts, options = {}) {
+        const { channel, ...simulatorOptions } = options;
+        const simulator = new QuantumSimulator(simulatorOptions);
+        try {
+            simulator.checkMemoryBudget(circuit.qubits);
+            simulator.checkGateQubits(circuit.gates, circuit.qubits);
+        } catch (error) {
+            if (channel) this.cancel(channel);
+            return Promise.reject(error);
+        }
+
+        const size = 2 ** circuit.qubits;
+        const partition = {
+            amplitudes: new SharedArrayBuffer(size * BYTES_PER_AMPLITUDE),
+            probabilities: new SharedArrayBuffer(size * BYTES_PER_PROBABILITY),
+            control: new SharedArrayBuffer(2 * Int32Array.BYTES_PER_ELEMENT),
+            parts
+        };
+        new Float64Array(partition.amplitudes)[0] = 1;
+
+        return this.submit(circuit, { partition }, options).then(result => {
+            // The pool lost its workers and simulated inline instead
+            if (!Array.isArray(result)) return result;
+            const combined = combinePartitionResults(result, partition, circuit, simulator.memoryBudgetBytes);
+            if (simulator.sampling) simulator.sampleExact(combined, circuit.qubits);
+            return combined;
+        });
+    }
+
+    // Resolves with { probabilities, rows, columns, metadata } where row k
+    // of the probability matrix belongs to bindings[k]
+    sweep(circuit, bindings, options = {}) {
+        return this.submit(circuit, { bindings }, options);
+    }
+
+    // Resolves with { value, terms, groups, metadata }; see
+    // QuantumSimulator.expectation
+    expectation(circuit, observable, options = {}) {
+        return this.submit(circuit, { observable }, options);
+    }
+
+    // Splits a noisy run's trajectories across the pool. Each part gets its
+    // own seed and share of the shots, and the parts are averaged by their
+    // trajectory counts. Parts run on `${channel}#k`, so cancelling the
+    // channel cancels all of them.
+    runTrajectories(circuit, options = {}) {
+        const { channel, trajectories = DEFAULT_TRAJECTORIES, seed, ...simulatorOptions } = options;
+        const shots = simulatorOptions.shots ?? DEFAULT_SHOTS;
+        if (channel) this.cancel(channel);
+
+        const parts = Math.max(1, Math.min(
+            this.inline ? 1 : this.size,
+            trajectories,
+            simulatorOptions.sampling ? shots : Infinity
+        ));
+        const share = (total, k) => Math.floor(total / parts) + (k < total % parts ? 1 : 0);
+        const baseSeed = seed ?? Math.floor(Math.random() * 2 ** 32);
+
+        const jobs = Array.from({ length: parts }, (_, k) => this.submit(circuit, {}, {
+            ...simulatorOptions,
+            backend: 'trajectories',
+            trajectories: share(trajectories, k),
+            shots: share(shots, k),
+            seed: (baseSeed + k * 0x9e3779b9) >>> 0,
+            channel: channel ? `${channel}#${k}` : undefined
+        }));
+        return Promise.all(jobs).then(results => combineTrajectoryResults(results, seed));
+    }
+
+    // Parameter-shift gradient of an observable for every rotation gate.
+    // The parameters are split into contiguous runs of about equal work
+    // (the two shifted suffixes cost 2 (G - index) gate applications) and
+    // each run is evaluated on its own worker, cancellable as `${channel}#k`.
+    gradient(circuit, observable, options = {}) {
+        const { channel, ...simulatorOptions } = options;
+        if (channel) this.cancel(channel);
+
+        const gates = new QuantumSimulator().orderGates(circuit.gates);
+        const parameters = rotationParameters(gates);
+        const cost = parameters.map(({ index }) => gates.length - index);
+        const total = cost.reduce((sum, work) => sum + work, 0);
+        const parts = Math.max(1, Math.min(this.inline ? 1 : this.size, parameters.length));
+
+        const shares = [];
+        let share = [];
+        let work = 0;
+        parameters.forEach(({ key }, k) => {
+            share.push(key);
+            work += cost[k];
+            if (shares.length < parts - 1 && work >= total * (shares.length + 1) / parts) {
+                shares.push(share);
+                share = [];
+            }
+        });
+        if (share.length > 0 || shares.length === 0) shares.push(share);
+
+        const jobs = shares.map((keys, k) => this.submit(circuit, { observable, parameters: keys }, {
+            ...simulatorOptions,
+            channel: channel ? `${channel}#${k}` : undefined
+        }));
+        return Promise.all(jobs).then(results => ({
+            value: results[0].value,
+            gradient: results.flatMap(result => result.gradient),
+            metadata: {
+                ...results[0].metadata,
+                parameters: parameters.length,
+                evaluations: results.reduce((sum, result) => sum + result.metadata.evaluations, 0),
+                workers: results.length,
+                durationMs: Math.max(...results.map(result => result.metadata.durationMs)),
+                peakMemoryBytes: Math.max(...results.map(result => result.metadata.peakMemoryBytes))
+            }
+        }));
+    }
+
+    // task is {} for a plain run, { bindings } for a sweep, { observable }
+    // for an expectation value or { observable, parameters } for a gradient
+    submit(circuit, task, options) {
+        const { channel, ...simulatorOptions } = options;
+        if (channel) this.cancel(channel);
+
+        return new Promise((resolve, reject) => {
+            const job = { id: this.nextJobId++, channel, circuit, task, simulatorOptions, resolve, reject, worker: null };
+            if (channel) this.channels.set(channel, job);
+            this.queue.push(job);
+            this.dispatch();
+        });
+    }
+
+    cancel(channel) {
+        [...this.channels.keys()]
+            .filter(key => key.startsWith(`${channel}#`))
+            .forEach(key => this.cancel(key));
+
+        const job = this.channels.get(channel);
+        if (!job) return;
+
+        this.channels.delete(channel);
+        const queued = this.queue.indexOf(job);
+        if (queued !== -1) {
+            this.queue.splice(queued, 1);
+        } else if (job.gang) {
+            this.abortGang(job);
+        } else if (job.worker) {
+            job.worker.terminate();
+            this.workers = this.workers.filter(worker => worker !== job.worker);
+            this.channelWorkers.delete(channel);
+        }
+
+        const error = new Error('Simulation cancelled');
+        error.cancelled = true;
+        job.reject(error);
+        this.dispatch();
+    }
+
+    dispatch() {
+        while (this.queue.length > 0) {
+            if (this.inline) {
+                this.runInline(this.queue.shift());
+                continue;
+            }
+
+            if (this.queue[0].task.partition) {
+                const job = this.queue[0];
+                const gang = this.acquireGang(job.task.partition.parts);
+                if (!gang) return;
+
+                this.queue.shift();
+                job.gang = gang;
+                job.parts = [];
+                gang.forEach((worker, index) => {
+                    worker.currentJob = job;
+                    worker.postMessage({
+                        id: job.id,
+                        circuit: job.circuit,
+                        partition: { ...job.task.partition, index },
+                        options: job.simulatorOptions
+                    });
+                });
+                continue;
+            }
+
+            const worker = this.acquireWorker(this.queue[0].channel);
+            if (!worker) return;
+
+            const job = this.queue.shift();
+            if (job.channel) this.channelWorkers.set(job.channel, worker);
+            job.worker = worker;
+            worker.currentJob = job;
+            worker.postMessage({ id: job.id, circuit: job.circuit, ...job.task, options: job.simulatorOptions });
+        }
+    }
+
+    // A channel goes back to the worker it last used while that worker is
+    // idle, so the worker's prefix state cache keeps paying off
+    acquireWorker(channel) {
+        const preferred = this.idleWorkers.indexOf(this.channelWorkers.get(channel));
+        if (preferred !== -1) return this.idleWorkers.splice(preferred, 1)[0];
+        if (this.idleWorkers.length > 0) return this.idleWorkers.pop();
+        if (this.workers.length >= this.size) return null;
+        return this.spawnWorker();
+    }
+
+    // A partitioned run takes all of its workers at once; started alone,
+    // the first parts would wait at a barrier for parts still queued
+    acquireGang(count) {
+        while (this.idleWorkers.length < count && this.workers.length < this.size) {
+            const worker = this.spawnWorker();
+            if (!worker) return null;
+            this.idleWorkers.push(worker);
+        }
+        return this.idleWorkers.length >= count ? this.idleWorkers.splice(0, count) : null;
+    }
+
+    spawnWorker() {
+        try {
+            const worker = new Worker(this.workerUrl);
+            worker.onmessage = (event) => this.handleMessage(worker, event.data);
+            worker.onerror = (event) => this.handleError(worker, event);
+            this.workers.push(worker);
+            return worker;
+        } catch (error) {
+            // Workers are unavailable (e.g. file:// pages); simulate in place
+            this.inline = true;
+            return null;
+        }
+    }
+
+    releaseWorker(worker) {
+        const job = worker.currentJob;
+        worker.currentJob = null;
+        const finished = job && (!job.gang || job.gang.every(member => member.currentJob !== job));
+        if (finished && job.channel && this.channels.get(job.channel) === job) {
+            this.channels.delete(job.channel);
+        }
+        if (this.workers.includes(worker)) this.idleWorkers.push(worker);
+        this.dispatch();
+        return job;
+    }
+
+    handleMessage(worker, data) {
+        const job = this.releaseWorker(worker);
+        if (!job || job.id !== data.id) return;
+
+        if (job.gang) {
+            this.collectPart(job, data);
+            return;
+        }
+
+        if (data.ok) {
+            const { id, ok, ...result } = data;
+            job.resolve({
+                ...result,
+                amplitudes: data.amplitudes ? new Float64Array(data.amplitudes) : null,
+                probabilities: data.probabilities instanceof ArrayBuffer
+                    ? new Float64Array(data.probabilities)
+                    : data.probabilities
+            });
+        } else {
+            job.reject(new Error(data.error));
+        }
+    }
+
+    handleError(worker, event) {
+        event.preventDefault();
+        const job = worker.currentJob;
+        worker.terminate();
+        this.workers = this.workers.filter(w => w !== worker);
+        this.idleWorkers = this.idleWorkers.filter(w => w !== worker);
+        if (job && job.gang) this.abortGang(job);
+        if (job && job.channel && this.channels.get(job.channel) === job) {
+            this.channels.delete(job.channel);
+        }
+        if (job) job.reject(new Error(event.message || 'Simulation worker failed'));
+        this.dispatch();
+    }
+
+    // Resolves a partitioned job with every part's result once all are in
+    collectPart(job, data) {
+        if (!data.ok) {
+            this.abortGang(job);
+            job.reject(new Error(data.error));
+            return;
+        }
+        const { id, ok, ...part } = data;
+        job.parts[part.part] = part;
+        if (job.gang.every(member => member.currentJob !== job)) job.resolve(job.parts);
+    }
+
+    // Parts still running would wait at a barrier forever, so they are
+    // terminated and replaced on demand
+    abortGang(job) {
+        const running = job.gang.filter(worker => worker.currentJob === job);
+        running.forEach(worker => worker.terminate());
+        this.workers = this.workers.filter(worker => !running.includes(worker));
+        if (job.channel && this.channels.get(job.channel) === job) {
+            this.channels.delete(job.channel);
+        }
+        this.dispatch();
+    }
+
+    runInline(job) {
+        if (job.channel && this.channels.get(job.channel) === job) {
+            this.channels.delete(job.channel);
+        }
+        try {
+            const { prefixCacheBytes, ...simulatorOptions } = job.simulatorOptions;
+            let prefixCache = null;
+            if (prefixCacheBytes) {
+                this.inlinePrefixCache = this.inlinePrefixCache || new PrefixStateCache(prefixCacheBytes);
+                this.inlinePrefixCache.resize(prefixCacheBytes);
+                prefixCache = this.inlinePrefixCache;
+            }
+            const simulator = new QuantumSimulator({ ...simulatorOptions, prefixCache });
+            if (job.task.bindings) {
+                job.resolve(simulator.sweep(job.circuit, job.task.bindings));
+                return;
+            }
+            if (job.task.parameters) {
+                job.resolve(simulator.gradient(job.circuit, job.task.observable, job.task.parameters));
+                return;
+            }
+            if (job.task.observable) {
+                job.resolve(simulator.expectation(job.circuit, job.task.observable));
+                return;
+            }
+            const result = simulator.simulate(job.circuit);
+            job.resolve({
+                amplitudes: result.state ? result.state.amplitudes : null,
+                probabilities: result.probabilities,
+                blochVectors: result.blochVectors,
+                counts: result.counts,
+                metadata: result.metadata
+            });
+        } catch (error) {
+            job.reject(error);
+        }
+    }
+
+    terminate() {
+        this.workers.forEach(worker => worker.terminate());
+        this.workers = [];
+        this.idleWorkers = [];
+    }
+}
+
+// Export for Node.js tooling
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = {
+        StateVector,
+        SimdStateVector,
+        CircuitModel,
+        gateSnapshot,
+        CircuitHistory,
+        DEFAULT_HISTORY_BYTES,
+        sharedMemoryAvailable,
+        partitionBarrier,
+        PARTITION_MIN_QUBITS,
+        loadSimdKernels,
+        simdKernelsLoaded,
+        MAX_SIMD_QUBITS,
+        QuantumSimulator,
+        gateMatrix,
+        gateAngle,
+        fuseGates,
+        FUSION_MIN_QUBITS,
+        columnSegments,
+        PrefixStateCache,
+        DEFAULT_PREFIX_CACHE_BYTES,
+        circuitHash,
+        isReproducibleResult,
+        ResultCache,
+        DEFAULT_RESULT_CACHE_BYTES,
+        formatBytes,
+        createRandom,
+        sweepKey,
+        angleSweepBindings,
+        AliasSampler,
+        ShotHistogram,
+        splitAtMidCircuitMeasurements,
+        isCliffordCircuit,
+        labelProbabilities,
+        labelCounts,
+        basisLabel,
+        probabilityChunks,
+        topStates,
+        marginalProbabilities,
+        DEFAULT_TOP_STATES,
+        StabilizerTableau,
+        MatrixProductState,
+        complexSvd,
+        SparseState,
+        parseObservable,
+        groupQubitWise,
+        pauliExpectations,
+        rotationParameters,
+        DensityMatrix,
+        krausChannel,
+        applyReadoutError,
+        DEFAULT_NOISE_MODEL,
+        DEFAULT_TRAJECTORIES,
+        SimulationWorkerPool,
+        DEFAULT_MEMORY_BUDGET_BYTES
+    };
+}
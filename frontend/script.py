@@ -351,6 +351,14 @@ index_html = """<!DOCTYPE html>
                             </button>
                         </div>
                         
+                        <div class="toolbar-group">
+                            <select class="form-select" id="rendererSelect" title="Circuit renderer">
+                                <option value="auto">Renderer: Auto</option>
+                                <option value="dom">Renderer: DOM</option>
+                                <option value="canvas">Renderer: Canvas</option>
+                            </select>
+                        </div>
+                        
                         <div class="toolbar-group">
                             <select class="form-select" id="exportLanguageSelect">
                                 <option value="qiskit">Qiskit (Python)</option>
@@ -426,9 +434,27 @@ index_html = """<!DOCTYPE html>
                                 </div>
                                 
                                 <div class="tab-panel" id="probabilityTab">
+                                    <div class="sampling-controls">
+                                        <label class="checkbox-label">
+                                            <input type="checkbox" id="samplingToggle">
+                                            Sample shots
+                                        </label>
+                                        <input type="number" class="form-input" id="shotsInput" min="1" step="1" value="1024" title="Shots">
+                                        <input type="number" class="form-input" id="seedInput" step="1" placeholder="Seed (random)" title="Seed">
+                                        <label class="checkbox-label" title="Depolarizing, amplitude-damping and readout errors">
+                                            <input type="checkbox" id="noiseToggle">
+                                            Hardware noise
+                                        </label>
+                                    </div>
                                     <div class="chart-container">
                                         <canvas id="probabilityChart"></canvas>
                                     </div>
+                                    <div class="observable-controls">
+                                        <input type="text" class="form-input" id="observableInput" placeholder="Observable, e.g. Z0 Z1 + 0.5 X0" title="Weighted Pauli strings">
+                                        <button class="btn btn-ghost" id="evaluateObservableBtn">Evaluate ⟨H⟩</button>
+                                        <button class="btn btn-ghost" id="minimizeObservableBtn" title="Gradient descent on every rx, ry and rz angle">Minimise ⟨H⟩</button>
+                                    </div>
+                                    <div class="expectation-panel" id="expectationPanel"></div>
                                 </div>
                                 
                                 <div class="tab-panel" id="blochTab">
@@ -562,6 +588,7 @@ index_html = """<!DOCTYPE html>
                     </div>
                     <div class="modal-actions">
                         <button class="btn btn-ghost" data-modal="gateParameterModal">Cancel</button>
+                        <button class="btn btn-ghost" id="sweepParameterBtn">Sweep 0–2π</button>
                         <button class="btn btn-primary" id="saveParametersBtn">Save</button>
                     </div>
                 </div>
@@ -578,6 +605,8 @@ index_html = """<!DOCTYPE html>
         <div class="toast-container" id="toastContainer"></div>
     </div>
 
+    <script src="quantum-engine.js"></script>
+    <script src="circuit-canvas.js"></script>
     <script src="app.js"></script>
 </body>
 </html>"""
@@ -919,18 +919,16 @@ label {
 }
 
 .circuit-grid {
-  display: grid;
-  grid-template-rows: repeat(var(--qubits, 3), 60px);
-  grid-template-columns: repeat(var(--depth, 8), 80px);
-  gap: 1px;
-  padding: var(--space-lg);
+  /* Sized from the depth and qubit count; rows and cells are positioned
+     absolutely so only the visible columns need elements */
+  position: relative;
 }
 
 .qubit-line {
-  grid-column: 1 / -1;
+  position: absolute;
+  height: 60px;
   display: flex;
   align-items: center;
-  position: relative;
 }
 
 .qubit-line::before {
@@ -944,12 +942,29 @@ label {
 }
 
 .qubit-label {
+  position: sticky;
+  left: 0;
   width: 40px;
   text-align: center;
   font-weight: 600;
   color: var(--text-secondary);
   background: var(--surface);
-  z-index: 1;
+  z-index: 3;
+}
+
+.circuit-surface {
+  /* Canvas renderer: one viewport-sized canvas redrawn as the grid scrolls */
+  position: sticky;
+  left: 0;
+  top: 0;
+  display: block;
+}
+
+.gate-position.drag-image {
+  /* Drag ghost for canvas gates; rendered but off-screen */
+  position: fixed;
+  left: -1000px;
+  top: 0;
 }
 
 .gate-position {
@@ -961,8 +976,10 @@ label {
   display: flex;
   align-items: center;
   justify-content: center;
-  transition: all var(--transition-fast);
-  position: relative;
+  /* Not left: recycled cells jump to their new column */
+  transition: background-color var(--transition-fast), border-color var(--transition-fast), transform var(--transition-fast);
+  position: absolute;
+  margin: 5px 10px;
   z-index: 2;
 }
 
@@ -1047,6 +1064,47 @@ label {
   overflow-y: auto;
 }
 
+.sampling-controls {
+  display: flex;
+  align-items: center;
+  gap: var(--space-md);
+  margin-bottom: var(--space-md);
+}
+
+.sampling-controls .checkbox-label {
+  margin-bottom: 0;
+  white-space: nowrap;
+}
+
+.sampling-controls .form-input {
+  width: 8rem;
+  padding: var(--space-sm) var(--space-md);
+}
+
+.observable-controls {
+  display: flex;
+  gap: var(--space-md);
+  margin-top: var(--space-md);
+}
+
+.observable-controls .form-input {
+  flex: 1;
+  padding: var(--space-sm) var(--space-md);
+}
+
+.expectation-panel {
+  margin-top: var(--space-sm);
+  font-family: var(--font-mono);
+  font-size: 0.875rem;
+  color: var(--text-secondary);
+}
+
+.expectation-panel .expectation-value {
+  font-size: 1.125rem;
+  font-weight: 600;
+  color: var(--text);
+}
+
 .chart-container {
   height: 300px;
   display: flex;
@@ -21,11 +21,16 @@ class QuantumPlatform {
         this.isDemo = false;
         
         // Circuit State
-        this.circuit = [];
+        this.circuit = new CircuitModel(); // gates indexed by (qubit, column)
         this.qubits = 3;
-        this.maxDepth = 8;
-        this.history = [];
-        this.redoStack = [];
+        this.maxDepth = 8; // grows with the circuit
+        // Canvas geometry in px; only visible columns plus `overscan` on each
+        // side have cells, and `spareColumns` empty ones follow the last gate
+        this.gridLayout = { columnWidth: 80, rowHeight: 60, labelWidth: 80, padding: 24, overscan: 6, minDepth: 8, spareColumns: 4 };
+        this.history = new CircuitHistory(); // per-cell undo diffs, see quantum-engine.js
+        this.circuitRenderer = 'auto'; // 'dom', 'canvas', or 'auto' (canvas from canvasRendererMinGates gates)
+        this.canvasRendererMinGates = CANVAS_RENDERER_MIN_GATES; // see circuit-canvas.js
+        this.canvasWorkerFailed = false; // draw on the main thread after a worker error
         this.currentLanguage = 'qiskit';
         this.userStats = {
             circuitsCreated: 0,
@@ -35,6 +40,19 @@ class QuantumPlatform {
         };
 
         // Simulation State
+        this.simulationMemoryBudget = DEFAULT_MEMORY_BUDGET_BYTES; // tune per deployment
+        this.prefixCacheBudget = DEFAULT_PREFIX_CACHE_BYTES; // column snapshots for incremental re-simulation
+        this.lastSimulationMetadata = null;
+        this.samplingEnabled = false;
+        this.simulationShots = DEFAULT_SHOTS;
+        this.simulationSeed = null;
+        this.noiseEnabled = false;
+        this.noiseModel = DEFAULT_NOISE_MODEL; // per gate type, see quantum-engine.js
+        this.noiseTrajectories = DEFAULT_TRAJECTORIES;
+        this.observable = ''; // e.g. 'Z0 Z1 + 0.5 X0', evaluated after each simulation
+        this.simulationPool = new SimulationWorkerPool();
+        this.resultCache = new ResultCache(); // finished results by circuit hash, persisted in IndexedDB
+        this.simulationRunId = 0;
         this.probabilityChart = null;
         this.blochRenderer = null;
         this.currentGateBeingParameterized = null;
@@ -83,6 +101,7 @@ class QuantumPlatform {
         this.checkAuthState();
         this.showPage('home');
         this.initializeCircuitBuilder();
+        if (sessionStorage.getItem('quantum-google-redirect')) this.completeGoogleRedirect();
     }
 
     initializeFirebase() {
@@ -112,6 +131,8 @@ class QuantumPlatform {
     applyTheme() {
         document.body.className = `theme-${this.theme}`;
         this.updateThemeToggle();
+        // The canvas renderer reads its colors from the theme's CSS variables
+        if (this.circuitGridView?.mode === 'canvas') this.updateCircuitWindow(false);
     }
 
     toggleTheme() {
@@ -282,11 +303,17 @@ class QuantumPlatform {
         // Language selection
         document.getElementById('exportLanguageSelect')?.addEventListener('change', (e) => {
             this.currentLanguage = e.target.value;
-            if (this.circuit.length > 0) {
+            if (this.circuit.size > 0) {
                 this.generateCode(); // Update code display
             }
         });
 
+        // Renderer selection
+        document.getElementById('rendererSelect')?.addEventListener('change', (e) => {
+            this.circuitRenderer = e.target.value;
+            this.renderCircuitCanvas();
+        });
+
         // Difficulty filter
         document.addEventListener('click', (e) => {
             if (e.target.classList.contains('filter-btn')) {
@@ -303,6 +330,42 @@ class QuantumPlatform {
             }
         });
 
+        // Shot sampling
+        document.getElementById('samplingToggle')?.addEventListener('change', (e) => {
+            this.samplingEnabled = e.target.checked;
+        });
+
+        document.getElementById('shotsInput')?.addEventListener('change', (e) => {
+            const shots = parseInt(e.target.value, 10);
+            this.simulationShots = shots > 0 ? shots : DEFAULT_SHOTS;
+            e.target.value = this.simulationShots;
+        });
+
+        document.getElementById('seedInput')?.addEventListener('change', (e) => {
+            const seed = parseInt(e.target.value, 10);
+            this.simulationSeed = Number.isFinite(seed) ? seed : null;
+        });
+
+        // Expectation values
+        document.getElementById('observableInput')?.addEventListener('change', (e) => {
+            this.observable = e.target.value.trim();
+        });
+
+        document.getElementById('evaluateObservableBtn')?.addEventListener('click', () => {
+            this.observable = document.getElementById('observableInput')?.value.trim() || '';
+            this.evaluateObservable();
+        });
+
+        document.getElementById('minimizeObservableBtn')?.addEventListener('click', () => {
+            this.observable = document.getElementById('observableInput')?.value.trim() || '';
+            this.minimizeObservable();
+        });
+
+        // Noisy simulation
+        document.getElementById('noiseToggle')?.addEventListener('change', (e) => {
+            this.noiseEnabled = e.target.checked;
+        });
+
         // Code import
         document.getElementById('importCodeBtn')?.addEventListener('click', () => {
             this.importCode();
@@ -318,6 +381,10 @@ class QuantumPlatform {
             this.saveGateParameters();
         });
 
+        document.getElementById('sweepParameterBtn')?.addEventListener('click', () => {
+            this.sweepGateParameter();
+        });
+
         // Angle presets
         document.addEventListener('click', (e) => {
             if (e.target.classList.contains('preset-btn')) {
@@ -412,32 +479,40 @@ class QuantumPlatform {
         }
     }
 
+    // Cross-origin isolated pages (COOP: same-origin) cut the popup off
+    // from the page, so there the sign-in redirects to Google and back
     async signInWithGoogle() {
+        const provider = new firebase.auth.GoogleAuthProvider();
+        if (self.crossOriginIsolated) {
+            try {
+                this.showLoading('Signing in with Google...');
+                sessionStorage.setItem('quantum-google-redirect', '1');
+                await this.auth.signInWithRedirect(provider);
+            } catch (error) {
+                sessionStorage.removeItem('quantum-google-redirect');
+                this.showToast(error.message, 'error');
+                this.hideLoading();
+            }
+            return;
+        }
         try {
             this.showLoading('Signing in with Google...');
-            const provider = new firebase.auth.GoogleAuthProvider();
-            const result = await this.auth.signInWithPopup(provider);
-            
-            // Check if this is a new user
-            if (result.additionalUserInfo.isNewUser && this.db) {
-                await this.db.collection('users').doc(result.user.uid).set({
-                    firstName: result.user.displayName?.split(' ')[0] || '',
-                    lastName: result.user.displayName?.split(' ').slice(1).join(' ') || '',
-                    email: result.user.email,
-                    displayName: result.user.displayName || '',
-                    createdAt: firebase.firestore.FieldValue.serverTimestamp(),
-                    stats: {
-                        circuitsCreated: 0,
-                        gatesUsed: 0,
-                        simulationsRun: 0,
-                        codeExports: 0
-                    }
-                });
-            }
+            await this.finishGoogleSignIn(await this.auth.signInWithPopup(provider));
+        } catch (error) {
+            this.showToast(error.message, 'error');
+        } finally {
+            this.hideLoading();
+        }
+    }
 
-            this.hideAllModals();
-            this.showToast('Welcome!', 'success');
-            this.showPage('dashboard');
+    // Runs on the load that returns from signInWithGoogle's redirect
+    async completeGoogleRedirect() {
+        sessionStorage.removeItem('quantum-google-redirect');
+        if (!this.auth) return;
+        try {
+            this.showLoading('Signing in with Google...');
+            const result = await this.auth.getRedirectResult();
+            if (result.user) await this.finishGoogleSignIn(result);
         } catch (error) {
             this.showToast(error.message, 'error');
         } finally {
@@ -445,6 +520,29 @@ class QuantumPlatform {
         }
     }
 
+    async finishGoogleSignIn(result) {
+        // Check if this is a new user
+        if (result.additionalUserInfo.isNewUser && this.db) {
+            await this.db.collection('users').doc(result.user.uid).set({
+                firstName: result.user.displayName?.split(' ')[0] || '',
+                lastName: result.user.displayName?.split(' ').slice(1).join(' ') || '',
+                email: result.user.email,
+                displayName: result.user.displayName || '',
+                createdAt: firebase.firestore.FieldValue.serverTimestamp(),
+                stats: {
+                    circuitsCreated: 0,
+                    gatesUsed: 0,
+                    simulationsRun: 0,
+                    codeExports: 0
+                }
+            });
+        }
+
+        this.hideAllModals();
+        this.showToast('Welcome!', 'success');
+        this.showPage('dashboard');
+    }
+
     async signOut() {
         try {
             await this.auth.signOut();
@@ -5,7 +5,7 @@ app_js_part3 = """
     // ==========================================
     
     generateCode() {
-        if (this.circuit.length === 0) {
+        if (this.circuit.size === 0) {
             this.displayCode('// Add gates to your circuit to see generated code');
             return;
         }
@@ -56,8 +56,8 @@ qc = QuantumCircuit(qr, cr)
 
 `;
 
-        // Sort gates by column for proper execution order
-        const sortedGates = [...this.circuit].sort((a, b) => a.column - b.column || a.qubit - b.qubit);
+        // Gates by column for proper execution order
+        const sortedGates = this.circuit.ordered();
 
         code += `# Add quantum gates\n`;
         sortedGates.forEach(gate => {
@@ -129,13 +129,13 @@ plt.show()
         let qasm = `OPENQASM 2.0;
 include "qelib1.inc";
 
-// Quantum circuit with ${this.qubits} qubits and ${this.circuit.length} gates
+// Quantum circuit with ${this.qubits} qubits and ${this.circuit.size} gates
 qreg q[${this.qubits}];
 creg c[${this.qubits}];
 
 `;
 
-        const sortedGates = [...this.circuit].sort((a, b) => a.column - b.column || a.qubit - b.qubit);
+        const sortedGates = this.circuit.ordered();
 
         sortedGates.forEach(gate => {
             switch (gate.gate) {
@@ -190,7 +190,7 @@ circuit = cirq.Circuit()
 
 `;
 
-        const sortedGates = [...this.circuit].sort((a, b) => a.column - b.column || a.qubit - b.qubit);
+        const sortedGates = this.circuit.ordered();
 
         code += `# Add gates to circuit\n`;
         sortedGates.forEach(gate => {
@@ -264,12 +264,12 @@ print(result.histogram(key='m0'))  # Adjust key based on measurements
     open Microsoft.Quantum.Math;
 
     /// # Summary
-    /// Quantum circuit with ${this.qubits} qubits and ${this.circuit.length} gates
+    /// Quantum circuit with ${this.qubits} qubits and ${this.circuit.size} gates
     operation RunQuantumCircuit() : Result[] {
         using (qubits = Qubit[${this.qubits}]) {
 `;
 
-        const sortedGates = [...this.circuit].sort((a, b) => a.column - b.column || a.qubit - b.qubit);
+        const sortedGates = this.circuit.ordered();
 
         sortedGates.forEach(gate => {
             switch (gate.gate) {
@@ -349,7 +349,7 @@ circuit = Circuit()
 
 `;
 
-        const sortedGates = [...this.circuit].sort((a, b) => a.column - b.column || a.qubit - b.qubit);
+        const sortedGates = this.circuit.ordered();
 
         code += `# Add quantum gates\n`;
         sortedGates.forEach(gate => {
@@ -414,11 +414,11 @@ print(result.measurement_counts)
     }
 
     generateQuilCode() {
-        let quil = `# Quil program with ${this.qubits} qubits and ${this.circuit.length} gates
+        let quil = `# Quil program with ${this.qubits} qubits and ${this.circuit.size} gates
 
 `;
 
-        const sortedGates = [...this.circuit].sort((a, b) => a.column - b.column || a.qubit - b.qubit);
+        const sortedGates = this.circuit.ordered();
 
         sortedGates.forEach(gate => {
             switch (gate.gate) {
@@ -482,7 +482,7 @@ dev = qml.device('default.qubit', wires=${this.qubits})
 def circuit():
 `;
 
-        const sortedGates = [...this.circuit].sort((a, b) => a.column - b.column || a.qubit - b.qubit);
+        const sortedGates = this.circuit.ordered();
 
         code += `    # Add quantum gates\n`;
         sortedGates.forEach(gate => {
@@ -554,7 +554,7 @@ int main() {
     
 `;
 
-        const sortedGates = [...this.circuit].sort((a, b) => a.column - b.column || a.qubit - b.qubit);
+        const sortedGates = this.circuit.ordered();
 
         code += `    // Add quantum gates\n`;
         sortedGates.forEach(gate => {
@@ -649,7 +649,7 @@ int main() {
     }
 
     exportCode() {
-        if (this.circuit.length === 0) {
+        if (this.circuit.size === 0) {
             this.showToast('Add gates to circuit before exporting', 'warning');
             return;
         }
@@ -716,8 +716,8 @@ int main() {
             const parsedCircuit = this.parseQuantumCode(code, language);
             
             if (parsedCircuit.length > 0) {
-                this.saveState();
-                this.circuit = parsedCircuit;
+                this.saveState({ label: 'Import code' });
+                this.circuit.replaceAll(parsedCircuit);
                 this.renderCircuitCanvas();
                 this.updateCircuitInfo();
                 this.generateCode();
@@ -1043,7 +1043,7 @@ int main() {
     updateCircuitInfo() {
         const circuitInfo = document.getElementById('circuitInfo');
         if (circuitInfo) {
-            circuitInfo.textContent = `${this.qubits} qubits, ${this.circuit.length} gates`;
+            circuitInfo.textContent = `${this.qubits} qubits, ${this.circuit.size} gates`;
         }
     }
 
@@ -1111,7 +1111,7 @@ int main() {
     }
 
     async saveCircuit() {
-        if (!this.currentUser || this.circuit.length === 0) {
+        if (!this.currentUser || this.circuit.size === 0) {
             if (!this.currentUser) {
                 this.showToast('Please sign in to save circuits', 'warning');
             } else {
@@ -1126,7 +1126,7 @@ int main() {
             const circuitData = {
                 name: `Circuit ${Date.now()}`,
                 qubits: this.qubits,
-                gates: this.circuit,
+                gates: this.circuit.toJSON(),
                 language: this.currentLanguage,
                 createdAt: firebase.firestore.FieldValue.serverTimestamp(),
                 userId: this.currentUser.uid
@@ -1203,7 +1203,8 @@ int main() {
             const doc = await this.db.collection('circuits').doc(circuitId).get();
             if (doc.exists) {
                 const data = doc.data();
-                this.circuit = data.gates;
+                this.saveState({ label: 'Load circuit' });
+                this.circuit.replaceAll(data.gates);
                 this.qubits = data.qubits;
                 this.currentLanguage = data.language || 'qiskit';
                 
@@ -1262,8 +1263,8 @@ int main() {
 
         const template = templates[templateName];
         if (template) {
-            this.saveState();
-            this.circuit = template.gates;
+            this.saveState({ label: 'Load template' });
+            this.circuit.replaceAll(template.gates);
             this.qubits = template.qubits;
             
             document.getElementById('qubitCount').textContent = this.qubits;
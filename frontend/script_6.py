@@ -51,6 +51,72 @@ async function connectToMongoDB() {
 module.exports = { mongodbConfig, connectToMongoDB };
 """
 
+# Sample static server. SharedArrayBuffer (partitioned simulations) is only
+# available on cross-origin isolated pages, which needs the COOP and COEP
+# headers on every response.
+server_js = """// Quantum Computing Platform - Sample Static Server
+//
+// Serves the platform with the cross-origin isolation headers that
+// SharedArrayBuffer requires, so wide simulations can be partitioned
+// across the worker pool. Usage: node server.js [port]
+
+const http = require('http');
+const fs = require('fs');
+const path = require('path');
+
+const root = __dirname;
+const port = parseInt(process.argv[2], 10) || 3000;
+
+const MIME_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.json': 'application/json',
+    '.wasm': 'application/wasm',
+    '.wat': 'text/plain; charset=utf-8',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.ico': 'image/x-icon'
+};
+
+// `credentialless` still lets the page load its CDN scripts without a
+// Cross-Origin-Resource-Policy header; use `require-corp` once every
+// third-party resource sends one
+const ISOLATION_HEADERS = {
+    'Cross-Origin-Opener-Policy': 'same-origin',
+    'Cross-Origin-Embedder-Policy': 'credentialless'
+};
+
+http.createServer((request, response) => {
+    let pathname;
+    try {
+        pathname = decodeURIComponent(new URL(request.url, 'http://localhost').pathname);
+    } catch (error) {
+        response.writeHead(400, ISOLATION_HEADERS).end('Bad request');
+        return;
+    }
+    const file = path.join(root, pathname === '/' ? 'index.html' : pathname);
+    if (!file.startsWith(root + path.sep)) {
+        response.writeHead(403, ISOLATION_HEADERS).end('Forbidden');
+        return;
+    }
+
+    fs.readFile(file, (error, data) => {
+        if (error) {
+            response.writeHead(404, ISOLATION_HEADERS).end('Not found');
+            return;
+        }
+        response.writeHead(200, {
+            ...ISOLATION_HEADERS,
+            'Content-Type': MIME_TYPES[path.extname(file)] || 'application/octet-stream'
+        });
+        response.end(data);
+    });
+}).listen(port, () => {
+    console.log(`Quantum Platform on http://localhost:${port} (cross-origin isolated)`);
+});
+"""
+
 # Package.json for Node.js dependencies
 package_json = """{
   "name": "quantum-circuit-builder",
@@ -58,7 +124,7 @@ package_json = """{
   "description": "Professional quantum circuit builder with multi-language export",
   "main": "index.html",
   "scripts": {
-    "start": "http-server . -p 3000",
+    "start": "node server.js 3000",
     "dev": "live-server --port=3000",
     "build": "echo 'No build process needed for static files'"
   },
@@ -97,9 +163,11 @@ A comprehensive quantum computing platform that combines visual circuit building
 - Beginner-friendly mode with basic gates
 - Advanced mode with parametric rotations
 - Real-time circuit validation and optimization
+- Virtualized canvas that grows with the circuit and scrolls smoothly through 10,000-column imports
+- Canvas renderer for large circuits, drawn off the main thread through `OffscreenCanvas`
 
 ### ⚛️ **Quantum Simulation** 
-- Accurate quantum state calculation (up to 6 qubits)
+- Accurate quantum state calculation, sized by a configurable memory budget (256 MB ≈ 23 qubits)
 - Probability distribution visualization
 - Interactive 3D Bloch sphere representation
 - Real quantum mathematics using industry standards
@@ -116,8 +184,8 @@ Support for 8+ quantum programming languages:
 - **XACC (C++)** - Oak Ridge quantum computing framework
 
 ### 🔧 **Advanced Circuit Operations**
-- **Add/Remove Qubits** - Dynamic circuit sizing (1-6 qubits)
-- **Undo/Redo System** - Complete action history management
+- **Add/Remove Qubits** - Dynamic circuit sizing; past the statevector memory budget circuits switch to the MPS backend (up to 128 qubits)
+- **Undo/Redo System** - Per-cell edit history capped by bytes (4 MB by default); repeated drags of one gate undo in a single step
 - **Gate Parameter Editing** - Rotation angle customization
 - **Drag-to-Delete** - Intuitive gate removal by dragging off-screen
 - **Code Import** - Parse quantum code and rebuild circuits visually
@@ -151,6 +219,9 @@ Support for 8+ quantum programming languages:
 
 2. **Open with a local server** (recommended)
    ```bash
+   # Using the bundled server (sends the cross-origin isolation headers)
+   npm start
+
    # Using Python
    python -m http.server 3000
    
@@ -169,7 +240,7 @@ Support for 8+ quantum programming languages:
    ```
 
 ### Direct File Access
-You can also open `index.html` directly in your browser, but some features may be limited due to CORS restrictions.
+You can also open `index.html` directly in your browser, but some features may be limited due to CORS restrictions. Simulations then run on the main thread because browsers do not start `simulation-worker.js` from `file://` pages.
 
 ## 🔧 Configuration
 
@@ -179,6 +250,120 @@ You can also open `index.html` directly in your browser, but some features may b
 3. Copy your config to `firebase-config.js`
 4. Enable Google OAuth provider in Firebase Console
 
+### Simulation Memory Budget
+The statevector engine refuses circuits whose buffers would not fit in `simulationMemoryBudget` (256 MB by default, about 23 qubits). Wider non-Clifford circuits go to the matrix-product-state backend instead. Set the budget in the `QuantumPlatform` constructor for each deployment; every simulation reports its peak memory so the value can be tuned.
+
+### Canvas Renderer
+From 2,000 gates (`canvasRendererMinGates`) the builder draws the circuit on one `<canvas>` instead of a DOM element per cell. `circuit-canvas.js` draws wires, gates, control dots, CX targets and measurement meters. Where the browser supports `OffscreenCanvas`, the same file runs as a worker that does the drawing. Otherwise the page draws on the main thread. Drops, moves and clicks to edit angles hit-test against a grid index of the drawn gates, so they work as in the DOM renderer. The toolbar's renderer menu chooses Auto, DOM or Canvas.
+
+### Small Circuits
+Noiseless circuits of up to 8 qubits without mid-circuit measurements take a short path in `QuantumSimulator`. It skips backend selection, the prefix cache, SIMD dispatch and fusion, and labels results from cached bitstrings. Registers of up to 8 qubits apply H, X, Y, Z, S, T, CX and CZ inline in one loop rather than calling a kernel per gate, and trace Bloch vectors without a packed buffer. Amplitudes come out bit for bit the same as the kernels give. `node benchmark-engine.js [circuits] [gates]` times each path against the function of the old builder that returns the same thing. `simulateState()` is compared with `simulateStateVector()`, and `simulate()` and `run()` with `probabilityDistribution()`. Rounds alternate between the functions after a warm-up, so drift in machine speed hits them all alike. On random 4-qubit circuits of 24 gates, on one virtual CPU, `simulateState()` is 9-11x faster, `simulate()` 6-8x and `run()` about 3x. Only the state path reaches the 10x target, and not on every run. What remains per call is allocating fresh typed arrays for the result. For `run()` there is also the bitstring-keyed object: V8 treats labels such as `"1000"` as array indices and stores them in a slow dictionary, which `probabilityDistribution()` paid as well.
+
+### SIMD Kernels
+Simulation workers load `quantum-kernels.wasm`, a 1 KB WebAssembly module with 128-bit SIMD loops for the dense 2x2, diagonal, controlled (CX) and controlled-phase (CZ) gates. Each amplitude's (re, im) pair fills one `f64x2` vector. Statevectors of up to 27 qubits then live in WebAssembly memory, and `metadata.kernels` reports `'simd'` or `'js'`. Browsers without WebAssembly SIMD fail the module's validation and keep the JS kernels. The kernels give the same amplitudes bit for bit. Pass `simd: false` to `QuantumSimulator` to compare. `node benchmark-kernels.js [minQubits] [maxQubits]` times both paths from 10 to 24 qubits. `quantum-kernels.wat` is the module's source.
+
+### Multi-Core Simulation
+On cross-origin isolated pages, statevector runs of 20 qubits and more are split across the whole worker pool. The amplitudes live in one `SharedArrayBuffer`, and each of the 2^k workers owns the chunk where the first k qubits are fixed. Gates on the other qubits touch only the worker's own chunk and need no coordination. A gate on one of the first k qubits is split evenly between the workers and runs between two `Atomics` barriers. `metadata.partitions` and `metadata.barriers` report the split. A partitioned run needs all of its workers at once, so it waits until that many are idle. These runs skip the prefix cache and the SIMD kernels. Pass `partition: false` to `simulationPool.run` to keep a run on one worker.
+
+`SharedArrayBuffer` needs two response headers, which `npm start` (`server.js`) sends:
+
+```
+Cross-Origin-Opener-Policy: same-origin
+Cross-Origin-Embedder-Policy: credentialless
+```
+
+Configure the same headers on your static host, such as a Netlify `_headers` file or `headers` in `firebase.json`. Without them, every run stays on one worker. Safari does not support `credentialless`; use `require-corp` there if every CDN resource sends a `Cross-Origin-Resource-Policy` header. `same-origin` also cuts popups off from the page, so on isolated pages Google sign-in redirects to Google and back; elsewhere it keeps the popup.
+
+### Incremental Re-simulation
+Builder simulations keep a statevector snapshot after each circuit column, keyed by a hash of every gate up to that column. After an edit, the next run resumes from the last unchanged column, so editing the end of a deep circuit only simulates the columns after the edit. Snapshots are evicted least recently used first once they pass `prefixCacheBudget` (64 MB by default).
+
+### Result Cache
+Finished results are cached by a canonical circuit hash, so reloading a template, undoing and redoing, or coming back to a page shows the result without simulating again. The hash covers the width, every gate in simulation order (column, then qubit) and the options that change the output: backend, shots, seed and noise model. Columns are renumbered densely, so shifting a circuit sideways keeps its hash. Angles are taken modulo 2π and rounded to 10 decimals. `ResultCache` keeps a 32 MB in-memory LRU in front of a 128 MB IndexedDB store, and both evict least recently used results. Results drawn without a fixed seed, such as shot counts and noise trajectories, are never cached. `resultCache.stats()` reports hits and misses. Bump `RESULT_CACHE_VERSION` when an engine change alters results.
+
+### Matrix Product States
+Wide, shallow circuits (for example 50-100 qubit chains of nearest-neighbour CX/CZ) run on an MPS backend. It is chosen automatically once the statevector would exceed the memory budget, or explicitly with `new QuantumSimulator({ backend: 'mps' })`. Each two-qubit gate keeps at most `maxBondDimension` singular values (64 by default). `metadata.truncationError` reports the summed discarded weight; 0 means the result is exact. Registers of up to 10 qubits get exact probabilities, and wider ones are estimated from the shot counts.
+
+### Sparse Simulation
+Permutation and phase gates (X, Y, CX, SWAP, Z, S, T, RZ, CZ) never add nonzero amplitudes to |0…0⟩. Only H, RX and RY can, and each at most doubles them. Circuits wider than 16 qubits where that bound stays under 1/64 of the register run on a sparse backend. It stores only the nonzero amplitudes in a `Map` keyed by basis index, so arithmetic and oracle circuits on 30–52 qubits simulate exactly. Force it with `new QuantumSimulator({ backend: 'sparse' })`. If the fill ratio crosses 1/64 and a dense statevector fits the budget, the run converts to dense for the remaining gates. `metadata.nonzeroAmplitudes` reports the peak count and `metadata.densifiedAtGate` reports where the switch happened.
+
+### Shot Sampling
+Tick **Sample shots** on the Probability tab to draw measurement outcomes the way the generated Qiskit and Cirq code does (1024 shots by default). The engine builds a Walker alias table once from the final probabilities. `simulate()` returns `counts` shaped like the probabilities: a `Uint32Array` indexed by basis state, or a bitstring map when there are far fewer shots than outcomes. Dense counts are never labelled in full; the chart labels only the states it shows, and `run()` or `labelCounts()` give a map of the outcomes drawn, like Qiskit's `get_counts()`. Set a seed to make the counts reproducible. A `measure` followed by another gate on the same wire collapses the state, and each outcome branch is simulated with the shots that landed on it.
+
+### Large Results
+A 20-qubit result has a million basis states, so registers over 4 qubits chart only the 16 most likely states. Nothing else is labelled. The same queries work on any result's `probabilities`, either the dense `Float64Array` or the bitstring map from sampling backends:
+
+```javascript
+const { probabilities } = simulator.simulate(circuit);
+topStates(probabilities, circuit.qubits, 10);                 // [{ index, label, probability }], largest first
+marginalProbabilities(probabilities, circuit.qubits, [0, 3]); // Float64Array over q0 q3, q0 as the high bit
+for (const { indices, probabilities: p } of probabilityChunks(probabilities, { chunkSize: 4096 })) {
+    // nonzero (index, probability) pairs, at most 4096 per chunk
+}
+```
+
+`topStates` makes one pass with a size-k heap. `probabilityChunks` reads the dense array in place and skips zero entries. Bitstring maps wider than 53 qubits yield `BigInt` indices.
+
+### Parameter Sweeps
+**Sweep 0–2π** in the rotation parameter dialog plots ⟨Z⟩ of the gate's qubit against its angle from a single batched run. In code, `simulationPool.sweep(circuit, bindings)` takes bindings such as `{ '0:2': Math.PI }`, which address rotation gates by `qubit:column`. It returns a probability matrix with one row per binding. Gates before the first bound gate are simulated once and shared by every row.
+
+### Expectation Values
+Type an observable under the probability chart, such as `Z0 Z1 + 0.5 X0 - 1.2 Y1`, and press **Evaluate ⟨H⟩**. It is re-evaluated after every simulation. Terms are Pauli strings, either sparse (`Z0 Z1`) or one letter per qubit (`ZZI`), each with an optional coefficient. In code:
+
+```javascript
+const { value, terms, groups } = await simulationPool.expectation(circuit, [
+    { coefficient: 1, pauli: 'Z0 Z1' },
+    { coefficient: 0.5, pauli: 'X0 X1' }
+]);
+```
+
+All terms are computed from one statevector. Terms that commute qubit-wise are grouped greedily, and each group needs one basis rotation (H for X, S† then H for Y) of a scratch copy. `groups` lists the measurement bases used.
+
+### Gradients and Optimisation
+`simulationPool.gradient(circuit, observable)` returns `{ value, gradient }`. The gradient holds one `{ key, angle, derivative }` entry per rx/ry/rz gate, computed with the parameter-shift rule: d⟨H⟩/dθ = (⟨H⟩(θ + π/2) − ⟨H⟩(θ − π/2)) / 2. The circuit is simulated forward once, and both shifted branches of each gate start from the shared prefix state. Parameters are split into runs of equal work across the worker pool. **Minimise ⟨H⟩** uses these gradients to run gradient descent on every angle in the circuit, which is enough for small VQE and QAOA experiments without exporting to PennyLane. Undo restores the starting angles.
+
+### Noisy Simulation
+Tick **Hardware noise** on the Probability tab to add hardware-like errors. After each gate, depolarizing and amplitude-damping channels act on the qubits it touched, and readout errors flip measured bits. The noise model sets these rates per gate type:
+
+```javascript
+const noise = {
+    gates: {
+        default: { depolarizing: 0.001, amplitudeDamping: 0.0005 },
+        cx: { depolarizing: 0.01, amplitudeDamping: 0.001 }
+    },
+    readoutError: 0.02
+};
+new QuantumSimulator({ noise }).simulate(circuit);
+```
+
+Up to about 11 qubits under the default budget, the engine evolves the exact density matrix. Each gate and its noise are applied as one precomputed superoperator. Wider registers use Monte Carlo trajectories instead: each trajectory picks one Kraus operator per channel, and the results are averaged over trajectories (256 by default). `simulationPool.runTrajectories(circuit, options)` spreads the trajectories across the workers.
+
+### Python Reference Simulator
+The `qosmos` package next to the generator scripts is a NumPy statevector simulator. It takes the same circuit JSON the app saves (`qubits` plus `{ gate, qubit, column, params }` gates) and follows the engine's conventions. Use it as ground truth when checking `quantum-engine.js`, the algorithm templates or exported circuits:
+
+```bash
+pip install numpy
+python -m qosmos circuit.json   # labelled probabilities and Bloch vectors as JSON
+```
+
+```python
+from qosmos import simulate
+result = simulate({"qubits": 2, "gates": [{"gate": "h", "qubit": 0, "column": 0, "params": {}},
+                                          {"gate": "cx", "qubit": 0, "column": 1, "params": {}}]})
+result["probabilities"]  # array([0.5, 0. , 0. , 0.5])
+```
+
+A measurement followed by more gates on its qubit collapses the state. `simulate` then averages the probabilities and Bloch vectors over both outcomes, while `simulate_state` raises `ValueError` because no single state remains. `python -m pytest qosmos` compares fixed circuits with `quantum-engine.js` through Node. Mid-circuit cases are checked against the engine's exact density backend.
+
+To evaluate an export of the `circuits` collection offline, pass it as NDJSON with one saved circuit document per line:
+
+```bash
+python -m qosmos.batch circuits.ndjson -o results.ndjson --workers 8
+```
+
+Documents go to a process pool in chunks (`--chunk-size`, 64 by default). Results are appended to the output as each chunk finishes. Every result carries the input `line` plus the document's `id`/`name`/`language`, and failed documents get an `error` field instead. Finished line numbers go to `results.ndjson.resume`, so rerunning the same command after a crash picks up where it stopped.
+
+Documents wider than `--max-qubits` (24 by default; each worker needs about 48 × 2^n bytes) are checked before anything is allocated and get a `skipped` field naming the app backend that runs them: `stabilizer` for Clifford-only circuits up to 1024 qubits and `mps` for others up to 128. A document that raises `MemoryError`, or whose worker process is killed, fails with its own `error` and the rest of the run carries on.
+
 ### MongoDB Atlas Setup (Optional)
 1. Create a MongoDB Atlas cluster
 2. Set up database user and network access
@@ -211,7 +396,7 @@ You can also open `index.html` directly in your browser, but some features may b
 
 ### 5. **Simulation & Results**
 - **Simulate Button**: Run quantum simulation
-- **Probability Chart**: View measurement outcomes
+- **Probability Chart**: View measurement outcomes (the 16 most likely on wide registers)
 - **Bloch Sphere**: Interactive 3D quantum state visualization
 - **Code Generation**: Real-time multi-language export
 
@@ -236,7 +421,22 @@ You can also open `index.html` directly in your browser, but some features may b
 - **MongoDB Atlas** - Circuit storage and analytics
 
 ### Quantum Computing
-- **Mathematical Simulation** - Accurate quantum state calculation
+- **Mathematical Simulation** - Typed-array statevector engine (`quantum-engine.js`)
+- **Edit History** - Undo entries store only the cells an edit touched, so a gate move costs under 1 KB whatever the circuit size; `quantumPlatform.logHistoryReport()` prints bytes per entry
+- **Circuit Model** - Gates indexed by (qubit, column) for O(1) edits, with per-column and per-wire ordered lists; saved as the plain `{gate, qubit, column, params}` array
+- **Bloch Vectors** - Every qubit's reduced density matrix is traced in one tiled sweep of the statevector; entangled qubits show |r| < 1
+- **SIMD Kernels** - WebAssembly `f64x2` loops for single-qubit, diagonal and controlled gates, about 1.5-3.5x the JS kernels; JS fallback without SIMD
+- **Gate Fusion** - From 10 qubits up, runs of single-qubit gates fold into one 2x2 matrix per wire and adjacent two-qubit blocks into 4x4 matrices; `metadata.passes` reports unfused vs fused state sweeps
+- **Sparse Backend** - Nonzero amplitudes in a hash map for basis-permuting circuits, densified past a fill threshold
+- **MPS Backend** - Tensor chain with SVD truncation for wide, low-entanglement circuits
+- **Pauli Expectations** - Qubit-wise commuting grouping; one statevector and one basis rotation per group
+- **Parameter-Shift Gradients** - Shifted branches resume from a shared forward pass, split across workers
+- **Noise Channels** - Cached Kraus operators; exact density matrix for small registers, Monte Carlo trajectories across workers beyond that
+- **Shot Sampler** - Alias-method sampling with a seedable PRNG; mid-circuit measurements branch the state
+- **Prefix State Cache** - Per-column statevector snapshots in the simulation worker; `metadata.prefixCache` reports the resumed column and hit/miss counts
+- **Multi-Core Statevector** - Wide runs partitioned across workers in a `SharedArrayBuffer`, with `Atomics` barriers around gates on the high-order qubits
+- **Background Simulation** - Web Worker pool (`simulation-worker.js`) with zero-copy result transfer
+- **Stabilizer Backend** - Clifford-only circuits (H, X, Y, Z, S, CX, CZ, SWAP, measure) switch to a CHP tableau once the statevector no longer fits the memory budget, scaling to hundreds of qubits
 - **Multi-Language Support** - 8+ quantum programming frameworks
 - **Industry Standards** - Compatible with IBM, Google, Microsoft, Amazon
 
@@ -285,7 +485,7 @@ You can also open `index.html` directly in your browser, but some features may b
 ## 📊 Performance Optimizations
 
 - Lazy loading of heavy components
-- Efficient DOM manipulation
+- Efficient DOM manipulation: the circuit canvas patches only the cells whose gate changed, with one delegated listener per event type
 - Optimized quantum simulation algorithms
 - Minimal external dependencies
 - Responsive image and asset loading
@@ -373,6 +573,9 @@ with open(f"{project_name}/mongodb-config.js", "w") as f:
 with open(f"{project_name}/package.json", "w") as f:
     f.write(package_json)
 
+with open(f"{project_name}/server.js", "w") as f:
+    f.write(server_js)
+
 with open(f"{project_name}/README.md", "w") as f:
     f.write(readme_md)
 
@@ -380,4 +583,5 @@ print(f"✅ Created configuration and documentation files")
 print(f"✅ Created {project_name}/firebase-config.js")
 print(f"✅ Created {project_name}/mongodb-config.js") 
 print(f"✅ Created {project_name}/package.json")
+print(f"✅ Created {project_name}/server.js")
 print(f"✅ Created {project_name}/README.md")
\ No newline at end of file
@@ -37,6 +37,7 @@ print(f"\n🎯 PROJECT SUMMARY:")
 print(f"✅ HTML: Professional multi-page application")
 print(f"✅ CSS: Complete responsive styling with light/dark themes") 
 print(f"✅ JavaScript: Full-featured quantum circuit builder (~92KB)")
+print(f"✅ Simulation: Typed-array statevector engine (quantum-engine.js)")
 print(f"✅ Firebase: Authentication and cloud storage integration")
 print(f"✅ MongoDB: Database configuration for user data")
 print(f"✅ Documentation: Comprehensive README and setup guide")